@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from generate_timetable import LabTimetable, TheoryTimetable
+from occupancy import Occupancy
+from streams import Streams
+from variables import DAYS, PERIODS, MAX_THEORY_PASSES, YEARS_SECTIONS, SUBJECTS_PER_YEAR, LAB_SUBJECTS
+
+REPORT_FILE = "benchmark_report.json"
+PHASES = ("labs", "theory", "repair", "export")
+
+
+# ------------ SYNTHETIC WORKLOADS -------------
+# A scale-k workload repeats the department k times: every year in
+# YEARS_SECTIONS becomes k years ("3" -> "3000", "3001", ...) with the same
+# sections, subjects, frequencies and lab list, so the generators see the
+# same schema they see in variables.py. Teachers are synthetic (T00001...)
+# and filled up to `density` of their week before a new one is hired, which
+# controls how tight the teacher side of the problem is.
+def synthetic_config(scale, density=0.6, seed=0, prebooked_share=0.1):
+    rng = random.Random(seed)
+    capacity = max(4, int(density * DAYS * PERIODS))
+    lab_names = {sec[:-1]: [subj for subj, _ in labs] for sec, labs in sorted(LAB_SUBJECTS.items())}
+
+    years_sections, subjects_per_year, lab_subjects = {}, {}, {}
+    demand = []     # (load, section, subject, is_lab)
+    for base, secs in YEARS_SECTIONS.items():
+        for k in range(scale):
+            year = f"{base}{k:03d}"
+            years_sections[year] = list(secs)
+            subjects_per_year[year] = dict(SUBJECTS_PER_YEAR[base])
+            for s in secs:
+                sec = f"{year}{s}"
+                demand += [(freq, sec, subj, False) for subj, freq in SUBJECTS_PER_YEAR[base].items()]
+                # Every lab runs twice a week (once per batch) as a 2-period block
+                demand += [(4, sec, subj, True) for subj in lab_names.get(base, [])]
+
+    rng.shuffle(demand)
+    teachers: list[list] = []   # [name, load]
+    assignments: dict[str, list] = {}
+    lab_holders = set()     # (section, teacher): nobody takes both batches of one section
+    for load, sec, subj, is_lab in demand:
+        pool = [t for t in teachers[-8:] if t[1] + load <= capacity
+                and not (is_lab and (sec, t[0]) in lab_holders)]
+        if pool:
+            teacher = rng.choice(pool)
+        else:
+            teacher = [f"T{len(teachers)+1:05d}", 0]
+            teachers.append(teacher)
+        teacher[1] += load
+        if is_lab:
+            lab_holders.add((sec, teacher[0]))
+            lab_subjects.setdefault(sec, []).append((subj, teacher[0]))
+        else:
+            assignments.setdefault(teacher[0], []).append((sec, subj))
+
+    prebooked = {}
+    for name, load in teachers:
+        if rng.random() < prebooked_share:
+            free = DAYS * PERIODS - load
+            slots = rng.sample([(d, p) for d in range(DAYS) for p in range(PERIODS)], min(2, free))
+            if slots:
+                prebooked[name] = slots
+    return {
+        "YEARS_SECTIONS": years_sections, "SUBJECTS_PER_YEAR": subjects_per_year,
+        "TEACHER_ASSIGNMENTS": assignments, "LAB_SUBJECTS": lab_subjects, "PREBOOKED": prebooked,
+    }
+
+
+# ------------ ONE RUN -------------
+def run_scale(scale, density=0.6, seed=42, export=True, memory=False):
+    config = synthetic_config(scale, density, seed)
+    phases = dict.fromkeys(PHASES, 0.0)
+    if memory:
+        tracemalloc.start()
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        occupancy = Occupancy()
+        lab_gen = LabTimetable(config["LAB_SUBJECTS"], occupancy, prebooked=config["PREBOOKED"])
+        theory_gen = TheoryTimetable(config["YEARS_SECTIONS"], config["SUBJECTS_PER_YEAR"],
+                                     config["TEACHER_ASSIGNMENTS"], occupancy, lab_gen.lab_schedules)
+        lab_gen.rng = theory_gen.rng = Streams(seed)
+        start = time.perf_counter()
+        lab_gen.generate_lab_pairs()
+        phases["labs"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        theory_gen.generate_timetable()
+        phases["repair"] = theory_gen.repair_seconds
+        phases["theory"] = time.perf_counter() - start - phases["repair"]
+
+        if export:
+            from export_excel import write_workbook
+            fd, path = tempfile.mkstemp(suffix=".xlsx")
+            os.close(fd)
+            try:
+                start = time.perf_counter()
+                write_workbook(path, lab_gen.lab_schedules, theory_gen.class_schedules)
+                phases["export"] = time.perf_counter() - start
+            finally:
+                os.remove(path)
+
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    lines = log.getvalue().splitlines()
+    return {
+        "scale": scale,
+        "sections": len(theory_gen.class_schedules),
+        "teachers": len({t for t in config["TEACHER_ASSIGNMENTS"]} |
+                        {t for labs in config["LAB_SUBJECTS"].values() for _, t in labs}),
+        "theory_periods": sum(sum(config["SUBJECTS_PER_YEAR"][sec[:-1]].values())
+                              for sec in theory_gen.class_schedules),
+        "phases": {name: round(seconds, 4) for name, seconds in phases.items()},
+        "total": round(sum(phases.values()), 4),
+        "passes": theory_gen.passes_run,
+        "unplaced": sum(len(subs) for subs in theory_gen.unplaced.values()),
+        "lab_warnings": sum(line.startswith("WARNING: Could not place labs") for line in lines),
+        "peak_traced_mb": round(peak / 2**20, 2) if peak is not None else None,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+# ------------ REPORT -------------
+def compare(runs, baseline, tolerance):
+    # A phase regresses when it is slower than the baseline by more than
+    # `tolerance` (as a fraction) and by more than 10 ms of noise.
+    previous = {run["scale"]: run for run in baseline["runs"]}
+    regressions = []
+    for run in runs:
+        old = previous.get(run["scale"])
+        if not old:
+            continue
+        for phase in PHASES:
+            before, after = old["phases"].get(phase, 0.0), run["phases"][phase]
+            if after > before * (1 + tolerance) and after - before > 0.01:
+                regressions.append((run["scale"], phase, before, after))
+        if run["unplaced"] > old["unplaced"]:
+            regressions.append((run["scale"], "unplaced", old["unplaced"], run["unplaced"]))
+    return regressions
+
+
+def print_table(runs):
+    print(f"{'scale':>6} {'sections':>9} {'teachers':>9} " +
+          "".join(f"{p:>9}" for p in PHASES) + f"{'total':>9} {'passes':>7} {'unplaced':>9} {'labwarn':>8}")
+    for r in runs:
+        print(f"{r['scale']:>6} {r['sections']:>9} {r['teachers']:>9} " +
+              "".join(f"{r['phases'][p]:>9.3f}" for p in PHASES) +
+              f"{r['total']:>9.3f} {r['passes']:>7} {r['unplaced']:>9} {r['lab_warnings']:>8}")
+
+
+def main(scales, density=0.6, seed=42, output=REPORT_FILE, export=True, memory=False,
+         baseline=None, tolerance=0.25):
+    runs = []
+    for scale in scales:
+        print(f"Running scale {scale}x ...", file=sys.stderr)
+        runs.append(run_scale(scale, density, seed, export, memory))
+    report = {
+        "meta": {"seed": seed, "density": density, "days": DAYS, "periods": PERIODS,
+                 "max_theory_passes": MAX_THEORY_PASSES, "python": platform.python_version(),
+                 "platform": platform.platform(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "runs": runs,
+    }
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print_table(runs)
+    print(f"Report written to {output}")
+
+    if baseline:
+        with open(baseline, encoding="utf-8") as f:
+            regressions = compare(runs, json.load(f), tolerance)
+        for scale, what, before, after in regressions:
+            print(f"[REGRESSION] {scale}x {what}: {before} -> {after}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Time every generation phase on synthetic workloads.")
+    parser.add_argument("--scales", default="1,10,100",
+                        help="comma-separated multiples of the department in variables.py (e.g. 1,10,100,1000)")
+    parser.add_argument("--density", type=float, default=0.6, help="target share of each teacher's week that is booked")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=REPORT_FILE, help="JSON report to write")
+    parser.add_argument("--no-export", action="store_true", help="skip the Excel export phase")
+    parser.add_argument("--memory", action="store_true", help="trace peak Python allocations (slower)")
+    parser.add_argument("--baseline", metavar="REPORT", help="earlier report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown per phase vs the baseline")
+    args = parser.parse_args()
+    sys.exit(main([int(s) for s in args.scales.split(",")], args.density, args.seed, args.output,
+                  not args.no_export, args.memory, args.baseline, args.tolerance))
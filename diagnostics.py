@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+from collections import Counter
+from typing import NamedTuple, Optional
+from occupancy import SLOT_BITS, iter_slots
+from teacher_index import TeacherIndex
+from variables import DAYS, PERIODS, DAY_NAMES
+
+REASONS = ("NO TEACHER", "CLOSED", "LAB CONFLICT", "CLASS OCCUPIED", "TEACHER BUSY", "TEACHER LIMIT", "NO ROOM",
+           "FREE DAY", "ONCE/DAY FAIL", "CONSEC")
+
+
+# ------------ INFEASIBILITY REPORT -------------
+# Explains [UNPLACED] subjects from the occupancy masks instead of probing
+# can_schedule slot by slot. Nothing is computed until a report is read, and
+# each (section, subject) is explained once however many periods it is short.
+class Blocker(NamedTuple):
+    section: str
+    subject: str
+    teacher: str
+    batch: Optional[str]        # 'B1'/'B2' for labs, None otherwise
+
+
+def slots_text(mask):
+    # "Mon P1,P2; Wed P4" style rendering of a week mask
+    parts = []
+    for d in range(DAYS):
+        periods = [p for p in range(PERIODS) if mask & SLOT_BITS[d][p]]
+        if periods:
+            parts.append(f"{DAY_NAMES[d]} " + ",".join(f"P{p+1}" for p in periods))
+    return "; ".join(parts) or "-"
+
+
+class Explanation:
+    def __init__(self, section, subject, teacher, missing, reasons, blockers):
+        self.section = section
+        self.subject = subject
+        self.teacher = teacher
+        self.missing = missing                  # periods still owed
+        self.reasons = reasons                  # reason -> week mask, disjoint, first rule wins
+        self.blockers = blockers                # (day, period) -> [Blocker] for movable slots
+
+    @property
+    def cheapest(self):
+        # The slot that frees up by moving the fewest other bookings
+        if not self.blockers:
+            return None, []
+        slot = min(self.blockers, key=lambda s: (len(self.blockers[s]), s))
+        return slot, self.blockers[slot]
+
+    def conflicting_teachers(self):
+        return sorted({b.teacher for found in self.blockers.values() for b in found})
+
+    def conflicting_sections(self):
+        return sorted({b.section for found in self.blockers.values() for b in found if b.section})
+
+    def as_dict(self):
+        slot, found = self.cheapest
+        return {
+            "section": self.section, "subject": self.subject, "teacher": self.teacher,
+            "missing": self.missing,
+            "reasons": {reason: mask for reason, mask in self.reasons.items()},
+            "reason_slots": {reason: slots_text(mask) for reason, mask in self.reasons.items()},
+            "cheapest_slot": slot, "cheapest_blockers": [b._asdict() for b in found],
+            "conflicting_teachers": self.conflicting_teachers(),
+            "conflicting_sections": self.conflicting_sections(),
+        }
+
+
+class InfeasibilityReport:
+    def __init__(self, theory, unplaced=None, relax_rules=True):
+        self.theory = theory
+        self.unplaced = theory.unplaced if unplaced is None else unplaced
+        self.relax_rules = relax_rules
+        self._explanations = None
+        self._index = None
+
+    def __bool__(self):
+        return any(self.unplaced.values())
+
+    @property
+    def explanations(self):
+        if self._explanations is None:
+            self._index = TeacherIndex(self.theory.lab_schedules, self.theory.class_schedules,
+                                       self.theory.grouped)
+            self._explanations = [self.explain(sec, subj, n)
+                                  for sec, subs in sorted(self.unplaced.items())
+                                  for subj, n in sorted(Counter(subs).items())]
+        return self._explanations
+
+    def explain(self, section, subject, missing=1):
+        theory = self.theory
+        teacher = theory.section_subject_teacher.get((section, subject))
+        reasons = dict(theory.blocking_masks(section, subject, self.relax_rules))
+        blockers = {}
+        group = theory.group_of.get((section, subject))
+        if group:
+            teacher = group.cell[1]     # a group moves whole; no single booking frees its slot
+        elif teacher:
+            occ = theory.occupancy
+            # Slots pinned by the section's own labs, a prebooking or a group have no movable fix
+            pinned = occ.section_labs.get(section, 0) | occ.prebooked.get(teacher, 0) | theory.grouped.get(section, 0)
+            for day, period in iter_slots(occ.classes.get(section, 0) | occ.teachers.get(teacher, 0)):
+                if pinned & SLOT_BITS[day][period]:
+                    continue
+                found = self._holders(section, subject, teacher, day, period)
+                if found is not None:
+                    blockers[(day, period)] = found
+        return Explanation(section, subject, teacher, missing, reasons, blockers)
+
+    def _holders(self, section, subject, teacher, day, period):
+        # Bookings that would have to move to free the slot; None if one is a
+        # lab, a group or the subject itself (moving it frees nothing)
+        found = []
+        slot = self.theory.class_schedules[section][day][period]
+        if slot:
+            if slot[0] == subject:
+                return None
+            found.append(Blocker(section, slot[0], slot[1], None))
+        for subj, sec, batch in self._index.assignments(teacher, day, period):
+            if batch or self.theory.grouped.get(sec, 0) & SLOT_BITS[day][period]:
+                return None
+            if sec != section:
+                found.append(Blocker(sec, subj, teacher, None))
+        return found
+
+    # --- views ---
+    def as_dicts(self):
+        return [e.as_dict() for e in self.explanations]
+
+    def rows(self):
+        rows = []
+        for e in self.explanations:
+            slot, found = e.cheapest
+            fix = (f"{DAY_NAMES[slot[0]]} P{slot[1]+1}: move " +
+                   ", ".join(f"{b.subject} ({b.section})" for b in found)) if slot else "none without moving labs/prebookings"
+            rows.append([e.section, e.subject, e.teacher or "-", e.missing] +
+                        [e.reasons.get(reason, 0).bit_count() for reason in REASONS] + [fix])
+        return rows
+
+    def print_table(self):
+        print("\n=== UNPLACED: WHY ===")
+        print(f"{'Class':<7}{'Subject':<30}{'Teacher':<20}{'Left':>5}" +
+              "".join(f"{r[:10]:>12}" for r in REASONS) + "  Cheapest fix")
+        for row in self.rows():
+            print(f"{row[0]:<7}{row[1][:28]:<30}{row[2][:18]:<20}{row[3]:>5}" +
+                  "".join(f"{n:>12}" for n in row[4:4 + len(REASONS)]) + f"  {row[-1]}")
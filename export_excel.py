@@ -1,168 +1,132 @@
-import pandas as pd
-import random
-from collections import defaultdict
-from openpyxl import load_workbook
-from openpyxl.styles import Border, Side
-from generate_timetable import (
-    LabTimetable, TheoryTimetable,
-    LAB_SUBJECTS, PREBOOKED, DAYS, PERIODS
-)
-from variables import YEARS_SECTIONS, SUBJECTS_PER_YEAR, TEACHER_ASSIGNMENTS
-
-
-# ---------------- Helper for borders ----------------
-def add_borders(ws):
-    thin = Side(border_style="thin", color="000000")
-    border = Border(left=thin, right=thin, top=thin, bottom=thin)
-    for row in ws.iter_rows():
-        for cell in row:
-            if cell.value not in [None, ""]:
-                cell.border = border
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Border, Font, Side
+from export_pipeline import ExcelSink
+from teacher_index import TeacherIndex
+from variables import DAYS, PERIODS, DAY_NAMES, SUBJECTS_PER_YEAR, TEACHER_ASSIGNMENTS, ATTEMPTS, ENGINE, OPTIMIZE_SECONDS
+
+THIN = Side(border_style="thin", color="000000")
+BORDER = Border(left=THIN, right=THIN, top=THIN, bottom=THIN)
+HEADER_FONT = Font(bold=True)
+
+
+# ---------------- Streaming sheet writer ----------------
+# Rows go straight into a write-only workbook with their style set on the cell,
+# so nothing is buffered per sheet and the file is saved exactly once.
+class SheetWriter:
+    def __init__(self, wb, title, bordered=True):
+        self.ws = wb.create_sheet(title)
+        self.bordered = bordered
+
+    def row(self, values, header=False):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(self.ws, value=value)
+            if value not in (None, "") and (self.bordered or header):
+                cell.border = BORDER
+            if header:
+                cell.font = HEADER_FONT
+            cells.append(cell)
+        self.ws.append(cells)
+
+    def blank(self, count=1):
+        for _ in range(count):
+            self.ws.append([])
+
+    def timetable(self, title, grid):
+        self.row([title])
+        self.row(["Day"] + [f"P{i+1}" for i in range(PERIODS)])
+        for d in range(DAYS):
+            self.row([DAY_NAMES[d]] + grid[d])
+
+
+def slot_text(slot):
+    return f"{slot[0]} ({slot[1]})" if slot else "-"
+
+
+def lab_text(b1, b2):
+    return "/".join(f"{slot[0]}-{batch}" for slot, batch in ((b1, "B1"), (b2, "B2")) if slot)
 
 
 # ---------------- Export Function ----------------
-def export_to_excel(filename="timetable_export.xlsx"):
-    random.seed(42)
-    teacher_busy = defaultdict(lambda: [[False]*PERIODS for _ in range(DAYS)])
-
-    # Generate timetables
-    lab_gen = LabTimetable(LAB_SUBJECTS, teacher_busy, prebooked=PREBOOKED)
-    lab_gen.generate_lab_pairs()
-    theory_gen = TheoryTimetable(
-        YEARS_SECTIONS, SUBJECTS_PER_YEAR,
-        TEACHER_ASSIGNMENTS, teacher_busy,
-        lab_gen.lab_schedules
-    )
-    theory_gen.generate_timetable()
-
-    day_names = ["Mon", "Tue", "Wed", "Thu", "Fri"]
-
-    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-        # 1. Teachers_Subjects - Sorted class wise
-        teacher_subjects = []
-        for teacher, assignments in TEACHER_ASSIGNMENTS.items():
-            for sec, subj in assignments:
-                teacher_subjects.append([sec, teacher, subj])
-        df_teachers = pd.DataFrame(
-            sorted(teacher_subjects, key=lambda x: (x[0], x[2])),
-            columns=["Class", "Teacher", "Subject"]
-        )
-        df_teachers.to_excel(writer, sheet_name="Teachers_Subjects", index=False)
-
-        # 2. Years_Subjects
-        year_subjects = []
-        for year, subs in SUBJECTS_PER_YEAR.items():
-            for subj, freq in subs.items():
-                year_subjects.append([year, subj, freq])
-        pd.DataFrame(year_subjects, columns=["Year", "Subject", "Frequency"])\
-            .to_excel(writer, sheet_name="Years_Subjects", index=False)
-
-        # 3. Lab_Timetables (B1, B2) + borders
-        lab_rows = []
-        for section in sorted(lab_gen.lab_schedules):
-            # B1
-            lab_rows.append([f"{section} - B1"])
-            lab_rows.append(["Day"] + [f"P{i+1}" for i in range(PERIODS)])
-            for d in range(DAYS):
-                row = [day_names[d]]
-                for p in range(PERIODS):
-                    slot = lab_gen.lab_schedules[section]['B1'][d][p]
-                    row.append(slot[0] if slot else "-")
-                lab_rows.append(row)
-            lab_rows.append([])
-
-            # B2
-            lab_rows.append([f"{section} - B2"])
-            lab_rows.append(["Day"] + [f"P{i+1}" for i in range(PERIODS)])
-            for d in range(DAYS):
-                row = [day_names[d]]
-                for p in range(PERIODS):
-                    slot = lab_gen.lab_schedules[section]['B2'][d][p]
-                    row.append(slot if slot else "-")
-                lab_rows.append(row)
-            lab_rows.extend([[], [], [], []])
-        pd.DataFrame(lab_rows).to_excel(writer, sheet_name="Lab_Timetables", index=False, header=False)
-
-        # 4. Theory_Timetables + borders
-        theory_rows = []
-        for section in sorted(theory_gen.class_schedules):
-            theory_rows.append([section])
-            theory_rows.append(["Day"] + [f"P{i+1}" for i in range(PERIODS)])
-            for d in range(DAYS):
-                row = [day_names[d]]
-                for p in range(PERIODS):
-                    slot = theory_gen.class_schedules[section][d][p]
-                    row.append(slot if slot else "-")
-                theory_rows.append(row)
-            theory_rows.extend([[], [], [], []])
-        pd.DataFrame(theory_rows).to_excel(writer, sheet_name="Theory_Timetables", index=False, header=False)
-
-        # 5. Merged_Timetables (Lab + Theory)
-        merged_rows = []
-        for section in sorted(theory_gen.class_schedules):
-            merged_rows.append([f"{section} - Merged"])
-            merged_rows.append(["Day"] + [f"P{i+1}" for i in range(PERIODS)])
-            for d in range(DAYS):
-                row = [day_names[d]]
-                for p in range(PERIODS):
-                    cell_content = "-"
-                    if section in lab_gen.lab_schedules and (
-                        lab_gen.lab_schedules[section]['B1'][d][p] or lab_gen.lab_schedules[section]['B2'][d][p]
-                    ):
-                        subjects = []
-                        b1 = lab_gen.lab_schedules[section]['B1'][d][p]
-                        b2 = lab_gen.lab_schedules[section]['B2'][d][p]
-                        if b1:
-                            subjects.append(f"{b1[0]}-B1")
-                        if b2:
-                            subjects.append(f"{b2}-B2")
-                        cell_content = "/".join(subjects) if subjects else "-"
-                    else:
-                        slot = theory_gen.class_schedules[section][d][p]
-                        cell_content = slot if slot else "-"
-                    row.append(cell_content)
-                merged_rows.append(row)
-            merged_rows.extend([[], [], [], []])
-        pd.DataFrame(merged_rows).to_excel(writer, sheet_name="Merged_Timetables", index=False, header=False)
-
-        # 6. Teacher_Timetables (Subject (Class))
-        teacher_tt_rows = []
-        for teacher in sorted(TEACHER_ASSIGNMENTS.keys()):
-            teacher_tt_rows.append([teacher])
-            teacher_tt_rows.append(["Day"] + [f"P{i+1}" for i in range(PERIODS)])
-            for d in range(DAYS):
-                row = [day_names[d]]
-                for p in range(PERIODS):
-                    found = "-"
-                    # Check labs
-                    for section, batches in lab_gen.lab_schedules.items():
-                        for batch, sched in batches.items():
-                            slot = sched[d][p]
-                            if slot and slot[1] == teacher:
-                                found = f"{slot} ({section}-{batch})"
-                                break
-                        if found != "-":
-                            break
-                    # Check theory
-                    if found == "-":
-                        for section, sched in theory_gen.class_schedules.items():
-                            slot = sched[d][p]
-                            if slot and slot[1] == teacher:
-                                found = f"{slot} ({section})"
-                                break
-                    row.append(found)
-                teacher_tt_rows.append(row)
-            teacher_tt_rows.extend([[], [], [], []])
-        pd.DataFrame(teacher_tt_rows).to_excel(writer, sheet_name="Teacher_Timetables", index=False, header=False)
-
-    # Apply borders
-    wb = load_workbook(filename)
-    for sheet in ["Lab_Timetables", "Theory_Timetables", "Merged_Timetables", "Teacher_Timetables"]:
-        add_borders(wb[sheet])
+def write_workbook(filename, lab_schedules, class_schedules):
+    wb = Workbook(write_only=True)
+
+    # 1. Teachers_Subjects - Sorted class wise
+    sheet = SheetWriter(wb, "Teachers_Subjects", bordered=False)
+    sheet.row(["Class", "Teacher", "Subject"], header=True)
+    teacher_subjects = [[sec, teacher, subj]
+                        for teacher, assignments in TEACHER_ASSIGNMENTS.items() for sec, subj in assignments]
+    for row in sorted(teacher_subjects, key=lambda x: (x[0], x[2])):
+        sheet.row(row)
+
+    # 2. Years_Subjects
+    sheet = SheetWriter(wb, "Years_Subjects", bordered=False)
+    sheet.row(["Year", "Subject", "Frequency"], header=True)
+    for year, subs in SUBJECTS_PER_YEAR.items():
+        for subj, freq in subs.items():
+            sheet.row([year, subj, freq])
+
+    # 3. Lab_Timetables (B1, B2)
+    sheet = SheetWriter(wb, "Lab_Timetables")
+    for section in sorted(lab_schedules):
+        for batch in ("B1", "B2"):
+            grid = lab_schedules[section][batch]
+            sheet.timetable(f"{section} - {batch}", [[slot[0] if slot else "-" for slot in row] for row in grid])
+            sheet.blank(1 if batch == "B1" else 4)
+
+    # 4. Theory_Timetables
+    sheet = SheetWriter(wb, "Theory_Timetables")
+    for section in sorted(class_schedules):
+        sheet.timetable(section, [[slot_text(slot) for slot in row] for row in class_schedules[section]])
+        sheet.blank(4)
+
+    # 5. Merged_Timetables (Lab + Theory)
+    sheet = SheetWriter(wb, "Merged_Timetables")
+    for section in sorted(class_schedules):
+        labs = lab_schedules.get(section)
+        grid = []
+        for d in range(DAYS):
+            row = []
+            for p in range(PERIODS):
+                if labs and (labs['B1'][d][p] or labs['B2'][d][p]):
+                    row.append(lab_text(labs['B1'][d][p], labs['B2'][d][p]))
+                else:
+                    row.append(slot_text(class_schedules[section][d][p]))
+            grid.append(row)
+        sheet.timetable(f"{section} - Merged", grid)
+        sheet.blank(4)
+
+    # 6. Teacher_Timetables (Subject (Class)) from the inverted teacher index
+    index = TeacherIndex(lab_schedules, class_schedules)
+    sheet = SheetWriter(wb, "Teacher_Timetables")
+    for teacher in sorted(set(TEACHER_ASSIGNMENTS) | set(index.teachers())):
+        sheet.timetable(teacher, index.grid(teacher))
+        sheet.blank(4)
+
     wb.save(filename)
 
+
+def export_to_excel(filename="timetable_export.xlsx", seed=42, attempts=ATTEMPTS, workers=None, engine=ENGINE,
+                    load=None, optimize=OPTIMIZE_SECONDS):
+    import timetable
+    # Reuse a saved week instead of regenerating it
+    week = timetable.load(load) if load else timetable.generate(seed, attempts, workers, engine,
+                                                                optimize=optimize)
+    week.export([ExcelSink(filename)])
     print(f"✅ Timetable exported to {filename} with formatting & Pylance-clean code.")
 
 
 if __name__ == "__main__":
-    export_to_excel()
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate the timetables and export them to Excel.")
+    parser.add_argument("filename", nargs="?", default="timetable_export.xlsx")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the first attempt")
+    parser.add_argument("--attempts", type=int, default=ATTEMPTS, help="independent seeds to try")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--engine", choices=["greedy", "exact"], default=ENGINE, help="placement engine")
+    parser.add_argument("--load", metavar="PATH", help="export a schedule saved with --save instead of generating one")
+    parser.add_argument("--optimize", type=float, default=OPTIMIZE_SECONDS, metavar="SECONDS",
+                        help="improve idle gaps, day balance and early periods for this long")
+    args = parser.parse_args()
+    export_to_excel(args.filename, args.seed, args.attempts, args.workers, args.engine, args.load, args.optimize)
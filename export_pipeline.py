@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+import csv
+import datetime
+import html
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+from model import cell_classes, group_cell
+from variables import DAYS, PERIODS, DAY_NAMES, PERIOD_TIMES, TERM_WEEKS
+
+ICS_DAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+
+# ------------ NORMALIZED RECORDS -------------
+class Record(NamedTuple):
+    entity: str             # section the period belongs to
+    day: int
+    period: int
+    subject: str
+    teacher: str
+    batch: Optional[str]    # 'B1'/'B2' for labs, None for theory
+    weeks: Optional[tuple] = None   # term weeks (1-based) it runs in; None: every week
+
+
+class ScheduleRecords:
+    # One traversal of the grids; every sink reads the same immutable records
+    def __init__(self, lab_schedules, class_schedules):
+        self.sections = sorted(class_schedules)
+        self.lab_sections = sorted(lab_schedules)
+        records = []
+        for section, batches in lab_schedules.items():
+            for batch, grid in batches.items():
+                records.extend(Record(section, d, p, slot[0], slot[1], batch)
+                               for d, row in enumerate(grid) for p, slot in enumerate(row) if slot)
+        for section, grid in class_schedules.items():
+            # (a group slot is one record per class, so each teacher gets their own)
+            records.extend(Record(section, d, p, subject, teacher, None)
+                           for d, row in enumerate(grid) for p, slot in enumerate(row) if slot
+                           for subject, teacher in cell_classes(slot))
+        records.sort(key=lambda r: (r.entity, r.day, r.period, r.batch or ""))
+        self.records = tuple(records)
+
+    @classmethod
+    def merge_weeks(cls, parts, weeks=TERM_WEEKS):
+        # One record set for a whole term from (week numbers, ScheduleRecords)
+        # per week pattern; a period held in every week keeps weeks=None
+        held: dict[Record, set] = {}
+        for numbers, data in parts:
+            for r in data.records:
+                held.setdefault(r, set()).update(numbers)
+        every = set(range(1, weeks + 1))
+        merged = cls({}, {})
+        merged.sections = sorted({sec for _, data in parts for sec in data.sections})
+        merged.lab_sections = sorted({sec for _, data in parts for sec in data.lab_sections})
+        merged.records = tuple(sorted((r if w >= every else r._replace(weeks=tuple(sorted(w)))
+                                       for r, w in held.items()),
+                                      key=lambda r: (r.entity, r.day, r.period, r.batch or "", r.weeks or ())))
+        return merged
+
+    def grids(self):
+        # Back to the generators' nested-list shape, for sinks that lay out grids
+        lab_schedules = {sec: {b: [[None]*PERIODS for _ in range(DAYS)] for b in ('B1', 'B2')}
+                         for sec in self.lab_sections}
+        class_schedules = {sec: [[None]*PERIODS for _ in range(DAYS)] for sec in self.sections}
+        for r in self.records:
+            if r.batch:
+                lab_schedules[r.entity][r.batch][r.day][r.period] = (r.subject, r.teacher)
+            elif class_schedules[r.entity][r.day][r.period]:
+                classes = cell_classes(class_schedules[r.entity][r.day][r.period]) + ((r.subject, r.teacher),)
+                class_schedules[r.entity][r.day][r.period] = group_cell(" / ".join(s for s, _ in classes), classes)
+            else:
+                class_schedules[r.entity][r.day][r.period] = (r.subject, r.teacher)
+        return lab_schedules, class_schedules
+
+    def by_teacher(self):
+        grouped: dict[str, list[Record]] = {}
+        for r in self.records:
+            grouped.setdefault(r.teacher, []).append(r)
+        return grouped
+
+
+def _label(r):
+    label = f"{r.subject} ({r.entity}-{r.batch})" if r.batch else f"{r.subject} ({r.entity})"
+    return f"{label} [wk {week_text(r.weeks)}]" if r.weeks else label
+
+
+def week_text(weeks):
+    # (1, 2, 3, 5, 7) -> "1-3,5,7"
+    runs = []
+    for w in weeks:
+        if runs and w == runs[-1][1] + 1:
+            runs[-1][1] = w
+        else:
+            runs.append([w, w])
+    return ",".join(f"{a}-{b}" if b > a else f"{a}" for a, b in runs)
+
+
+def _ics_text(text):
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+
+
+# ------------ SINKS -------------
+# A sink turns ScheduleRecords into one output format; write() returns what it produced.
+class ExcelSink:
+    def __init__(self, filename="timetable_export.xlsx"):
+        self.filename = filename
+
+    def write(self, data):
+        from export_excel import write_workbook   # openpyxl only loads when Excel is asked for
+        write_workbook(self.filename, *data.grids())
+        return self.filename
+
+
+class CsvSink:
+    def __init__(self, filename="timetable.csv"):
+        self.filename = filename
+
+    def write(self, data):
+        with open(self.filename, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["Class", "Day", "Period", "Subject", "Teacher", "Batch", "Weeks"])
+            for r in data.records:
+                writer.writerow([r.entity, DAY_NAMES[r.day], f"P{r.period+1}", r.subject, r.teacher, r.batch or "",
+                                 week_text(r.weeks) if r.weeks else ""])
+        return self.filename
+
+
+class JsonSink:
+    def __init__(self, filename="timetable.json"):
+        self.filename = filename
+
+    def write(self, data):
+        with open(self.filename, "w", encoding="utf-8") as f:
+            json.dump({"sections": data.sections, "lab_sections": data.lab_sections,
+                       "records": [r._asdict() for r in data.records]}, f, indent=1)
+        return self.filename
+
+
+class IcsSink:
+    # One calendar per teacher with a weekly recurring event per period; a
+    # period that skips some term weeks lists those as EXDATEs
+    def __init__(self, directory="calendars", term_start=None, weeks=TERM_WEEKS):
+        self.directory = directory
+        today = datetime.date.today()
+        self.term_start = term_start or today + datetime.timedelta(days=-today.weekday() % 7)
+        self.weeks = weeks
+
+    def write(self, data):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        written = []
+        for teacher, records in data.by_teacher().items():
+            lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//TimeTableProject//EN",
+                     f"X-WR-CALNAME:{_ics_text(teacher)}"]
+            for r in records:
+                date = (self.term_start + datetime.timedelta(days=r.day)).strftime("%Y%m%d")
+                start, end = (t.replace(":", "") + "00" for t in PERIOD_TIMES[r.period])
+                uid = f"{r.entity}-{r.batch or 'T'}-{r.day}-{r.period}-{teacher}".replace(" ", "_")
+                if r.weeks:
+                    uid += f"-w{r.weeks[0]}"
+                lines += ["BEGIN:VEVENT", f"UID:{uid}@timetable", f"DTSTAMP:{stamp}",
+                          f"DTSTART:{date}T{start}", f"DTEND:{date}T{end}",
+                          f"RRULE:FREQ=WEEKLY;BYDAY={ICS_DAYS[r.day]};COUNT={self.weeks}"]
+                skipped = [w for w in range(1, self.weeks + 1) if r.weeks and w not in r.weeks]
+                if skipped:
+                    day = self.term_start + datetime.timedelta(days=r.day)
+                    lines.append("EXDATE:" + ",".join((day + datetime.timedelta(weeks=w - 1)).strftime("%Y%m%d") +
+                                                      f"T{start}" for w in skipped))
+                lines += [f"SUMMARY:{_ics_text(_label(r))}", "END:VEVENT"]
+            lines.append("END:VCALENDAR")
+            path = os.path.join(self.directory, "".join(c if c.isalnum() else "_" for c in teacher) + ".ics")
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                f.write("\r\n".join(lines) + "\r\n")
+            written.append(path)
+        return written
+
+
+class HtmlSink:
+    def __init__(self, filename="timetable.html"):
+        self.filename = filename
+
+    def _table(self, title, cells):
+        head = "".join(f"<th>P{p+1}<br><small>{PERIOD_TIMES[p][0]}</small></th>" for p in range(PERIODS))
+        rows = "".join(f"<tr><th>{DAY_NAMES[d]}</th>" +
+                       "".join(f"<td>{html.escape(cells.get((d, p), '-'))}</td>" for p in range(PERIODS)) + "</tr>"
+                       for d in range(DAYS))
+        return f"<h3>{html.escape(title)}</h3><table><tr><th>Day</th>{head}</tr>{rows}</table>"
+
+    def write(self, data):
+        sections: dict[str, dict] = {sec: {} for sec in data.sections}
+        for r in data.records:
+            cell = sections.setdefault(r.entity, {})
+            text = f"{r.subject}-{r.batch}" if r.batch else r.subject
+            if r.weeks:
+                text += f" [wk {week_text(r.weeks)}]"
+            cell[(r.day, r.period)] = f"{cell[(r.day, r.period)]}/{text}" if (r.day, r.period) in cell else text
+        parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><title>Timetables</title>",
+                 "<style>table{border-collapse:collapse;margin-bottom:1em}td,th{border:1px solid #000;"
+                 "padding:2px 6px;font-size:12px}</style></head><body><h2>Sections</h2>"]
+        parts += [self._table(sec, sections[sec]) for sec in sorted(sections)]
+        parts.append("<h2>Teachers</h2>")
+        for teacher, records in sorted(data.by_teacher().items()):
+            cells: dict = {}
+            for r in records:
+                key = (r.day, r.period)
+                cells[key] = f"{cells[key]} / {_label(r)}" if key in cells else _label(r)
+            parts.append(self._table(teacher, cells))
+        parts.append("</body></html>")
+        with open(self.filename, "w", encoding="utf-8") as f:
+            f.write("\n".join(parts))
+        return self.filename
+
+
+# ------------ PIPELINE -------------
+def run_pipeline(lab_schedules, class_schedules, sinks, workers=None, records=None):
+    # records: ScheduleRecords already built for these grids (e.g. Timetable.records)
+    data = records or ScheduleRecords(lab_schedules, class_schedules)
+    if len(sinks) <= 1:
+        return [sink.write(data) for sink in sinks]
+    with ThreadPoolExecutor(max_workers=workers or len(sinks)) as pool:
+        return list(pool.map(lambda sink: sink.write(data), sinks))
+
+
+def add_output_arguments(parser):
+    parser.add_argument("--excel", metavar="FILE")
+    parser.add_argument("--csv", metavar="FILE")
+    parser.add_argument("--json", metavar="FILE")
+    parser.add_argument("--ics", metavar="DIR", help="one .ics calendar per teacher")
+    parser.add_argument("--html", metavar="FILE")
+
+
+def sinks_from_args(args):
+    sinks = []
+    if args.excel:
+        sinks.append(ExcelSink(args.excel))
+    if args.csv:
+        sinks.append(CsvSink(args.csv))
+    if args.json:
+        sinks.append(JsonSink(args.json))
+    if args.ics:
+        sinks.append(IcsSink(args.ics))
+    if args.html:
+        sinks.append(HtmlSink(args.html))
+    return sinks
+
+
+def main(args):
+    sinks = sinks_from_args(args)
+    if not sinks:
+        print("Nothing to export: pick at least one of --excel/--csv/--json/--ics/--html")
+        return
+
+    import timetable
+    week = timetable.load(args.load) if args.load else timetable.generate(
+        args.seed, args.attempts, args.workers, args.engine, optimize=args.optimize)
+    for output in week.export(sinks):
+        print(f"✅ Exported {len(output)} calendars" if isinstance(output, list) else f"✅ Exported {output}")
+
+
+if __name__ == "__main__":
+    import argparse
+    from variables import ATTEMPTS, ENGINE, OPTIMIZE_SECONDS
+    parser = argparse.ArgumentParser(description="Export the timetables to any mix of formats in one pass.")
+    add_output_arguments(parser)
+    parser.add_argument("--load", metavar="PATH", help="export a schedule saved with --save instead of generating one")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--attempts", type=int, default=ATTEMPTS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--engine", choices=["greedy", "exact"], default=ENGINE)
+    parser.add_argument("--optimize", type=float, default=OPTIMIZE_SECONDS, metavar="SECONDS")
+    main(parser.parse_args())
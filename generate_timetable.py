@@ -1,157 +1,373 @@
 #!/usr/bin/env python3
-import random
+import time
 from collections import defaultdict
+from functools import reduce
+from operator import or_
 from typing import Optional, Tuple
-from variables import YEARS_SECTIONS, SUBJECTS_PER_YEAR, TEACHER_ASSIGNMENTS
 
 # ------------ CONFIG -------------
-from variables import LAB_SUBJECTS, PREBOOKED, DAYS, PERIODS, MAX_THEORY_PASSES, DEBUG_PLACEMENT 
+from variables import DAYS, PERIODS, DAY_NAMES, MAX_THEORY_PASSES, DEBUG_PLACEMENT, VERBOSE
+from variables import REPAIR_MAX_DEPTH, ATTEMPTS, ENGINE, PROFILE, OPTIMIZE_SECONDS, RESULT_CACHE
+from occupancy import Occupancy, SLOT_BITS, DAY_BITS, WEEK_MASK, CLOSED_SLOTS, iter_slots
+from repair import RepairEngine
+from lab_placement import LabPlacer
+from profiling import Profiler, phase
+from streams import Streams, derive
+from diagnostics import InfeasibilityReport
+from model import compile_model, current_config, ModelError
 
 # ------------ LAB SCHEDULER -------------
 class LabTimetable:
-    def __init__(self, lab_subjects, teacher_busy, prebooked=None):
+    def __init__(self, lab_subjects, occupancy, prebooked=None, teacher_limits=None, rooms=None):
         self.lab_subjects = lab_subjects
-        self.teacher_busy = teacher_busy
+        self.occupancy = occupancy
         self.days = DAYS
         self.periods_per_day = PERIODS
         self.prebooked = prebooked if prebooked else {}
+        self.occupancy.block_prebooked(self.prebooked)
+        self.occupancy.set_teacher_limits(teacher_limits or {})
+        if rooms:
+            self.occupancy.set_rooms(rooms)
+        # (section, day, start) -> [B1 room, B2 room]; None for a lab no room lists
+        self.lab_rooms: dict[Tuple[str, int, int], list] = {}
         self.lab_schedules: dict[str, dict[str, list[list[Optional[Tuple[str, str]]]]]] = {
             sec: {'B1': [[None]*PERIODS for _ in range(DAYS)],
                   'B2': [[None]*PERIODS for _ in range(DAYS)]}
             for sec in lab_subjects
         }
+        self.labs_per_day: dict[str, list[int]] = {sec: [0]*DAYS for sec in lab_subjects}
+        self.profiler: Optional[Profiler] = None
+        self.rng = Streams()        # seeded per run (build_timetables)
 
     def can_schedule_pair(self, section, b1_sub, b1_teacher, b2_sub, b2_teacher, day, start):
         if start % 2 != 0 or start > self.periods_per_day - 2:
             return False
-        for p in (start, start+1):
-            if self.lab_schedules[section]['B1'][day][p] or self.lab_schedules[section]['B2'][day][p]:
-                return False
-            if self.teacher_busy[b1_teacher][day][p] or self.teacher_busy[b2_teacher][day][p]:
-                return False
-            if b1_teacher in self.prebooked and (day, p) in self.prebooked[b1_teacher]:
-                return False
-            if b2_teacher in self.prebooked and (day, p) in self.prebooked[b2_teacher]:
-                return False
-        return True
+        occ = self.occupancy
+        bits = SLOT_BITS[day][start] | SLOT_BITS[day][start+1]
+        blocked = occ.section_busy(section) | occ.teacher_blocked(b1_teacher) | occ.teacher_blocked(b2_teacher)
+        blocked |= occ.lab_start_limited(b1_teacher) | occ.lab_start_limited(b2_teacher)
+        if occ.rooms:
+            blocked |= ~occ.rooms.pair_free(b1_sub, b2_sub) & SLOT_BITS[day][start]
+        if self.profiler:
+            self.profiler.count("lab_pair_checks")
+        return not blocked & bits
 
     def place_lab_pair(self, section, b1_sub, b1_teacher, b2_sub, b2_teacher, day, start):
+        # Callers check can_schedule_pair first; a block whose ROOMS labs find no room is never placed
+        bits = SLOT_BITS[day][start] | SLOT_BITS[day][start+1]
+        occ = self.occupancy
+        rooms = occ.rooms.assign((b1_sub, b2_sub), bits) if occ.rooms else None
+        if occ.rooms and rooms is None:
+            raise ValueError(f"no room for {b1_sub}/{b2_sub} ({section}) on {DAY_NAMES[day]} P{start+1}")
         for p in (start, start+1):
             self.lab_schedules[section]['B1'][day][p] = (b1_sub, b1_teacher)
             self.lab_schedules[section]['B2'][day][p] = (b2_sub, b2_teacher)
-            self.teacher_busy[b1_teacher][day][p] = True
-            self.teacher_busy[b2_teacher][day][p] = True
-
-    def generate_lab_pairs(self):
-        labs_per_day = defaultdict(lambda: defaultdict(int))
-        for section, labs in self.lab_subjects.items():
-            if len(labs) < 2:
-                continue
-            # Prefer later start periods for labs (P5=4, then P3=2, then P1=0)
-            possible_slots = [(d, s) for d in range(self.days) for s in [4, 2, 0]]
-            random.shuffle(possible_slots)
-            for i in range(len(labs)):
-                subj1, t1 = labs[i]
-                subj2, t2 = labs[(i+1) % len(labs)]
-                placed = False
-                for day, start in possible_slots:
-                    if labs_per_day[section][day] >= 2:
-                        continue
-                    if self.can_schedule_pair(section, subj1, t1, subj2, t2, day, start):
-                        self.place_lab_pair(section, subj1, t1, subj2, t2, day, start)
-                        labs_per_day[section][day] += 1
-                        placed = True
-                        break
-                if not placed:
-                    print(f"WARNING: Could not place labs {subj1}/{subj2} for {section}")
+        occ.book_lab(section, 'B1', b1_teacher, bits)
+        occ.book_lab(section, 'B2', b2_teacher, bits)
+        self.labs_per_day[section][day] += 1
+        if rooms is not None:
+            for room in rooms:
+                if room:
+                    occ.rooms.book(room, bits)
+            self.lab_rooms[(section, day, start)] = rooms
+
+    def remove_lab_pair(self, section, day, start):
+        bits = SLOT_BITS[day][start] | SLOT_BITS[day][start+1]
+        for room in self.lab_rooms.pop((section, day, start), ()):
+            if room:
+                self.occupancy.rooms.release(room, bits)
+        for batch in ('B1', 'B2'):
+            _, teacher = self.lab_schedules[section][batch][day][start]
+            self.occupancy.release_lab(section, batch, teacher, bits)
+            for p in (start, start+1):
+                self.lab_schedules[section][batch][day][p] = None
+        self.labs_per_day[section][day] -= 1
+
+    def generate_lab_pairs(self, sections=None):
+        # Pairs and blocks for all sections are chosen together (see lab_placement)
+        placer = LabPlacer(self, sections)
+        placer.solve()
+        if self.profiler:
+            self.profiler.count("lab_nodes", placer.nodes)
+
+    def lab_room(self, section, batch, day, period):
+        rooms = self.lab_rooms.get((section, day, period - period % 2))
+        return rooms[0 if batch == 'B1' else 1] if rooms else None
 
     def print_lab_timetables(self):
-        days = ["Mon", "Tue", "Wed", "Thu", "Fri"]
-        for section in sorted(self.lab_schedules):
-            for batch in ('B1', 'B2'):
-                print(f"\nSection {section}-{batch} Labs:")
-                print("Day  " + "".join(f"P{i+1:^12}" for i in range(self.periods_per_day)))
-                for d in range(self.days):
-                    row = f"{days[d]:<4}"
-                    for p in range(self.periods_per_day):
-                        slot = self.lab_schedules[section][batch][d][p]
-                        display = slot[0] if slot else "-"
-                        row += f"{display:^12}"
-                    print(row)
+        print_lab_timetables(self.lab_schedules, self.lab_room)
 
 
 # ------------ THEORY SCHEDULER -------------
 class TheoryTimetable:
-    def __init__(self, years_sections, subjects_per_year, teacher_assignments, teacher_busy, lab_schedules):
+    def __init__(self, years_sections, subjects_per_year, teacher_assignments, occupancy, lab_schedules,
+                 model=None):
         self.years_sections = years_sections
         self.subjects_per_year = subjects_per_year
         self.teacher_assignments = teacher_assignments
-        self.teacher_busy = teacher_busy
+        self.occupancy = occupancy
         self.lab_schedules = lab_schedules
         self.days = DAYS
         self.periods_per_day = PERIODS
-        self.section_subject_teacher: dict[Tuple[str, str], str] = {}
-        for t, pairs in teacher_assignments.items():
-            for sec, subj in pairs:
-                self.section_subject_teacher[(sec, subj)] = t
+        # Taken from a compiled model when given, otherwise derived from the dicts
+        if model is not None:
+            self.section_subject_teacher = dict(model.section_subject_teacher)
+            self.section_demand = model.section_demand
+            self.groups = model.groups
+        else:
+            self.section_subject_teacher = {(sec, subj): t for t, pairs in teacher_assignments.items()
+                                            for sec, subj in pairs}
+            self.section_demand = {f"{y}{s}": subjects_per_year.get(y, {})
+                                   for y, secs in years_sections.items() for s in secs}
+            self.groups = []
+        # (section, grid subject) -> CLASS_GROUPS group whose cells those are
+        self.group_of = {(sec, group.cell[0]): group for group in self.groups for sec in group.sections}
         self.class_schedules: dict[str, list[list[Optional[Tuple[str, str]]]]] = {
             f"{y}{s}": [[None]*PERIODS for _ in range(DAYS)]
             for y, secs in years_sections.items() for s in secs
         }
+        # Incremental indexes, kept in step by place_class
+        self.day_load: dict[str, list[int]] = {sec: [0]*DAYS for sec in self.class_schedules}
+        self.section_keys: dict[str, list[Tuple[str, str]]] = defaultdict(list)
+        self.teacher_keys: dict[str, list[Tuple[str, str]]] = defaultdict(list)
+        for (sec, subj), t in self.section_subject_teacher.items():
+            self.section_keys[sec].append((sec, subj))
+            self.teacher_keys[t].append((sec, subj))
+        self.candidates: dict[Tuple[str, str], int] = {}
+        # (section, day, period) -> room, for subjects that ROOMS lists
+        self.class_rooms: dict[Tuple[str, int, int], str] = {}
+        # Slots whose classes the repair stage must leave where they are
+        self.locked: dict[str, int] = defaultdict(int)
+        self.grouped: dict[str, int] = defaultdict(int)     # slots held by a group, locked for good
+        self.profiler: Optional[Profiler] = None
+        self.rng = Streams()        # seeded per run (build_timetables)
 
-    def can_schedule(self, section, day, period, subject, relax_rules=False, debug=False):
+    def index_candidates(self):
+        # Free slots per (section, subject) under the hard rules: section free,
+        # teacher free and not prebooked. Once-per-day/back-to-back are applied on top.
+        occ = self.occupancy
+        self.candidates = {
+            (sec, subj): WEEK_MASK & ~(occ.section_busy(sec) | occ.teacher_blocked(t))
+            for (sec, subj), t in self.section_subject_teacher.items()
+            if sec in self.class_schedules
+        }
+
+    def candidate_slots(self, section, subject, relax_rules=False):
+        free = self.candidates.get((section, subject), 0)
+        if free:
+            occ = self.occupancy
+            teacher = self.section_subject_teacher[(section, subject)]
+            free &= ~occ.teacher_limited(teacher)
+            if occ.rooms.bound(subject):
+                free &= occ.rooms.subject_free(subject)
+            if not relax_rules:
+                free &= ~(occ.free_day_slots(teacher) | occ.subject_day_slots(section, subject) |
+                          occ.subject_neighbours(section, subject))
+        return free
+
+    def blocking_rule(self, section, day, period, subject, relax_rules=False):
+        # First rule that keeps the subject off this slot, or None when it fits
         teacher = self.section_subject_teacher.get((section, subject))
         if not teacher:
-            if debug: print(f"[NO TEACHER] {section} {subject}")
-            return False
-        if section in self.lab_schedules and (
-            self.lab_schedules[section]['B1'][day][period] or
-            self.lab_schedules[section]['B2'][day][period]
-        ):
-            if debug: print(f"[LAB CONFLICT] {section} {subject} at {day},{period}")
-            return False
-        if self.class_schedules[section][day][period]:
-            if debug: print(f"[CLASS OCCUPIED] {section} {subject} at {day},{period}")
-            return False
-        if self.teacher_busy[teacher][day][period]:
-            if debug: print(f"[TEACHER BUSY] {teacher} at {day},{period}")
-            return False
+            return "NO TEACHER"
+        occ = self.occupancy
+        bit = SLOT_BITS[day][period]
+        if CLOSED_SLOTS & bit:
+            return "CLOSED"
+        if occ.section_labs.get(section, 0) & bit:
+            return "LAB CONFLICT"
+        if occ.classes.get(section, 0) & bit:
+            return "CLASS OCCUPIED"
+        if occ.teacher_blocked(teacher) & bit:
+            return "TEACHER BUSY"
+        if occ.teacher_limited(teacher) & bit:
+            return "TEACHER LIMIT"
+        if not occ.rooms.subject_free(subject) & bit:
+            return "NO ROOM"
         if not relax_rules:
-            if any(slot and slot == subject for slot in self.class_schedules[section][day]):
-                if debug: print(f"[ONCE/DAY FAIL] {section} {subject} on day {day}")
-                return False
-            if period > 0 and self.class_schedules[section][day][period-1] and \
-               self.class_schedules[section][day][period-1] == subject:
-                if debug: print(f"[CONSEC BEFORE] {section} {subject} at p{period}")
-                return False
-            if period < self.periods_per_day-1 and self.class_schedules[section][day][period+1] and \
-               self.class_schedules[section][day][period+1] == subject:
-                if debug: print(f"[CONSEC AFTER] {section} {subject} at p{period}")
-                return False
-        return True
+            if occ.free_day_slots(teacher) & bit:
+                return "FREE DAY"
+            if occ.subject_day_slots(section, subject) & bit:
+                return "ONCE/DAY FAIL"
+            if occ.subject_neighbours(section, subject) & bit:
+                return "CONSEC"
+        return None
+
+    def blocking_masks(self, section, subject, relax_rules=False):
+        # blocking_rule for the whole week at once: disjoint (reason, slots) masks.
+        # A group's subject is blocked wherever any member or group teacher is.
+        group = self.group_of.get((section, subject))
+        if group:
+            sections, teachers = group.sections, group.teachers
+        elif (section, subject) in self.section_subject_teacher:
+            sections, teachers = (section,), (self.section_subject_teacher[(section, subject)],)
+        else:
+            return [("NO TEACHER", WEEK_MASK)]
+        occ = self.occupancy
+        masks = []
+        taken = 0
+        rules = [("CLOSED", CLOSED_SLOTS),
+                 ("LAB CONFLICT", reduce(or_, (occ.section_labs.get(s, 0) for s in sections))),
+                 ("CLASS OCCUPIED", reduce(or_, (occ.classes.get(s, 0) for s in sections))),
+                 ("TEACHER BUSY", reduce(or_, map(occ.teacher_blocked, teachers))),
+                 ("TEACHER LIMIT", reduce(or_, map(occ.teacher_limited, teachers))),
+                 ("NO ROOM", ~occ.rooms.subject_free(subject))]
+        if not relax_rules:
+            rules += [("FREE DAY", reduce(or_, map(occ.free_day_slots, teachers))),
+                      ("ONCE/DAY FAIL", occ.subject_day_slots(section, subject)),
+                      ("CONSEC", occ.subject_neighbours(section, subject))]
+        for reason, mask in rules:
+            mask &= WEEK_MASK & ~taken
+            if mask:
+                masks.append((reason, mask))
+                taken |= mask
+        return masks
+
+    def can_schedule(self, section, day, period, subject, relax_rules=False):
+        reason = self.blocking_rule(section, day, period, subject, relax_rules)
+        if self.profiler:
+            self.profiler.check(reason)
+        return reason is None
 
     def place_class(self, section, day, period, subject):
+        # Callers check can_schedule first; a ROOMS subject with no room left is never placed
         teacher = self.section_subject_teacher[(section, subject)]
+        rooms = self.occupancy.rooms
+        room = None
+        if rooms.bound(subject):
+            room = (rooms.assign((subject,), SLOT_BITS[day][period]) or [None])[0]
+            if room is None:
+                raise ValueError(f"no room for {subject} ({section}) on {DAY_NAMES[day]} P{period+1}")
         self.class_schedules[section][day][period] = (subject, teacher)
-        self.teacher_busy[teacher][day][period] = True
+        self.occupancy.book_class(section, subject, teacher, day, period)
+        self.day_load[section][day] += 1
+        if room:
+            rooms.book(room, SLOT_BITS[day][period])
+            self.class_rooms[(section, day, period)] = room
+        self._take_candidates((section,), (teacher,), SLOT_BITS[day][period])
+
+    def _take_candidates(self, sections, teachers, bit):
+        if self.candidates:
+            clear = ~bit
+            for section in sections:
+                for key in self.section_keys[section]:
+                    self.candidates[key] &= clear
+            for teacher in teachers:
+                for key in self.teacher_keys[teacher]:
+                    if key in self.candidates:
+                        self.candidates[key] &= clear
+
+    def remove_class(self, section, day, period):
+        subject, teacher = self.class_schedules[section][day][period]
+        self.class_schedules[section][day][period] = None
+        occ = self.occupancy
+        occ.release_class(section, subject, teacher, day, period)
+        self.day_load[section][day] -= 1
+        room = self.class_rooms.pop((section, day, period), None)
+        if room:
+            occ.rooms.release(room, SLOT_BITS[day][period])
+        if self.candidates:
+            bit = SLOT_BITS[day][period]
+            for key in self.section_keys[section] + self.teacher_keys[teacher]:
+                if key in self.candidates and not (
+                    occ.section_busy(key[0]) | occ.teacher_blocked(self.section_subject_teacher[key])
+                ) & bit:
+                    self.candidates[key] |= bit
+        return subject
+
+    # --- synchronized groups (CLASS_GROUPS) ---
+    def group_free(self, group, relax_rules=False):
+        # Slots every member section and every group teacher can take at once,
+        # as one mask; the strict rules are read off the first member, whose
+        # group periods are the same as every other member's
+        occ = self.occupancy
+        busy = 0
+        for section in group.sections:
+            busy |= occ.section_busy(section)
+        for teacher in group.teachers:
+            busy |= occ.teacher_blocked(teacher) | occ.teacher_limited(teacher)
+            if not relax_rules:
+                busy |= occ.free_day_slots(teacher)
+        if not relax_rules:
+            label = group.cell[0]
+            busy |= occ.subject_day_slots(group.sections[0], label) | occ.subject_neighbours(group.sections[0], label)
+        return WEEK_MASK & ~busy
+
+    def place_group(self, group, day, period):
+        # The whole group in one slot; group slots are locked so that repair,
+        # the optimizer and incremental runs never split a group up
+        bit = SLOT_BITS[day][period]
+        for section in group.sections:
+            self.class_schedules[section][day][period] = group.cell
+            self.day_load[section][day] += 1
+            self.grouped[section] |= bit
+            self.locked[section] |= bit
+        self.occupancy.book_group(group.sections, group.cell[0], group.teachers, day, period)
+        self._take_candidates(group.sections, group.teachers, bit)
+
+    def group_left(self, group):
+        return group.periods - self.occupancy.subject_slots.get((group.sections[0], group.cell[0]), 0).bit_count()
+
+    def place_groups(self):
+        # Groups go in before any single class: most constrained first (fewest
+        # common free slots per period owed), each period on the slot whose
+        # busiest member day is lightest, strict rules first, then relaxed
+        for relax in (False, True):
+            order = sorted((g for g in self.groups if self.group_left(g)),
+                           key=lambda g: (self.group_free(g, relax).bit_count() / self.group_left(g), g.name))
+            for group in order:
+                for _ in range(self.group_left(group)):
+                    free = self.group_free(group, relax)
+                    if not free:
+                        break
+                    day, period = min(iter_slots(free), key=lambda s: (
+                        max(self.day_load[sec][s[0]] for sec in group.sections), s[1], s[0]))
+                    self.place_group(group, day, period)
+                    if self.profiler:
+                        self.profiler.count("group_placements")
+
+    def remaining_groups(self):
+        # Group periods still owed, under every member section
+        owed = defaultdict(list)
+        for group in self.groups:
+            for section in group.sections:
+                owed[section] += [group.cell[0]] * self.group_left(group)
+        return owed
+
+    def remaining_demand(self):
+        # Demand still owed per section, net of classes already on the grid
+        occ = self.occupancy
+        return {sec: [sub for sub, freq in self.section_demand[sec].items()
+                      for _ in range(freq - occ.subject_slots.get((sec, sub), 0).bit_count())]
+                for sec in self.class_schedules}
 
     def generate_timetable(self, max_iterations=MAX_THEORY_PASSES):
-        unplaced = {sec: [sub for sub, freq in self.subjects_per_year[sec[:-1]].items() for _ in range(freq)]
-                    for sec in self.class_schedules}
+        unplaced = self.remaining_demand()
+        profiler = self.profiler
+        with phase(profiler if self.groups else None, "groups"):
+            self.place_groups()
+        self.index_candidates()
+        self.passes_run = 0
+        theory_start = time.perf_counter()
+        stuck = False       # a strict pass placed nothing: the rest are relaxed
         for iteration in range(1, max_iterations+1):
-            relax = iteration > max_iterations // 2
-            print(f"\n--- Pass {iteration} (relax={relax}) ---")
+            if not any(unplaced.values()):
+                break
+            self.passes_run = iteration
+            relax = stuck or iteration > max_iterations // 2
+            if VERBOSE or profiler:
+                print(f"\n--- Pass {iteration} (relax={relax}) ---")
+            pass_start = time.perf_counter()
+            lookups = empty = 0
 
-            # Priority: Year 4 first
-            year4_sections = [s for s in unplaced if s.startswith("7")]
-            other_sections = [s for s in unplaced if not s.startswith("7")]
-            random.shuffle(year4_sections)
-            random.shuffle(other_sections)
-            sections = year4_sections + other_sections
+            # Priority: Year 4 first, then a random order that is fixed per
+            # (section, pass), so one section's place never depends on the others
+            sections = sorted(unplaced, key=lambda s: (not s.startswith("7"), self.rng.key("order", s, iteration)))
 
-            placed_any = False
+            placed = 0
             for sec in sections:
-                random.shuffle(unplaced[sec])
+                rng = self.rng("theory", sec)
+                rng.shuffle(unplaced[sec])
                 for subj in list(unplaced[sec]):
                     # Early period preference
                     if sec.startswith("7"):
@@ -159,97 +375,202 @@ class TheoryTimetable:
                     else:
                         early = [0, 1, 2]
                         late = [3, 4, 5]
-                        random.shuffle(early)
-                        random.shuffle(late)
+                        rng.shuffle(early)
+                        rng.shuffle(late)
                         period_order = early + late
 
+                    free = self.candidate_slots(sec, subj, relax_rules=relax)
+                    lookups += 1
+                    if profiler:
+                        for reason, mask in self.blocking_masks(sec, subj, relax):
+                            profiler.rejections[reason] += mask.bit_count()
+                    if not free:
+                        empty += 1
+                        continue
+
                     # Balance days: fewest scheduled first
-                    day_load = [(d, sum(1 for slot in self.class_schedules[sec][d] if slot)) for d in range(self.days)]
-                    day_load.sort(key=lambda x: x[1])
-                    days_by_load = [d for d, _ in day_load]
-
-                    day_periods = [(d, p) for d in days_by_load for p in period_order]
-
-                    for d, p in day_periods:
-                        if self.can_schedule(sec, d, p, subj, relax_rules=relax):
-                            self.place_class(sec, d, p, subj)
-                            unplaced[sec].remove(subj)
-                            placed_any = True
-                            break
-            if not placed_any:
-                break
-        self.post_repair(unplaced)
+                    load = self.day_load[sec]
+                    for d in sorted(range(self.days), key=load.__getitem__):
+                        day_free = free & DAY_BITS[d]
+                        if not day_free:
+                            continue
+                        p = next(p for p in period_order if day_free & SLOT_BITS[d][p])
+                        self.place_class(sec, d, p, subj)
+                        unplaced[sec].remove(subj)
+                        placed += 1
+                        break
+            if profiler:
+                profiler.count("candidate_lookups", lookups)
+                profiler.count("candidate_empty", empty)
+                profiler.emit("pass", **{"pass": iteration}, relax=relax, placed=placed,
+                              remaining=sum(map(len, unplaced.values())),
+                              seconds=round(time.perf_counter() - pass_start, 6))
+            if not placed:
+                if relax:
+                    break
+                stuck = True
+        if profiler:
+            profiler.record("theory", time.perf_counter() - theory_start)
+        repair_start = time.perf_counter()
+        with phase(profiler, "repair"):
+            self.post_repair(unplaced)
+        self.repair_seconds = time.perf_counter() - repair_start
+        for sec, labels in self.remaining_groups().items():
+            unplaced[sec] += labels
+        self.unplaced = unplaced
         for sec, subs in unplaced.items():
             for subj in subs:
                 print(f"[UNPLACED] {subj} in {sec}")
-                if DEBUG_PLACEMENT:
-                    for d in range(self.days):
-                        for p in range(self.periods_per_day):
-                            self.can_schedule(sec, d, p, subj, relax_rules=True, debug=True)
-
-    def post_repair(self, unplaced):
-        for sec in list(unplaced.keys()):
-            for subj in list(unplaced[sec]):
-                teacher = self.section_subject_teacher.get((sec, subj))
-                if not teacher:
-                    continue
-                placed = False
-                for d in range(self.days):
-                    for p in range(self.periods_per_day):
-                        if self.can_schedule(sec, d, p, subj, relax_rules=True):
-                            self.place_class(sec, d, p, subj)
-                            if subj in unplaced[sec]:
-                                unplaced[sec].remove(subj)
-                            placed = True
-                            break
-                        else:
-                            for other_sec in self.class_schedules:
-                                other_slot = self.class_schedules[other_sec][d][p]
-                                if other_slot is not None:
-                                    o_subj, _ = other_slot
-                                    if self.can_schedule(sec, d, p, subj, relax_rules=True) and \
-                                       self.can_schedule(other_sec, d, p, o_subj, relax_rules=True):
-                                        self.class_schedules[sec][d][p] = (subj, teacher)
-                                        if subj in unplaced[sec]:
-                                            unplaced[sec].remove(subj)
-                                        placed = True
-                                        break
-                            if placed:
-                                break
-                    if placed:
-                        break
+        if DEBUG_PLACEMENT and any(unplaced.values()):
+            self.infeasibility_report().print_table()
+
+    def infeasibility_report(self):
+        # Built lazily: nothing is computed until the report is read
+        return InfeasibilityReport(self)
+
+    def post_repair(self, unplaced, max_depth=REPAIR_MAX_DEPTH):
+        engine = RepairEngine(self, max_depth=max_depth)
+        engine.repair(unplaced)
+        if self.profiler:
+            self.profiler.count("repair_nodes", engine.total_nodes)
 
 
 # ------------ MAIN -------------
-def main():
-    random.seed(42)
-    teacher_busy = defaultdict(lambda: [[False]*PERIODS for _ in range(DAYS)])
+def make_generators(config=None, model=None):
+    # Empty lab/theory generators over one occupancy for `config` (default:
+    # variables.py); raises ModelError on impossible inputs before any placement
+    config = current_config() if config is None else config
+    model = compile_model(config) if model is None else model
+    occupancy = Occupancy()
+    lab_gen = LabTimetable(config["LAB_SUBJECTS"], occupancy, prebooked=config.get("PREBOOKED"),
+                           teacher_limits=config.get("TEACHER_LIMITS"), rooms=config.get("ROOMS"))
+    theory_gen = TheoryTimetable(config["YEARS_SECTIONS"], config["SUBJECTS_PER_YEAR"],
+                                 config["TEACHER_ASSIGNMENTS"], occupancy, lab_gen.lab_schedules, model)
+    return lab_gen, theory_gen
+
+
+def build_timetables(seed=42, engine=ENGINE, profile=PROFILE, optimize=OPTIMIZE_SECONDS, config=None, model=None):
+    from solver import get_engine
+    model = compile_model(config) if model is None else model
+    lab_gen, theory_gen = make_generators(config, model)
+    lab_gen.rng = theory_gen.rng = Streams(seed)
+    if profile:
+        lab_gen.profiler = theory_gen.profiler = Profiler()
+    if not get_engine(engine).solve(lab_gen, theory_gen):
+        print(f"WARNING: {engine} engine found no complete timetable, falling back to greedy")
+        return build_timetables(seed, "greedy", profile, optimize, config, model)
+    if optimize:
+        from optimize import anneal
+        with phase(theory_gen.profiler, "optimize"):
+            anneal(theory_gen, optimize, derive(seed, "optimize"))
+    return lab_gen, theory_gen
+
+
+def restore_timetables(schedule, config=None):
+    # Fresh generators holding a finished CompactSchedule (e.g. the winner of a
+    # multi-start run), with occupancy rebuilt so repair/incremental still work
+    lab_gen, theory_gen = make_generators(config)
+    for sec, d, start, b1_sub, b1_teacher, b2_sub, b2_teacher in schedule.labs():
+        lab_gen.place_lab_pair(sec, b1_sub, b1_teacher, b2_sub, b2_teacher, d, start)
+    for sec, d, p, subj in schedule.classes():
+        group = theory_gen.group_of.get((sec, subj))
+        if group is None:
+            theory_gen.place_class(sec, d, p, subj)
+        elif not theory_gen.grouped[sec] & SLOT_BITS[d][p]:     # once per group, not per member
+            theory_gen.place_group(group, d, p)
+    theory_gen.unplaced = theory_gen.remaining_demand()
+    for sec, labels in theory_gen.remaining_groups().items():
+        theory_gen.unplaced[sec] += labels
+    return lab_gen, theory_gen
+
+
+def main(seed=42, attempts=ATTEMPTS, workers=None, engine=ENGINE, save=None, teachers=False,
+         profile=PROFILE, profile_json=None, optimize=OPTIMIZE_SECONDS, load=None, sinks=(), quiet=False,
+         cache=True):
+    # Generates (or loads) the week once and fans it out to the console, the
+    # store and every export sink
+    import timetable
+    try:
+        week = timetable.load(load) if load else timetable.generate(
+            seed, attempts, workers, engine, profile or bool(profile_json), optimize,
+            RESULT_CACHE if cache else None)
+    except ModelError as e:
+        raise SystemExit(f"variables.py is inconsistent:\n{e}")
+    if save:
+        week.save(save)
+    if not quiet:
+        week.print_console(teachers)
+    for output in week.export(list(sinks)):
+        print(f"✅ Exported {len(output)} calendars" if isinstance(output, list) else f"✅ Exported {output}")
+    if week.profiler:
+        week.profiler.print_summary()
+        if profile_json:
+            week.profiler.write_json(profile_json)
+
+
+def print_lab_timetables(lab_schedules, lab_room=None):
+    for section in sorted(lab_schedules):
+        for batch in ('B1', 'B2'):
+            print(f"\nSection {section}-{batch} Labs:")
+            print("Day  " + "".join(f"P{i+1:^12}" for i in range(PERIODS)))
+            for d in range(DAYS):
+                row = f"{DAY_NAMES[d]:<4}"
+                for p in range(PERIODS):
+                    slot = lab_schedules[section][batch][d][p]
+                    display = slot[0] if slot else "-"
+                    room = lab_room(section, batch, d, p) if lab_room else None
+                    if room:
+                        display = f"{display[:7]}@{room[:4]}"
+                    row += f"{display:^12}"
+                print(row)
 
-    lab_gen = LabTimetable(LAB_SUBJECTS, teacher_busy, prebooked=PREBOOKED)
-    lab_gen.generate_lab_pairs()
 
-    theory_gen = TheoryTimetable(YEARS_SECTIONS, SUBJECTS_PER_YEAR,
-                                 TEACHER_ASSIGNMENTS, teacher_busy, lab_gen.lab_schedules)
-    theory_gen.generate_timetable()
+def print_teacher_timetables(index):
+    print("\n=== TEACHER TIMETABLES ===")
+    for teacher in index.teachers():
+        print(f"\n{teacher}:")
+        print("Day  " + "".join(f"P{i+1:^20}" for i in range(PERIODS)))
+        for d, cells in enumerate(index.grid(teacher)):
+            print(f"{DAY_NAMES[d]:<4}" + "".join(f"{cell[:18]:^20}" for cell in cells))
 
-    lab_gen.print_lab_timetables()
 
+def print_combined(lab_schedules, class_schedules):
     print("\n=== FINAL COMBINED TIMETABLE ===")
-    days = ["Mon","Tue","Wed","Thu","Fri"]
-    for sec in sorted(theory_gen.class_schedules):
+    for sec in sorted(class_schedules):
         print(f"\nSection {sec}:")
         print("Day  " + "".join(f"P{i+1:^15}" for i in range(PERIODS)))
         for d in range(DAYS):
-            row = f"{days[d]:<4}"
+            row = f"{DAY_NAMES[d]:<4}"
             for p in range(PERIODS):
-                if sec in lab_gen.lab_schedules and (
-                    lab_gen.lab_schedules[sec]['B1'][d][p] or lab_gen.lab_schedules[sec]['B2'][d][p]
+                if sec in lab_schedules and (
+                    lab_schedules[sec]['B1'][d][p] or lab_schedules[sec]['B2'][d][p]
                 ):
                     row += f"{'LAB':^15}"
                 else:
-                    slot = theory_gen.class_schedules[sec][d][p]
+                    slot = class_schedules[sec][d][p]
                     row += f"{slot[0][:12] if slot else '-':^15}"
             print(row)
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    from export_pipeline import add_output_arguments, sinks_from_args
+    parser = argparse.ArgumentParser(description="Generate lab and theory timetables.")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the first attempt")
+    parser.add_argument("--attempts", type=int, default=ATTEMPTS, help="independent seeds to try")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--engine", choices=["greedy", "exact"], default=ENGINE, help="placement engine")
+    parser.add_argument("--save", metavar="PATH", help="also write the schedule to a binary store")
+    parser.add_argument("--load", metavar="PATH", help="use a schedule saved with --save instead of generating one")
+    parser.add_argument("--teachers", action="store_true", help="also print every teacher's timetable")
+    parser.add_argument("--quiet", action="store_true", help="skip the console timetables (e.g. export only)")
+    parser.add_argument("--no-cache", action="store_true", help="solve even if this exact run was solved before")
+    parser.add_argument("--profile", action="store_true", default=PROFILE,
+                        help="count constraint checks and time each pass and phase")
+    parser.add_argument("--profile-json", metavar="PATH", help="also write the profile events to a JSON file")
+    parser.add_argument("--optimize", type=float, default=OPTIMIZE_SECONDS, metavar="SECONDS",
+                        help="improve idle gaps, day balance and early periods for this long")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    main(args.seed, args.attempts, args.workers, args.engine, args.save, args.teachers,
+         args.profile, args.profile_json, args.optimize, args.load, sinks_from_args(args), args.quiet,
+         not args.no_cache)
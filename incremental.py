@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+import json
+import time
+import store
+import variables
+from generate_timetable import LabTimetable, TheoryTimetable, build_timetables, print_combined
+from model import ModelError, compile_model, config_hash, current_config
+from occupancy import Occupancy, SLOT_BITS
+from streams import Streams
+
+STATE_FILE = "timetable_state.tts"
+# Settings outside model.INPUT_KEYS that still change what a valid week is
+SETTINGS = ("TEACHER_MAX_PER_DAY", "TEACHER_MAX_CONSECUTIVE", "DAY_PERIODS")
+
+
+# ------------ STATE -------------
+def current_inputs():
+    # Every model input plus SETTINGS, saved with the state so the next run can tell what changed
+    inputs = current_config()
+    inputs.update({key: getattr(variables, key) for key in SETTINGS})
+    return inputs
+
+
+def inputs_changed(old, new):
+    # Hash of the model inputs plus SETTINGS; tuples and lists compare alike (the state is JSON)
+    return config_hash(old) != config_hash(new) or \
+        json.dumps([old.get(key) for key in SETTINGS]) != json.dumps([new.get(key) for key in SETTINGS])
+
+
+def save_state(lab_gen, theory_gen, inputs, path=STATE_FILE):
+    store.save(path, lab_gen.lab_schedules, theory_gen.class_schedules, theory_gen.occupancy, inputs,
+               theory_gen.grouped)
+
+
+def load_state(path=STATE_FILE):
+    return store.load(path)
+
+
+# ------------ INPUT DIFF -------------
+class InputChanges:
+    def __init__(self):
+        self.sections: set[str] = set()                 # sections added/removed
+        self.pairs: set[tuple[str, str]] = set()        # (section, subject) with new teacher/frequency
+        self.lab_sections: set[str] = set()             # sections whose lab list changed
+        self.blocked: dict[str, set[tuple[int, int]]] = {}   # newly prebooked teacher slots
+        self.groups: set[str] = set()                   # CLASS_GROUPS added/removed/changed
+        self.rooms: set[str] = set()                    # subjects whose ROOMS (or their capacity) changed
+
+    def __bool__(self):
+        return bool(self.sections or self.pairs or self.lab_sections or self.blocked or self.groups or
+                    self.rooms)
+
+    def touches(self, teacher, day, period):
+        return (day, period) in self.blocked.get(teacher, ())
+
+
+def _sections(years_sections):
+    return {f"{y}{s}" for y, secs in years_sections.items() for s in secs}
+
+
+def _teacher_map(teacher_assignments):
+    return {(sec, subj): t for t, pairs in teacher_assignments.items() for sec, subj in pairs}
+
+
+def _room_options(rooms):
+    # subject -> [[room, capacity], ...] it may use, as JSON so tuples and lists compare alike
+    options: dict[str, list] = {}
+    for room, spec in rooms.items():
+        for subj in spec['subjects']:
+            options.setdefault(subj, []).append([room, spec.get('capacity', 1)])
+    return {subj: json.dumps(rooms) for subj, rooms in options.items()}
+
+
+def diff_inputs(old, new):
+    changes = InputChanges()
+    old_secs, new_secs = _sections(old["YEARS_SECTIONS"]), _sections(new["YEARS_SECTIONS"])
+    changes.sections = old_secs ^ new_secs
+
+    for year, secs in new["YEARS_SECTIONS"].items():
+        old_subs = old["SUBJECTS_PER_YEAR"].get(year, {})
+        new_subs = new["SUBJECTS_PER_YEAR"].get(year, {})
+        for subj in old_subs.keys() | new_subs.keys():
+            if old_subs.get(subj) != new_subs.get(subj):
+                changes.pairs.update((f"{year}{s}", subj) for s in secs)
+
+    old_map, new_map = _teacher_map(old["TEACHER_ASSIGNMENTS"]), _teacher_map(new["TEACHER_ASSIGNMENTS"])
+    changes.pairs.update(k for k in old_map.keys() | new_map.keys() if old_map.get(k) != new_map.get(k))
+
+    old_labs, new_labs = old["LAB_SUBJECTS"], new["LAB_SUBJECTS"]
+    for sec in old_labs.keys() | new_labs.keys():
+        if [list(x) for x in old_labs.get(sec, [])] != [list(x) for x in new_labs.get(sec, [])]:
+            changes.lab_sections.add(sec)
+
+    for teacher, slots in new["PREBOOKED"].items():
+        added = {tuple(s) for s in slots} - {tuple(s) for s in old["PREBOOKED"].get(teacher, [])}
+        if added:
+            changes.blocked[teacher] = added
+
+    # (a state saved before CLASS_GROUPS existed has none; tuples and lists compare alike)
+    old_groups, new_groups = old.get("CLASS_GROUPS", {}), new.get("CLASS_GROUPS", {})
+    changes.groups = {name for name in old_groups.keys() | new_groups.keys()
+                      if json.dumps(old_groups.get(name), sort_keys=True) !=
+                      json.dumps(new_groups.get(name), sort_keys=True)}
+
+    old_rooms, new_rooms = _room_options(old.get("ROOMS", {})), _room_options(new.get("ROOMS", {}))
+    changes.rooms = {subj for subj in old_rooms.keys() | new_rooms.keys()
+                     if old_rooms.get(subj) != new_rooms.get(subj)}
+    return changes
+
+
+# ------------ RESCHEDULE -------------
+def reschedule(state, inputs, seed=42):
+    # Replays every placement the input diff does not touch, then re-solves only
+    # the unpinned labs and theory periods around them.
+    changes = diff_inputs(state.inputs, inputs)
+    occupancy = Occupancy()
+    # Changed teacher limits need no diff of their own: the replay below checks
+    # every kept lab and class against the new limits and unpins what breaks them
+    lab_gen = LabTimetable(inputs["LAB_SUBJECTS"], occupancy, prebooked=inputs["PREBOOKED"],
+                           teacher_limits=inputs.get("TEACHER_LIMITS"), rooms=inputs.get("ROOMS"))
+    theory_gen = TheoryTimetable(inputs["YEARS_SECTIONS"], inputs["SUBJECTS_PER_YEAR"],
+                                 inputs["TEACHER_ASSIGNMENTS"], occupancy, lab_gen.lab_schedules,
+                                 compile_model(inputs))
+    lab_gen.rng = theory_gen.rng = Streams(seed)
+
+    lab_sections = changes.lab_sections | changes.sections
+    # Rooms are shared across sections, so labs using a changed room are placed
+    # afresh rather than first come, first served. Kept classes and labs are all
+    # re-checked against the new rooms and closed periods (DAY_PERIODS) below.
+    lab_sections |= {sec for sec, labs in inputs["LAB_SUBJECTS"].items()
+                     if any(subj in changes.rooms for subj, _ in labs)}
+    saved_labs = list(state.labs())
+    for sec, d, start, _, b1_t, _, b2_t in saved_labs:
+        if any(changes.touches(t, d, p) for t in (b1_t, b2_t) for p in (start, start+1)):
+            lab_sections.add(sec)
+    for sec, d, start, b1_s, b1_t, b2_s, b2_t in saved_labs:
+        if sec in lab_sections or sec not in lab_gen.lab_schedules:
+            continue
+        if lab_gen.labs_per_day[sec][d] < 2 and lab_gen.can_schedule_pair(sec, b1_s, b1_t, b2_s, b2_t, d, start):
+            lab_gen.place_lab_pair(sec, b1_s, b1_t, b2_s, b2_t, d, start)
+        else:
+            lab_sections.add(sec)
+            for day, row in enumerate(lab_gen.lab_schedules[sec]['B1']):
+                for s in range(0, len(row) - 1, 2):
+                    if row[s]:
+                        lab_gen.remove_lab_pair(sec, day, s)
+    # Labs keep their priority over theory, as in a full run
+    lab_gen.generate_lab_pairs(sections=lab_sections)
+
+    kept = unpinned = 0
+    for sec, d, p, subj in state.classes():
+        group = theory_gen.group_of.get((sec, subj))
+        if group is not None:
+            # An unchanged group is replayed whole, once, if it still fits
+            bit = SLOT_BITS[d][p]
+            if theory_gen.grouped[sec] & bit:
+                continue
+            if group.name in changes.groups or not theory_gen.group_left(group) or \
+                    not theory_gen.group_free(group, relax_rules=True) & bit:
+                unpinned += 1
+                continue
+            theory_gen.place_group(group, d, p)
+            kept += 1
+            continue
+        teacher = theory_gen.section_subject_teacher.get((sec, subj))
+        freq = inputs["SUBJECTS_PER_YEAR"].get(sec[:-1], {}).get(subj, 0)
+        if sec in changes.sections or (sec, subj) in changes.pairs or not teacher or \
+                changes.touches(teacher, d, p) or sec not in theory_gen.class_schedules or \
+                occupancy.subject_slots.get((sec, subj), 0).bit_count() >= freq or \
+                not theory_gen.can_schedule(sec, d, p, subj, relax_rules=True):
+            unpinned += 1
+            continue
+        theory_gen.place_class(sec, d, p, subj)
+        theory_gen.locked[sec] |= SLOT_BITS[d][p]
+        kept += 1
+
+    # A new or changed group that no longer fits around the kept classes goes in
+    # first, as in a full run: its member sections' kept classes are released,
+    # then those of its teachers' other sections, and solved again around it
+    theory_gen.place_groups()
+    for widen in (False, True):
+        stuck = [group for group in theory_gen.groups if theory_gen.group_left(group)]
+        if not stuck:
+            break
+        sections = {sec for group in stuck for sec in group.sections}
+        if widen:
+            sections |= {other for group in stuck for teacher in group.teachers
+                         for other, _ in theory_gen.teacher_keys.get(teacher, ())}
+        for sec in sections:
+            for d, row in enumerate(theory_gen.class_schedules[sec]):
+                for p, cell in enumerate(row):
+                    if cell and not theory_gen.grouped[sec] & SLOT_BITS[d][p]:
+                        theory_gen.remove_class(sec, d, p)
+                        kept -= 1
+                        unpinned += 1
+            theory_gen.locked[sec] = theory_gen.grouped[sec]
+        theory_gen.place_groups()
+
+    theory_gen.generate_timetable()
+    # Still stuck: widen the neighbourhood to the stuck sections and their teachers' sections
+    stuck = [(sec, subj) for sec, subs in theory_gen.unplaced.items() for subj in subs]
+    if stuck:
+        for sec, subj in stuck:
+            teacher = theory_gen.section_subject_teacher.get((sec, subj))
+            theory_gen.locked[sec] = theory_gen.grouped[sec]
+            for other, _ in theory_gen.teacher_keys.get(teacher, ()):
+                theory_gen.locked[other] = theory_gen.grouped[other]
+        theory_gen.post_repair(theory_gen.unplaced)
+    left = sum(len(subs) for subs in theory_gen.unplaced.values())
+    print(f"Incremental: kept {kept} classes, unpinned {unpinned}, "
+          f"re-solved labs for {len(lab_sections)} sections, {left} periods unplaced")
+    return lab_gen, theory_gen
+
+
+def main(path=STATE_FILE, full=False, seed=42, show=False):
+    inputs = current_inputs()
+    start = time.perf_counter()
+    try:
+        state = None if full else load_state(path)
+    except FileNotFoundError:
+        print(f"No saved state at {path}; generating from scratch")
+        state = None
+    if state is None:
+        lab_gen, theory_gen = build_timetables(seed)
+    else:
+        with state:
+            if not inputs_changed(state.inputs, inputs):
+                print("variables.py unchanged since the saved schedule; nothing to do")
+                return
+            try:
+                lab_gen, theory_gen = reschedule(state, inputs, seed)
+            except ModelError as e:
+                raise SystemExit(f"variables.py is inconsistent:\n{e}")
+    save_state(lab_gen, theory_gen, inputs, path)
+    print(f"Saved schedule to {path} in {time.perf_counter() - start:.3f}s")
+    if show:
+        lab_gen.print_lab_timetables()
+        print_combined(lab_gen.lab_schedules, theory_gen.class_schedules)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Re-solve only what changed in variables.py since the saved schedule.")
+    parser.add_argument("--state", default=STATE_FILE, help="saved schedule to update")
+    parser.add_argument("--full", action="store_true", help="ignore the saved schedule and regenerate everything")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--show", action="store_true", help="print the resulting timetables")
+    args = parser.parse_args()
+    main(args.state, args.full, args.seed, args.show)
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+from occupancy import SLOT_BITS
+from solver import LAB_STARTS
+from variables import DAYS
+
+MAX_LABS_PER_DAY = 2
+# First slot of every lab start in LAB_STARTS
+START_BITS = [SLOT_BITS[d][s] for d, s in LAB_STARTS]
+ALL_STARTS = sum(START_BITS)
+DROP = "drop"       # search choice: give up a section's remaining blocks
+
+
+# ------------ GLOBAL LAB PLACEMENT -------------
+# Every lab must be taken once by each batch, in 2-period blocks where B1 and
+# B2 run different labs side by side. A section's blocks are therefore a
+# perfect matching between its B1 and B2 lab lists: no lab paired with itself
+# and no pair whose two labs share a teacher (one person cannot take both
+# batches at once). Instead of fixing the pairs up front as (i, i+1), blocks
+# are chosen one at a time across all sections with backtracking:
+#   - a block (B1 lab, B2 lab, day/start) is only offered if the labs left over
+#     can still be paired up (memoized matching check per section);
+#   - the next section is the one with the least slack, i.e. usable lab starts
+#     (capped at MAX_LABS_PER_DAY a day) minus blocks still to place, kept in
+#     slack buckets so picking it does not rescan every section;
+#   - slack also counts each teacher's free lab starts against the blocks
+#     they still owe, so a section is as tight as its busiest lab teacher;
+#   - after a block is placed, every section sharing one of its teachers is
+#     re-scored, and a block that pushes any section below zero is undone.
+# A section that is already short (over-booked teachers, PREBOOKED) places
+# what it can and then drops the rest instead of failing the whole search.
+# If the node budget runs out, the blocks placed so far stay and the rest
+# are placed without backtracking. Dropped blocks get the usual WARNING.
+class LabPlacer:
+    def __init__(self, lab_gen, sections=None, max_nodes=None):
+        self.lab_gen = lab_gen
+        self.occ = lab_gen.occupancy
+        self.sections = [sec for sec, labs in lab_gen.lab_subjects.items()
+                         if len(labs) >= 2 and (sections is None or sec in sections)]
+        self.labs = {sec: lab_gen.lab_subjects[sec] for sec in self.sections}
+        self.compat: dict[str, list[int]] = {}
+        self.by_teacher: dict[str, list[str]] = {}
+        for sec, labs in self.labs.items():
+            self.compat[sec] = [sum(1 << b for b, (_, tb) in enumerate(labs) if b != a and tb != ta)
+                                for a, (_, ta) in enumerate(labs)]
+            for teacher in {t for _, t in labs}:
+                self.by_teacher.setdefault(teacher, []).append(sec)
+        # Sections whose labs compete for one of the same ROOMS
+        rooms = self.occ.rooms
+        by_room: dict[str, list[str]] = {}
+        for sec, labs in self.labs.items():
+            for room in sorted({r for subj, _ in labs for r in rooms.by_subject.get(subj, ())}):
+                by_room.setdefault(room, []).append(sec)
+        self.room_peers = {sec: list(dict.fromkeys(peer for room in sorted(by_room) if sec in by_room[room]
+                                                   for peer in by_room[room]))
+                           for sec in self.labs}
+        # Batch blocks still owed per room-bound lab, checked Hall-style: the labs
+        # that can only use rooms R must fit in R's free block places
+        self.room_need: dict[str, int] = {}
+        for labs in self.labs.values():
+            for subj, _ in labs:
+                if rooms.bound(subj):
+                    self.room_need[subj] = self.room_need.get(subj, 0) + 2
+        room_sets = sorted({tuple(sorted(rooms.by_subject[s])) for s in self.room_need})
+        self.room_groups = [(group, [s for s in self.room_need if set(rooms.by_subject[s]) <= set(group)])
+                            for group in room_sets]
+        self.groups_of = {s: [g for g, (_, subs) in enumerate(self.room_groups) if s in subs]
+                          for s in self.room_need}
+        self.rem1 = {sec: (1 << len(labs)) - 1 for sec, labs in self.labs.items()}
+        self.rem2 = dict(self.rem1)
+        # Blocks each teacher still has to take (every lab twice, once per batch)
+        self.need: dict[str, int] = {}
+        for labs in self.labs.values():
+            for _, t in labs:
+                self.need[t] = self.need.get(t, 0) + 2
+        # Free lab starts minus blocks owed, per teacher; refreshed by touch()
+        self.teacher_slack = {t: self.teacher_starts(t) - n for t, n in self.need.items()}
+        self.memo: dict[tuple[str, int, int], bool] = {}
+        self.pair_memo: dict[tuple[str, int, int], list[tuple[int, int]]] = {}
+        blocks = sum(len(labs) for labs in self.labs.values())
+        self.max_nodes = max_nodes if max_nodes is not None else 5000 + 5 * blocks
+        self.nodes = 0
+        self.slack: dict[str, int] = {}
+        self.buckets: dict[int, dict[str, None]] = {}
+        self.dropped: dict[str, tuple[int, int]] = {}     # section -> (B1, B2) labs given up
+        self.unpairable: list[str] = []
+        self.partial = False        # last touch() stopped after the moved section
+        self.prune = True           # off once the search has handed over to place_greedily
+
+    # --- pairing feasibility ---
+    def matchable(self, sec, rem1, rem2):
+        # Can the remaining B1 labs be paired with the remaining B2 labs?
+        if not rem1:
+            return True
+        key = (sec, rem1, rem2)
+        if key not in self.memo:
+            low = rem1 & -rem1
+            a = low.bit_length() - 1
+            options = rem2 & self.compat[sec][a]
+            ok = False
+            while options and not ok:
+                b = options & -options
+                ok = self.matchable(sec, rem1 ^ low, rem2 ^ b)
+                options ^= b
+            self.memo[key] = ok
+        return self.memo[key]
+
+    def pairs(self, sec):
+        # (B1 lab, B2 lab) blocks that keep the rest of the section pairable
+        rem1, rem2 = self.rem1[sec], self.rem2[sec]
+        key = (sec, rem1, rem2)
+        if key not in self.pair_memo:
+            compat = self.compat[sec]
+            self.pair_memo[key] = [(a, b) for a in range(len(compat)) if rem1 >> a & 1
+                                   for b in range(len(compat)) if rem2 >> b & 1 and compat[a] >> b & 1
+                                   and self.matchable(sec, rem1 & ~(1 << a), rem2 & ~(1 << b))]
+        return self.pair_memo[key]
+
+    # --- domains ---
+    def teacher_free(self, sec):
+        # Per lab of the section: starts its teacher can take
+        return [self.start_free(t) for _, t in self.labs[sec]]
+
+    def start_free(self, teacher):
+        # Free at s and s+1, and a block there keeps the teacher within their limits
+        occ = self.occ
+        free = ~occ.teacher_blocked(teacher)
+        return free & (free >> 1) & ~occ.lab_start_limited(teacher)
+
+    def room_free(self, sec, a, b):
+        # Starts where both labs of the block get a room (all, if ROOMS is empty)
+        rooms = self.occ.rooms
+        return rooms.pair_free(self.labs[sec][a][0], self.labs[sec][b][0]) if rooms else -1
+
+    def section_free(self, sec):
+        free = ~self.occ.section_busy(sec)
+        return free & (free >> 1)
+
+    def options(self, sec, starts, pairs):
+        # (start index, B1 lab, B2 lab) blocks placeable right now, generated lazily
+        per_day = self.lab_gen.labs_per_day[sec]
+        section_free = self.section_free(sec)
+        free = self.teacher_free(sec)
+        # Both teachers can start a block at s; starts on either teacher's
+        # preferred free day are only offered after every other start
+        labs, occ = self.labs[sec], self.occ
+        avoid = [occ.free_day_slots(t) for _, t in labs]
+        pair_free = [(a, b, free[a] & free[b] & self.room_free(sec, a, b), avoid[a] | avoid[b])
+                     for a, b in pairs]
+        tiers = (True, False) if any(avoid) else (True,)
+        for preferred in tiers:
+            for k in starts:
+                bit = START_BITS[k]
+                if not section_free & bit or per_day[LAB_STARTS[k][0]] >= MAX_LABS_PER_DAY:
+                    continue
+                for a, b, free, avoided in pair_free:
+                    if free & bit and bool(avoided & bit) != preferred:
+                        yield k, a, b
+
+    def score(self, sec):
+        # Usable starts (at most the per-day cap on each day) minus blocks left
+        per_day = self.lab_gen.labs_per_day[sec]
+        teacher_free = self.teacher_free(sec)
+        free = 0
+        for a, b in self.pairs(sec):
+            free |= teacher_free[a] & teacher_free[b] & self.room_free(sec, a, b)
+        free &= self.section_free(sec)
+        usable = [0] * DAYS
+        for k, bit in enumerate(START_BITS):
+            if free & bit:
+                usable[LAB_STARTS[k][0]] += 1
+        slack = sum(min(n, MAX_LABS_PER_DAY - per_day[d]) for d, n in enumerate(usable)) - self.rem1[sec].bit_count()
+        # A section is only as free as its tightest teacher
+        labs = self.labs[sec]
+        for i in range(len(labs)):
+            if (self.rem1[sec] | self.rem2[sec]) >> i & 1:
+                slack = min(slack, self.teacher_slack[labs[i][1]])
+                for g in self.groups_of.get(labs[i][0], ()):
+                    slack = min(slack, self.room_slack(g))
+        return slack
+
+    def room_slack(self, g):
+        group, subjects = self.room_groups[g]
+        rooms = self.occ.rooms
+        return sum(rooms.block_places(r, ALL_STARTS) for r in group) - sum(self.room_need[s] for s in subjects)
+
+    def rescore(self, sec):
+        old = self.slack.pop(sec, None)
+        if old is not None:
+            del self.buckets[old][sec]
+        if self.rem1[sec]:
+            new = self.score(sec)
+            self.slack[sec] = new
+            self.buckets.setdefault(new, {})[sec] = None
+
+    def select(self):
+        for slack in sorted(self.buckets):
+            if self.buckets[slack]:
+                return next(iter(self.buckets[slack]))
+        return None
+
+    # --- moves ---
+    def owe(self, lab, n):
+        # n more (or fewer) batch blocks of this lab still to place
+        subj, teacher = lab
+        self.need[teacher] += n
+        if subj in self.room_need:
+            self.room_need[subj] += n
+
+    def place(self, sec, k, a, b):
+        labs = self.labs[sec]
+        day, start = LAB_STARTS[k]
+        self.lab_gen.place_lab_pair(sec, labs[a][0], labs[a][1], labs[b][0], labs[b][1], day, start)
+        self.rem1[sec] &= ~(1 << a)
+        self.rem2[sec] &= ~(1 << b)
+        self.owe(labs[a], -1)
+        self.owe(labs[b], -1)
+        return self.touch(sec, labs[a][1], labs[b][1])
+
+    def unplace(self, sec, k, a, b):
+        labs = self.labs[sec]
+        day, start = LAB_STARTS[k]
+        self.lab_gen.remove_lab_pair(sec, day, start)
+        self.rem1[sec] |= 1 << a
+        self.rem2[sec] |= 1 << b
+        self.owe(labs[a], 1)
+        self.owe(labs[b], 1)
+        self.touch(sec, labs[a][1], labs[b][1])
+
+    def drop(self, sec):
+        # Give up the section's remaining blocks (reported once the search ends)
+        labs = self.labs[sec]
+        rem1, rem2 = self.rem1[sec], self.rem2[sec]
+        self.dropped[sec] = (rem1, rem2)
+        for i in range(len(labs)):
+            self.owe(labs[i], -((rem1 >> i & 1) + (rem2 >> i & 1)))
+        self.rem1[sec] = self.rem2[sec] = 0
+        return self.touch(sec, *{t for _, t in labs})
+
+    def undrop(self, sec):
+        labs = self.labs[sec]
+        rem1, rem2 = self.rem1[sec], self.rem2[sec] = self.dropped.pop(sec)
+        for i in range(len(labs)):
+            self.owe(labs[i], (rem1 >> i & 1) + (rem2 >> i & 1))
+        self.touch(sec, *{t for _, t in labs})
+
+    def apply(self, sec, option):
+        return self.drop(sec) if option is DROP else self.place(sec, *option)
+
+    def undo(self, sec, option):
+        if option is DROP:
+            self.undrop(sec)
+        else:
+            self.unplace(sec, *option)
+
+    def touch(self, sec, *teachers):
+        # Re-score every section the move can affect; the move is only kept if
+        # it leaves no section that still had room short of lab starts. The
+        # moved section is checked first: when the move sinks it, the others
+        # are left alone and the undo that follows only re-scores it again.
+        for t in sorted(teachers):
+            self.teacher_slack[t] = self.teacher_starts(t) - self.need[t]
+        if self.partial:
+            self.partial = False
+            self.rescore(sec)
+            return True
+        before = self.slack.get(sec, 0)
+        self.rescore(sec)
+        if self.slack.get(sec, 0) < 0 <= before and self.prune:
+            self.partial = True
+            return False
+        affected = {}
+        for t in sorted(teachers):
+            affected.update(dict.fromkeys(self.by_teacher[t]))
+        affected.update(dict.fromkeys(self.room_peers[sec]))
+        affected.pop(sec, None)
+        before = {other: self.slack.get(other, 0) for other in affected}
+        for other in affected:
+            self.rescore(other)
+        return all(self.slack.get(other, 0) >= 0 or before[other] < 0 for other in affected)
+
+    def teacher_starts(self, teacher):
+        return (self.start_free(teacher) & ALL_STARTS).bit_count()
+
+    def choices(self, sec):
+        # Blocks in a day-spreading, otherwise random order from the section's
+        # own stream. A section already short of starts may also drop what is
+        # left once its blocks run out.
+        doomed = self.slack[sec] < 0
+        per_day = self.lab_gen.labs_per_day[sec]
+        rng = self.lab_gen.rng("labs", sec)
+        starts = list(range(len(LAB_STARTS)))
+        rng.shuffle(starts)
+        starts.sort(key=lambda k: per_day[LAB_STARTS[k][0]])
+        pairs = list(self.pairs(sec))
+        rng.shuffle(pairs)
+        yield from self.options(sec, starts, pairs)
+        if doomed:
+            yield DROP
+
+    # --- search ---
+    def solve(self):
+        for sec in self.sections:
+            if self.matchable(sec, self.rem1[sec], self.rem2[sec]):
+                self.rescore(sec)
+            else:
+                self.unpairable.append(sec)
+                self.drop(sec)
+        solved = self.search()
+        if not solved:
+            self.place_greedily()
+        self.report()
+        return solved
+
+    def search(self):
+        # Explicit stack of [section, choice iterator, choice currently applied].
+        # Out of budget, the blocks placed so far are kept as they are.
+        stack = []
+        while True:
+            sec = self.select()
+            if sec is None:
+                return True
+            stack.append([sec, self.choices(sec), None])
+            while stack:
+                frame = stack[-1]
+                sec = frame[0]
+                if frame[2]:
+                    self.undo(sec, frame[2])
+                    frame[2] = None
+                for option in frame[1]:
+                    self.nodes += 1
+                    if self.nodes > self.max_nodes:
+                        return False
+                    if self.apply(sec, option):
+                        frame[2] = option
+                        break
+                    self.undo(sec, option)
+                if frame[2]:
+                    break
+                stack.pop()
+            else:
+                return False
+
+    def place_greedily(self):
+        # No backtracking: the least-slack section takes its first block, or
+        # drops what is left when none fits
+        self.prune = False
+        while True:
+            sec = self.select()
+            if sec is None:
+                return
+            self.apply(sec, next(self.choices(sec), DROP))
+
+    def report(self):
+        profiler = self.lab_gen.profiler
+        for sec, (rem1, rem2) in self.dropped.items():
+            labs = self.labs[sec]
+            left1 = [labs[i][0] for i in range(len(labs)) if rem1 >> i & 1]
+            left2 = [labs[i][0] for i in range(len(labs)) if rem2 >> i & 1]
+            why = " (no B1/B2 pairing keeps every teacher on one batch)" if sec in self.unpairable else ""
+            for b1, b2 in zip(left1, left2[1:] + left2[:1]):
+                if profiler:
+                    profiler.count("lab_pairs_unplaced")
+                print(f"WARNING: Could not place labs {b1}/{b2} for {sec}{why}")
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+import difflib
+import hashlib
+import json
+import os
+import pickle
+from array import array
+from typing import NamedTuple
+from variables import DAYS, PERIODS, DAY_PERIODS, MODEL_CACHE, TEACHER_MAX_PER_DAY, TEACHER_MAX_CONSECUTIVE
+
+BATCHES = ('B1', 'B2')
+INPUT_KEYS = ("YEARS_SECTIONS", "SUBJECTS_PER_YEAR", "TEACHER_ASSIGNMENTS", "LAB_SUBJECTS", "PREBOOKED",
+              "TEACHER_LIMITS", "ROOMS", "CLASS_GROUPS")
+MODEL_VERSION = 5       # bump when Model's fields change so stale cache entries are ignored
+
+
+class ModelError(ValueError):
+    pass
+
+
+# ------------ INTERNING -------------
+class NameTable:
+    # Sorted names <-> small ints; ids are stable for a given set of names
+    def __init__(self, names):
+        self.names = tuple(sorted(names))
+        self.ids = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, i):
+        return self.names[i]
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def id(self, name):
+        return self.ids[name]
+
+
+# ------------ CLASS GROUPS -------------
+# Classes that run in one slot for every member section at once: electives
+# (one class per elective, the sections' students split between them) or a
+# combined lecture (a single class the sections attend together). A member's
+# grid cell is the lecture itself, or for electives the group name with every
+# "SUBJECT: Teacher" pair joined by GROUP_SEP; cell_classes undoes that.
+GROUP_SEP = " / "
+
+
+class Group(NamedTuple):
+    name: str
+    sections: tuple
+    classes: tuple          # ((subject, teacher), ...)
+    periods: int
+
+    @property
+    def teachers(self):
+        return tuple(t for _, t in self.classes)
+
+    @property
+    def cell(self):
+        return self.classes[0] if len(self.classes) == 1 else group_cell(self.name, self.classes)
+
+
+def group_cell(label, classes):
+    return label, GROUP_SEP.join(f"{subj}: {t}" for subj, t in classes)
+
+
+def cell_classes(slot):
+    # (subject, teacher) of every class a grid cell holds
+    subject, teacher = slot
+    if ": " not in teacher:
+        return (slot,)
+    return tuple(tuple(part.split(": ", 1)) for part in teacher.split(GROUP_SEP))
+
+
+# ------------ COMPILED MODEL -------------
+# The variables.py dicts with every name interned, checked and pre-digested
+# into what the generators need. Teachers are the keys of TEACHER_ASSIGNMENTS
+# (a lab-only teacher is listed with an empty list), so a LAB_SUBJECTS or
+# PREBOOKED name that is not one of them is a typo, reported here instead of
+# quietly becoming a second, always-free teacher. Inputs that no placement
+# can satisfy are rejected too:
+#   - a subject of a class's year with nobody assigned to teach it
+#   - a teacher owed more periods than their week has (open DAY_PERIODS minus
+#     PREBOOKED slots, or DAYS times their max per day; every lab is two
+#     2-period blocks, one per batch), or whose limits leave no room for a lab block
+#   - a subject tied to ROOMS needing more periods than its rooms offer
+#   - a class whose theory periods plus lab blocks exceed the open periods
+# A CLASS_GROUPS entry takes over its members' subject of the same name (the
+# group name or one of its class subjects) and counts towards every member's
+# and every group teacher's week.
+class Model:
+    def __init__(self, years_sections, subjects_per_year, teacher_assignments, lab_subjects, prebooked,
+                 teacher_limits=None, rooms=None, class_groups=None, days=DAYS, periods=PERIODS,
+                 day_periods=DAY_PERIODS):
+        teacher_limits = teacher_limits or {}
+        rooms = rooms or {}
+        class_groups = class_groups or {}
+        self.days, self.periods = days, periods
+        self.section_names = [f"{y}{s}" for y, secs in years_sections.items() for s in secs]
+        self.sections = NameTable(self.section_names)
+        self.teachers = NameTable(teacher_assignments)
+        self.subjects = NameTable({subj for subs in subjects_per_year.values() for subj in subs} |
+                                  {subj for labs in lab_subjects.values() for subj, _ in labs} |
+                                  {subj for spec in class_groups.values() for subj, _ in spec.get('classes', ())})
+        self.year_of = {f"{y}{s}": y for y, secs in years_sections.items() for s in secs}
+        self.key = None         # content hash, set by compile_model
+
+        errors = []
+        for sec, labs in lab_subjects.items():
+            for subj, teacher in labs:
+                if teacher not in self.teachers:
+                    errors.append(self._unknown(teacher, f"LAB_SUBJECTS[{sec!r}] {subj}"))
+        for teacher in prebooked:
+            if teacher not in self.teachers:
+                errors.append(self._unknown(teacher, "PREBOOKED"))
+        for teacher in teacher_limits:
+            if teacher not in self.teachers:
+                errors.append(self._unknown(teacher, "TEACHER_LIMITS"))
+        for room, spec in rooms.items():
+            if spec.get('capacity', 1) < 1:
+                errors.append(f"ROOMS[{room!r}]: capacity must be at least 1")
+            for subj in spec.get('subjects', ()):
+                if subj not in self.subjects:
+                    close = difflib.get_close_matches(subj, self.subjects.names, n=1, cutoff=0.6)
+                    hint = f" (did you mean {close[0]!r}?)" if close else ""
+                    errors.append(f"ROOMS[{room!r}]: unknown subject {subj!r}{hint}")
+        for teacher, pairs in teacher_assignments.items():
+            for sec, subj in pairs:
+                if sec not in self.sections:
+                    errors.append(f"{teacher}: unknown class {sec!r} in TEACHER_ASSIGNMENTS")
+                elif subj not in subjects_per_year.get(self.year_of[sec], {}):
+                    errors.append(f"{teacher}: {subj!r} is not a subject of year {self.year_of[sec]}")
+        for name, spec in class_groups.items():
+            where = f"CLASS_GROUPS[{name!r}]"
+            for sec in spec.get('sections', ()):
+                if sec not in self.sections:
+                    errors.append(f"{where}: unknown class {sec!r}")
+            if not spec.get('sections') or not spec.get('classes'):
+                errors.append(f"{where}: needs 'sections' and 'classes'")
+            teachers = [t for _, t in spec.get('classes', ())]
+            for t in teachers:
+                if t not in self.teachers:
+                    errors.append(self._unknown(t, where))
+            if len(set(teachers)) < len(teachers):
+                errors.append(f"{where}: a teacher cannot take two of its classes at once")
+        if errors:
+            raise ModelError("\n".join(errors))
+
+        # Name-keyed maps the generators use directly
+        self.section_subject_teacher = {(sec, subj): t for t, pairs in teacher_assignments.items()
+                                        for sec, subj in pairs}
+        self.section_demand = {sec: dict(subjects_per_year.get(self.year_of[sec], {}))
+                               for sec in self.section_names}
+        self.groups = []
+        for name, spec in sorted(class_groups.items()):
+            classes = tuple((subj, t) for subj, t in spec['classes'])
+            covered = {name} | {subj for subj, _ in classes}
+            found = {self.section_demand[sec][subj] for sec in spec['sections']
+                     for subj in covered & self.section_demand[sec].keys()}
+            n = spec.get('periods', found.pop() if len(found) == 1 else None)
+            if not n or n < 1:
+                errors.append(f"CLASS_GROUPS[{name!r}]: set 'periods'" +
+                              (" (its members' subjects disagree)" if found else ""))
+                continue
+            for sec in spec['sections']:
+                for subj in covered:
+                    self.section_demand[sec].pop(subj, None)
+                    self.section_subject_teacher.pop((sec, subj), None)
+            self.groups.append(Group(name, tuple(spec['sections']), classes, n))
+
+        week = sum(day_periods)     # open periods; a short day (DAY_PERIODS) has fewer
+        load = dict.fromkeys(self.teachers.names, 0)
+        lab_teachers = set()
+        for (sec, subj), t in self.section_subject_teacher.items():
+            load[t] += self.section_demand[sec][subj]
+        for sec, labs in lab_subjects.items():
+            for _, t in labs:
+                load[t] += 4
+                lab_teachers.add(t)
+        grouped = dict.fromkeys(self.section_names, 0)
+        for group in self.groups:
+            for t in group.teachers:
+                load[t] += group.periods
+            for sec in group.sections:
+                grouped[sec] += group.periods
+        for sec in self.section_names:
+            missing = [subj for subj in self.section_demand[sec] if (sec, subj) not in self.section_subject_teacher]
+            if missing:
+                errors.append(f"{sec}: no teacher assigned for {', '.join(missing)}")
+            owed = sum(self.section_demand[sec].values()) + grouped[sec] + 2 * len(lab_subjects.get(sec, ()))
+            if owed > week:
+                errors.append(f"{sec}: needs {owed} periods (theory + lab blocks) but the week has {week}")
+        # Periods each room-bound subject needs against the places of its rooms
+        room_demand = {}
+        for sec, labs in lab_subjects.items():
+            for subj, _ in labs:
+                room_demand[subj] = room_demand.get(subj, 0) + 4
+        for sec, subs in self.section_demand.items():
+            for subj, freq in subs.items():
+                room_demand[subj] = room_demand.get(subj, 0) + freq
+        # (the subjects that can only use rooms R together, for every R a subject is tied to)
+        rooms_of = {subj: {room for room, spec in rooms.items() if subj in spec.get('subjects', ())}
+                    for subj in room_demand}
+        rooms_of = {subj: found for subj, found in rooms_of.items() if found}
+        for group in sorted({tuple(sorted(found)) for found in rooms_of.values()}):
+            subs = sorted(s for s, found in rooms_of.items() if found <= set(group))
+            n = sum(room_demand[s] for s in subs)
+            places = sum(rooms[room].get('capacity', 1) for room in group) * week
+            if n > places:
+                errors.append(f"{', '.join(subs)}: need {n} room periods but {', '.join(group)} can host {places}")
+        for t, n in load.items():
+            free = week - len({(d, p) for d, p in prebooked.get(t, ()) if p < day_periods[d]})
+            limits = teacher_limits.get(t, {})
+            per_day = limits.get('max_per_day', TEACHER_MAX_PER_DAY)
+            in_a_row = limits.get('max_consecutive', TEACHER_MAX_CONSECUTIVE)
+            if n > free:
+                errors.append(f"{t}: assigned {n} periods but only {free} are free")
+            elif per_day is not None and n > per_day * days:
+                errors.append(f"{t}: assigned {n} periods but max_per_day {per_day} allows {per_day * days}")
+            if t in lab_teachers and any(limit is not None and limit < 2 for limit in (per_day, in_a_row)):
+                errors.append(f"{t}: teaches labs, which need 2 periods in a row, but is limited to 1")
+        if errors:
+            raise ModelError("\n".join(errors))
+
+    def _unknown(self, name, where):
+        close = difflib.get_close_matches(name, self.teachers.names, n=1, cutoff=0.6)
+        hint = f" (did you mean {close[0]!r}?)" if close else ""
+        return f"{where}: unknown teacher {name!r}{hint}"
+
+
+def current_config():
+    import variables
+    return {key: getattr(variables, key) for key in INPUT_KEYS}
+
+
+def config_hash(config, days=DAYS, periods=PERIODS):
+    # Content hash of the inputs; tuples and lists hash alike (JSON has one array type)
+    blob = json.dumps([MODEL_VERSION, days, periods, DAY_PERIODS, [config.get(name, {}) for name in INPUT_KEYS],
+                       TEACHER_MAX_PER_DAY, TEACHER_MAX_CONSECUTIVE],
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def compile_model(config=None, cache_dir=MODEL_CACHE):
+    # Validated Model for `config` (default: variables.py). A model already
+    # compiled from identical inputs is loaded from cache_dir instead of rebuilt;
+    # invalid inputs are never cached, so they fail the same way every run.
+    config = current_config() if config is None else config
+    key = config_hash(config)
+    path = os.path.join(cache_dir, f"{key}.model") if cache_dir else None
+    if path and os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass        # unreadable or from an older layout: rebuild below
+    model = Model(*(config.get(name, {}) for name in INPUT_KEYS))
+    model.key = key
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    return model
+
+
+# ------------ COMPACT SCHEDULE -------------
+# A finished week as four uint16 grids of interned ids (0 = empty, else id + 1):
+#   class subjects, class teachers   [section][day][period]
+#   lab subjects, lab teachers       [lab section][batch B1/B2][day][period]
+# Names are only looked up when a cell or a nested-list view is asked for, so
+# a schedule pickles to a few KB for multi-start workers and is what store.py
+# writes to (and maps back from) disk.
+class CompactSchedule:
+    def __init__(self, sections, lab_sections, teachers, subjects, grids, days=DAYS, periods=PERIODS):
+        self.days, self.periods = days, periods
+        self.sections, self.lab_sections = list(sections), list(lab_sections)
+        self.teachers, self.subjects = list(teachers), list(subjects)
+        self._section_index = {s: i for i, s in enumerate(self.sections)}
+        self._lab_index = {s: i for i, s in enumerate(self.lab_sections)}
+        self._class_subjects, self._class_teachers, self._lab_subjects, self._lab_teachers = grids
+
+    @classmethod
+    def from_grids(cls, lab_schedules, class_schedules, extra_teachers=()):
+        cells = [slot for grid in class_schedules.values() for row in grid for slot in row if slot]
+        cells += [slot for batches in lab_schedules.values() for grid in batches.values()
+                  for row in grid for slot in row if slot]
+        teachers = NameTable({t for _, t in cells} | set(extra_teachers))
+        subjects = NameTable({s for s, _ in cells})
+
+        def encode(grids):
+            subj_ids, teacher_ids = array('H'), array('H')
+            for grid in grids:
+                for row in grid:
+                    for slot in row:
+                        subj_ids.append(subjects.id(slot[0]) + 1 if slot else 0)
+                        teacher_ids.append(teachers.id(slot[1]) + 1 if slot else 0)
+            return subj_ids, teacher_ids
+
+        class_grids = encode(class_schedules.values())
+        lab_grids = encode(batches[batch] for batches in lab_schedules.values() for batch in BATCHES)
+        return cls(class_schedules, lab_schedules, teachers.names, subjects.names, class_grids + lab_grids)
+
+    def grids(self):
+        return self._class_subjects, self._class_teachers, self._lab_subjects, self._lab_teachers
+
+    # --- cell lookups ---
+    def _cell(self, subjects, teachers, i):
+        s = subjects[i]
+        return (self.subjects[s - 1], self.teachers[teachers[i] - 1]) if s else None
+
+    def class_cell(self, section, day, period):
+        i = (self._section_index[section] * self.days + day) * self.periods + period
+        return self._cell(self._class_subjects, self._class_teachers, i)
+
+    def lab_cell(self, section, batch, day, period):
+        base = self._lab_index[section] * 2 + BATCHES.index(batch)
+        i = (base * self.days + day) * self.periods + period
+        return self._cell(self._lab_subjects, self._lab_teachers, i)
+
+    # --- materialized views in the generators' nested-list shape ---
+    @property
+    def class_schedules(self):
+        return {sec: [[self.class_cell(sec, d, p) for p in range(self.periods)] for d in range(self.days)]
+                for sec in self.sections}
+
+    @property
+    def lab_schedules(self):
+        return {sec: {batch: [[self.lab_cell(sec, batch, d, p) for p in range(self.periods)]
+                              for d in range(self.days)] for batch in BATCHES}
+                for sec in self.lab_sections}
+
+    def classes(self):
+        for sec in self.sections:
+            for d in range(self.days):
+                for p in range(self.periods):
+                    slot = self.class_cell(sec, d, p)
+                    if slot:
+                        yield sec, d, p, slot[0]
+
+    def labs(self):
+        # One entry per lab block: section, day, start and both batches' subject/teacher
+        for sec in self.lab_sections:
+            for d in range(self.days):
+                for start in range(0, self.periods - 1, 2):
+                    b1, b2 = self.lab_cell(sec, 'B1', d, start), self.lab_cell(sec, 'B2', d, start)
+                    if b1 and b2:
+                        yield sec, d, start, b1[0], b1[1], b2[0], b2[1]
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+import contextlib
+import io
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from generate_timetable import build_timetables, restore_timetables
+from model import CompactSchedule, compile_model
+from variables import DAYS, PERIODS, ENGINE, OPTIMIZE_SECONDS
+
+
+# ------------ SCORING -------------
+def score_schedule(lab_gen, theory_gen):
+    # Lower is better: (unplaced periods, relaxed-rule violations, day imbalance)
+    unplaced = sum(len(subs) for subs in theory_gen.unplaced.values())
+    violations = 0
+    imbalance = 0
+    for sec, grid in theory_gen.class_schedules.items():
+        labs = lab_gen.lab_schedules.get(sec)
+        loads = []
+        for d in range(DAYS):
+            subjects = [slot[0] for slot in grid[d] if slot]
+            violations += len(subjects) - len(set(subjects))
+            violations += sum(1 for p in range(1, PERIODS)
+                              if grid[d][p] and grid[d][p-1] and grid[d][p][0] == grid[d][p-1][0])
+            lab_periods = sum(1 for slot in labs['B1'][d] if slot) if labs else 0
+            loads.append(len(subjects) + lab_periods)
+        imbalance += max(loads) - min(loads)
+    return unplaced, violations, imbalance
+
+
+def is_perfect(score):
+    return score[0] == 0 and score[1] == 0
+
+
+def run_attempt(seed, engine=ENGINE, profile=False, optimize=OPTIMIZE_SECONDS):
+    # Worker entry point: generation chatter is dropped so parallel runs stay readable.
+    # Only the compact grids travel back, not the generators and their indexes.
+    with contextlib.redirect_stdout(io.StringIO()):
+        lab_gen, theory_gen = build_timetables(seed, engine, profile, optimize)
+    schedule = CompactSchedule.from_grids(lab_gen.lab_schedules, theory_gen.class_schedules)
+    return seed, score_schedule(lab_gen, theory_gen), schedule, theory_gen.profiler
+
+
+# ------------ MULTI-START -------------
+def generate_best(seed=42, attempts=1, workers=None, stop_on_perfect=True, engine=ENGINE, profile=False,
+                  optimize=OPTIMIZE_SECONDS):
+    # With profile=True the winning attempt's profiler comes back on theory_gen.profiler
+    if attempts <= 1:
+        return build_timetables(seed, engine, profile, optimize)
+
+    # The winner never depends on which worker finishes first: it is the lowest
+    # perfect seed if there is one (later seeds are cancelled or ignored once a
+    # perfect one is in, earlier ones still run), otherwise the best score
+    compile_model()     # fail on impossible inputs here, not once per worker
+    best = None
+    perfect = None      # lowest perfect seed's result so far, kept apart from best
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_attempt, seed + i, engine, profile, optimize): seed + i for i in range(attempts)}
+        for future in as_completed(futures):
+            if future.cancelled() or (perfect is not None and futures[future] > perfect[0]):
+                continue
+            result = future.result()
+            print(f"seed {result[0]}: unplaced={result[1][0]} violations={result[1][1]} imbalance={result[1][2]}")
+            if stop_on_perfect and is_perfect(result[1]):
+                # Perfect results differ in imbalance too; the lowest seed wins, whenever it finishes
+                perfect = result
+                for f, s in futures.items():
+                    if s > perfect[0]:
+                        f.cancel()
+            elif best is None or (result[1], result[0]) < (best[1], best[0]):
+                best = result
+    if perfect is not None:
+        best = perfect
+    print(f"Best seed {best[0]} (score {best[1]}) out of {attempts} attempts")
+    lab_gen, theory_gen = restore_timetables(best[2])
+    lab_gen.profiler = theory_gen.profiler = best[3]
+    return lab_gen, theory_gen
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+from collections import defaultdict
+from functools import lru_cache
+from rooms import Rooms
+from variables import DAYS, PERIODS, DAY_PERIODS, TEACHER_MAX_PER_DAY, TEACHER_MAX_CONSECUTIVE
+
+# ------------ SLOT BITS -------------
+# Slot (day, period) of the week maps to bit day*PERIODS + period, so a whole
+# week of occupancy for one teacher/section/batch fits in a single int.
+DAY_MASK = (1 << PERIODS) - 1
+WEEK_MASK = (1 << (DAYS * PERIODS)) - 1
+SLOT_BITS = [[1 << (d * PERIODS + p) for p in range(PERIODS)] for d in range(DAYS)]
+DAY_BITS = [DAY_MASK << (d * PERIODS) for d in range(DAYS)]
+# First period of every day; used to keep neighbour shifts inside one day
+FIRST_PERIODS = sum(SLOT_BITS[d][0] for d in range(DAYS))
+LAST_PERIODS = sum(SLOT_BITS[d][PERIODS - 1] for d in range(DAYS))
+# Day-set (one bit per day) -> every slot of those days
+DAYSET_SLOTS = [sum(DAY_BITS[d] for d in range(DAYS) if ds >> d & 1) for ds in range(1 << DAYS)]
+# Periods past the end of a short day (DAY_PERIODS): busy for every section and teacher
+CLOSED_SLOTS = sum(SLOT_BITS[d][p] for d in range(DAYS) for p in range(DAY_PERIODS[d], PERIODS))
+OPEN_SLOTS = WEEK_MASK & ~CLOSED_SLOTS
+
+
+def slot_bit(day, period):
+    return SLOT_BITS[day][period]
+
+
+def neighbours(mask):
+    # Slots directly before/after any slot in mask, never wrapping across days
+    return ((mask & ~LAST_PERIODS) << 1 | (mask & ~FIRST_PERIODS) >> 1) & WEEK_MASK
+
+
+def iter_slots(mask):
+    while mask:
+        low = mask & -mask
+        idx = low.bit_length() - 1
+        yield divmod(idx, PERIODS)
+        mask ^= low
+
+
+# ------------ TEACHER LIMITS -------------
+# A teacher's day is a PERIODS-bit mask, so "may they take one more period at
+# p" and "may they take a lab block starting at p" are table lookups per
+# (max per day, max consecutive) pair. Occupancy keeps the answer for each
+# teacher's whole week in one mask, refreshed only for the day a booking changes.
+def longest_run(m):
+    run = best = 0
+    for p in range(PERIODS):
+        run = run + 1 if m >> p & 1 else 0
+        best = max(best, run)
+    return best
+
+
+@lru_cache(maxsize=None)
+def limit_tables(max_per_day, max_consecutive):
+    # (single, block): per day mask, the periods / 2-period starts that would break the limits
+    def breaks(m):
+        return m.bit_count() > max_per_day or longest_run(m) > max_consecutive
+    single = [sum(1 << p for p in range(PERIODS) if not m >> p & 1 and breaks(m | 1 << p))
+              for m in range(DAY_MASK + 1)]
+    block = [sum(1 << p for p in range(PERIODS - 1) if not m >> p & 3 and breaks(m | 3 << p))
+             for m in range(DAY_MASK + 1)]
+    return single, block
+
+
+# ------------ OCCUPANCY ENGINE -------------
+class Occupancy:
+    def __init__(self, prebooked=None):
+        self.teachers: dict[str, int] = defaultdict(int)
+        self.prebooked: dict[str, int] = defaultdict(int)
+        self.classes: dict[str, int] = defaultdict(int)                 # theory slots per section
+        self.labs: dict[tuple[str, str], int] = defaultdict(int)        # (section, batch)
+        self.section_labs: dict[str, int] = defaultdict(int)            # union of both batches
+        self.subject_slots: dict[tuple[str, str], int] = defaultdict(int)
+        self.subject_days: dict[tuple[str, str], int] = defaultdict(int)
+        # Teacher limits: TEACHER_MAX_PER_DAY/TEACHER_MAX_CONSECUTIVE unless overridden
+        self.default_limits = self._tables(TEACHER_MAX_PER_DAY, TEACHER_MAX_CONSECUTIVE)
+        self.teacher_tables: dict[str, tuple] = {}
+        self.limited: dict[str, int] = {}       # slots where one more period breaks the limits
+        self.block_limited: dict[str, int] = {} # lab starts where a 2-period block would
+        self.free_days: dict[str, int] = {}     # slots of each teacher's preferred free days
+        self.rooms = Rooms()                    # lab/special rooms, empty unless ROOMS is set
+        if prebooked:
+            self.block_prebooked(prebooked)
+
+    def block_prebooked(self, prebooked):
+        for teacher, slots in prebooked.items():
+            for day, period in slots:
+                self.prebooked[teacher] |= SLOT_BITS[day][period]
+
+    def set_rooms(self, rooms):
+        self.rooms = Rooms(rooms)
+
+    def set_teacher_limits(self, teacher_limits):
+        # TEACHER_LIMITS: {teacher: {'max_per_day', 'max_consecutive', 'free_days'}}
+        for teacher, limits in teacher_limits.items():
+            if 'max_per_day' in limits or 'max_consecutive' in limits:
+                self.teacher_tables[teacher] = self._tables(
+                    limits.get('max_per_day', TEACHER_MAX_PER_DAY),
+                    limits.get('max_consecutive', TEACHER_MAX_CONSECUTIVE))
+            if limits.get('free_days'):
+                self.free_days[teacher] = sum(DAY_BITS[d] for d in set(limits['free_days']))
+            for d in range(DAYS):
+                self._refresh_limits(teacher, d)
+
+    @staticmethod
+    def _tables(max_per_day, max_consecutive):
+        if max_per_day is None and max_consecutive is None:
+            return None
+        single, block = limit_tables(PERIODS if max_per_day is None else max_per_day,
+                                     PERIODS if max_consecutive is None else max_consecutive)
+        # Limits of a teacher with an empty week, for teachers never booked yet
+        return single, block, sum(single[0] << d * PERIODS for d in range(DAYS)), \
+            sum(block[0] << d * PERIODS for d in range(DAYS))
+
+    def _refresh_limits(self, teacher, day):
+        tables = self.teacher_tables.get(teacher, self.default_limits)
+        if tables is None:
+            return
+        single, block, empty_single, empty_block = tables
+        shift = day * PERIODS
+        m = self.teachers.get(teacher, 0) >> shift & DAY_MASK
+        keep = ~DAY_BITS[day]
+        self.limited[teacher] = self.limited.get(teacher, empty_single) & keep | single[m] << shift
+        self.block_limited[teacher] = self.block_limited.get(teacher, empty_block) & keep | block[m] << shift
+
+    # --- queries (use .get so lookups never create entries) ---
+    def teacher_blocked(self, teacher):
+        return self.teachers.get(teacher, 0) | self.prebooked.get(teacher, 0) | CLOSED_SLOTS
+
+    def is_teacher_busy(self, teacher, day, period):
+        return bool(self.teacher_blocked(teacher) & SLOT_BITS[day][period])
+
+    def teacher_limited(self, teacher):
+        # Slots the teacher is free in but may not take (max per day / consecutive)
+        tables = self.teacher_tables.get(teacher, self.default_limits)
+        return self.limited.get(teacher, tables[2]) if tables else 0
+
+    def lab_start_limited(self, teacher):
+        # Lab starts s where a block on s, s+1 would break the teacher's limits
+        tables = self.teacher_tables.get(teacher, self.default_limits)
+        return self.block_limited.get(teacher, tables[3]) if tables else 0
+
+    def free_day_slots(self, teacher):
+        return self.free_days.get(teacher, 0)
+
+    def section_busy(self, section):
+        return self.classes.get(section, 0) | self.section_labs.get(section, 0) | CLOSED_SLOTS
+
+    def subject_day_slots(self, section, subject):
+        # Every slot on a day that already holds this subject (once-per-day rule)
+        return DAYSET_SLOTS[self.subject_days.get((section, subject), 0)]
+
+    def subject_neighbours(self, section, subject):
+        # Slots adjacent to an existing period of this subject (no back-to-back rule)
+        return neighbours(self.subject_slots.get((section, subject), 0))
+
+    # --- updates ---
+    def book_lab(self, section, batch, teacher, bits):
+        self.labs[(section, batch)] |= bits
+        self.section_labs[section] |= bits
+        self.teachers[teacher] |= bits
+        self._refresh_limits(teacher, (bits.bit_length() - 1) // PERIODS)
+
+    def release_lab(self, section, batch, teacher, bits):
+        self.labs[(section, batch)] &= ~bits
+        self.section_labs[section] = self.labs[(section, 'B1')] | self.labs[(section, 'B2')]
+        self.teachers[teacher] &= ~bits
+        self._refresh_limits(teacher, (bits.bit_length() - 1) // PERIODS)
+
+    def book_class(self, section, subject, teacher, day, period):
+        bit = SLOT_BITS[day][period]
+        key = (section, subject)
+        self.classes[section] |= bit
+        self.teachers[teacher] |= bit
+        self.subject_slots[key] |= bit
+        self.subject_days[key] |= 1 << day
+        self._refresh_limits(teacher, day)
+
+    def release_class(self, section, subject, teacher, day, period):
+        bit = SLOT_BITS[day][period]
+        key = (section, subject)
+        self.classes[section] &= ~bit
+        self.teachers[teacher] &= ~bit
+        self.subject_slots[key] &= ~bit
+        if not self.subject_slots[key] & DAY_BITS[day]:
+            self.subject_days[key] &= ~(1 << day)
+        self._refresh_limits(teacher, day)
+
+    def book_group(self, sections, subject, teachers, day, period):
+        # A CLASS_GROUPS slot: every member section and every group teacher at once
+        bit = SLOT_BITS[day][period]
+        for section in sections:
+            self.classes[section] |= bit
+            self.subject_slots[(section, subject)] |= bit
+            self.subject_days[(section, subject)] |= 1 << day
+        for teacher in teachers:
+            self.teachers[teacher] |= bit
+            self._refresh_limits(teacher, day)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+import math
+import random
+import time
+from occupancy import DAY_MASK, SLOT_BITS, iter_slots
+from variables import DAYS, PERIODS, OPTIMIZE_WEIGHTS, OPTIMIZE_CONSECUTIVE
+
+TERMS = ("idle", "balance", "early", "consecutive")
+
+
+# ------------ DAY COST TABLES -------------
+# Every soft term is a function of one teacher's or one section's day, i.e. of
+# a PERIODS-bit mask, so each is a table lookup and a move only re-reads the
+# handful of (teacher, day) / (section, day) entries it touches.
+def _idle(m):
+    # Free periods between a teacher's first and last busy period
+    return m.bit_length() - (m & -m).bit_length() + 1 - m.bit_count() if m else 0
+
+
+def _excess(m, limit):
+    # Periods taught beyond `limit` in a row, summed over every run
+    excess = run = 0
+    for p in range(PERIODS):
+        run = run + 1 if m >> p & 1 else 0
+        excess += run > limit
+    return excess
+
+
+IDLE = [_idle(m) for m in range(DAY_MASK + 1)]
+EARLY = [sum(p for p in range(PERIODS) if m >> p & 1) for m in range(DAY_MASK + 1)]
+
+
+# ------------ SOFT OBJECTIVE -------------
+# Lower is better, over a feasible schedule (hard rules are never broken):
+#   idle        - gaps in a teacher's day (PREBOOKED slots count as busy)
+#   balance     - sum over sections and days of (periods that day)^2, least
+#                 when a section's load is spread evenly over the week
+#   early       - period index of every theory class (P1 = 0), so classes
+#                 drift towards the morning
+#   consecutive - periods a teacher teaches beyond OPTIMIZE_CONSECUTIVE in a row
+class SoftObjective:
+    def __init__(self, occupancy, weights=None, consecutive=OPTIMIZE_CONSECUTIVE):
+        self.occ = occupancy
+        self.weights = dict(OPTIMIZE_WEIGHTS, **(weights or {}))
+        self.excess = [_excess(m, consecutive) for m in range(DAY_MASK + 1)]
+
+    def teacher_terms(self, teacher, day):
+        occ, shift = self.occ, day * PERIODS
+        taught = occ.teachers.get(teacher, 0) >> shift & DAY_MASK
+        return IDLE[taught | occ.prebooked.get(teacher, 0) >> shift & DAY_MASK], self.excess[taught]
+
+    def section_terms(self, section, day):
+        occ, shift = self.occ, day * PERIODS
+        classes = occ.classes.get(section, 0) >> shift & DAY_MASK
+        load = (classes | occ.section_labs.get(section, 0) >> shift & DAY_MASK).bit_count()
+        return load * load, EARLY[classes]
+
+    def teacher_cost(self, teacher, day):
+        idle, excess = self.teacher_terms(teacher, day)
+        return self.weights["idle"] * idle + self.weights["consecutive"] * excess
+
+    def section_cost(self, section, day):
+        balance, early = self.section_terms(section, day)
+        return self.weights["balance"] * balance + self.weights["early"] * early
+
+    def cost(self, teachers, sections, days):
+        return (sum(self.teacher_cost(t, d) for t in teachers for d in days) +
+                sum(self.section_cost(s, d) for s in sections for d in days))
+
+    def breakdown(self, teachers, sections):
+        # Unweighted term totals plus the weighted total
+        terms = dict.fromkeys(TERMS, 0)
+        for d in range(DAYS):
+            for t in teachers:
+                idle, excess = self.teacher_terms(t, d)
+                terms["idle"] += idle
+                terms["consecutive"] += excess
+            for s in sections:
+                balance, early = self.section_terms(s, d)
+                terms["balance"] += balance
+                terms["early"] += early
+        terms["total"] = sum(self.weights[k] * terms[k] for k in TERMS)
+        return terms
+
+
+# ------------ SIMULATED ANNEALING -------------
+# Improves a finished timetable by moving one theory class to a free slot of
+# its section, or swapping two of a section's theory classes. A move is only
+# tried if it keeps every strict rule (section/teacher free, no PREBOOKED or
+# lab slot, once-per-day, no back-to-back), so feasibility is never traded for
+# quality; labs and locked classes stay put. Each candidate is scored by the
+# delta of the few teacher/section days it touches, accepted by the Metropolis
+# rule while the temperature cools over the time budget, and the best schedule
+# seen is restored at the end by undoing the moves made after it.
+class Optimizer:
+    def __init__(self, theory, seed=None, weights=None, t_start=4.0, t_end=0.05):
+        self.theory = theory
+        self.occ = theory.occupancy
+        self.objective = SoftObjective(self.occ, weights)
+        self.rng = random.Random(seed)
+        self.t_start, self.t_end = t_start, t_end
+        self.sections = sorted(theory.class_schedules)
+        self.teachers = sorted(set(self.occ.teachers) | set(self.occ.prebooked))
+        self.moves = self.accepted = self.improved = 0
+
+    def total(self):
+        return self.objective.cost(self.teachers, self.sections, range(DAYS))
+
+    def run(self, seconds, max_moves=None):
+        start = time.perf_counter()
+        cost = best = self.total()
+        since_best: list[tuple] = []      # applied moves after the best schedule, for undo
+        temperature = self.t_start
+        while max_moves is None or self.moves < max_moves:
+            if self.moves % 256 == 0:
+                progress = (time.perf_counter() - start) / seconds if seconds else 1.0
+                if progress >= 1.0 and max_moves is None:
+                    break
+                if max_moves is not None:
+                    progress = self.moves / max_moves
+                temperature = self.t_start * (self.t_end / self.t_start) ** min(progress, 1.0)
+            self.moves += 1
+            move = self.propose()
+            if move is None:
+                continue
+            delta = self.apply(move)
+            if delta is None:
+                continue
+            if delta <= 0 or self.rng.random() < math.exp(-delta / temperature):
+                self.accepted += 1
+                cost += delta
+                since_best.append(move)
+                if cost < best:
+                    best, since_best = cost, []
+                    self.improved += 1
+            else:
+                self.undo(move)
+        for move in reversed(since_best):
+            self.undo(move)
+        return best
+
+    # --- moves ---
+    def propose(self):
+        # (section, from slot, to slot); the target is a swap if it holds a class
+        sec = self.rng.choice(self.sections)
+        occ = self.occ
+        movable = occ.classes.get(sec, 0) & ~self.theory.locked.get(sec, 0)
+        if not movable:
+            return None
+        slots = list(iter_slots(movable))
+        a = self.rng.choice(slots)
+        b = divmod(self.rng.randrange(DAYS * PERIODS), PERIODS)
+        bit = SLOT_BITS[b[0]][b[1]]
+        if b == a or occ.section_labs.get(sec, 0) & bit or self.theory.locked.get(sec, 0) & bit:
+            return None
+        return sec, a, b
+
+    def _touched(self, sec, a, b):
+        grid = self.theory.class_schedules[sec]
+        teachers = {slot[1] for slot in (grid[a[0]][a[1]], grid[b[0]][b[1]]) if slot}
+        return teachers, {a[0], b[0]}
+
+    def apply(self, move):
+        # Performs the move and returns its cost delta, or None (nothing changed)
+        # when it would break a strict rule
+        sec, a, b = move
+        theory, objective = self.theory, self.objective
+        teachers, days = self._touched(sec, a, b)
+        before = objective.cost(teachers, (sec,), days)
+        first = theory.remove_class(sec, *a)
+        second = theory.remove_class(sec, *b) if theory.class_schedules[sec][b[0]][b[1]] else None
+        if second == first or not self._fits(sec, b, first):
+            self._restore(sec, a, first, b, second)
+            return None
+        theory.place_class(sec, *b, first)
+        if second is not None:
+            if not self._fits(sec, a, second):
+                theory.remove_class(sec, *b)
+                self._restore(sec, a, first, b, second)
+                return None
+            theory.place_class(sec, *a, second)
+        return objective.cost(teachers, (sec,), days) - before
+
+    def undo(self, move):
+        # Reverse of an applied move: swap back, or move the class home again
+        sec, a, b = move
+        theory = self.theory
+        moved = theory.remove_class(sec, *b)
+        other = theory.remove_class(sec, *a) if theory.class_schedules[sec][a[0]][a[1]] else None
+        theory.place_class(sec, *a, moved)
+        if other is not None:
+            theory.place_class(sec, *b, other)
+
+    def _fits(self, sec, slot, subject):
+        return self.theory.blocking_rule(sec, slot[0], slot[1], subject) is None
+
+    def _restore(self, sec, a, first, b, second):
+        self.theory.place_class(sec, *a, first)
+        if second is not None:
+            self.theory.place_class(sec, *b, second)
+
+
+def anneal(theory_gen, seconds, seed=None, weights=None, max_moves=None):
+    # Runs the annealer on a finished TheoryTimetable in place and reports the gain
+    optimizer = Optimizer(theory_gen, seed, weights)
+    before = optimizer.objective.breakdown(optimizer.teachers, optimizer.sections)
+    optimizer.run(seconds, max_moves)
+    after = optimizer.objective.breakdown(optimizer.teachers, optimizer.sections)
+    print(f"Optimized soft cost {before['total']} -> {after['total']} in {optimizer.moves} moves "
+          f"({optimizer.accepted} accepted): " +
+          ", ".join(f"{k} {before[k]}->{after[k]}" for k in TERMS))
+    if theory_gen.profiler:
+        theory_gen.profiler.count("optimize_moves", optimizer.moves)
+        theory_gen.profiler.count("optimize_accepted", optimizer.accepted)
+    return after
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import contextlib
+import json
+import time
+from collections import Counter
+
+# ------------ GENERATOR PROFILER -------------
+# Off unless a Profiler is attached to the generators (build_timetables(...,
+# profile=True) or --profile); every hook in the hot paths is guarded by a
+# single `if self.profiler` check, so a normal run pays nothing else.
+#   counters   - named tallies (can_schedule calls, candidate lookups, ...)
+#   rejections - refused slots by reason (TEACHER BUSY, LAB CONFLICT, ...), from
+#                can_schedule calls and from the greedy's whole-week candidate lookups
+#   phases     - wall time per phase (labs, theory, repair, solve)
+#   events     - structured records (one per pass, per phase, per repair run),
+#                also handed to on_event as they happen
+class Profiler:
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self.counters: Counter = Counter()
+        self.rejections: Counter = Counter()
+        self.phases: dict[str, float] = {}
+        self.events: list[dict] = []
+
+    def __getstate__(self):
+        # Profilers travel back from multistart workers; callbacks do not pickle
+        state = self.__dict__.copy()
+        state["on_event"] = None
+        return state
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def check(self, reason):
+        # One can_schedule outcome; reason is None when the slot was accepted
+        self.counters["can_schedule"] += 1
+        if reason:
+            self.rejections[reason] += 1
+
+    def emit(self, event, **fields):
+        record = {"event": event, **fields}
+        self.events.append(record)
+        if self.on_event:
+            self.on_event(record)
+
+    def record(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+        self.emit("phase", name=name, seconds=round(seconds, 6))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def summary(self):
+        return {
+            "phases": {name: round(s, 6) for name, s in self.phases.items()},
+            "counters": dict(self.counters),
+            "rejections": dict(self.rejections.most_common()),
+            "passes": [e for e in self.events if e["event"] == "pass"],
+        }
+
+    def print_summary(self):
+        print("\n=== PROFILE ===")
+        for name, seconds in self.phases.items():
+            print(f"{'phase ' + name:<28}{seconds*1000:>10.2f} ms")
+        for name, n in sorted(self.counters.items()):
+            print(f"{name:<28}{n:>10}")
+        total = sum(self.rejections.values())
+        for reason, n in self.rejections.most_common():
+            print(f"{'[' + reason + ']':<28}{n:>10}  {100*n/total:5.1f}%")
+        for e in self.events:
+            if e["event"] == "pass":
+                print(f"pass {e['pass']:<3} relax={e['relax']!s:<5} placed={e['placed']:<5} "
+                      f"left={e['remaining']:<5} {e['seconds']*1000:8.2f} ms")
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"summary": self.summary(), "events": self.events}, f, indent=1)
+
+
+def phase(profiler, name):
+    # Times a block when profiling is on, otherwise does nothing
+    return profiler.phase(name) if profiler else contextlib.nullcontext()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+import contextlib
+import copy
+import difflib
+import sys
+from functools import lru_cache
+from model import cell_classes
+from occupancy import DAY_MASK, SLOT_BITS, WEEK_MASK, iter_slots
+from teacher_index import TeacherIndex
+from variables import DAYS, PERIODS, DAY_NAMES
+
+CACHE_SIZE = 512     # rendered views kept per query object
+
+
+def _initials(name):
+    return "".join(word[0] for word in name.replace("&", " ").split())
+
+
+# ------------ TIMETABLE QUERIES -------------
+# Read-only answers over one finished week ("who is free Wed P3?", "which
+# sections have OS on Friday?", "show me 5C's week"). Everything a question
+# needs is indexed once up front: teacher and section week masks, the free
+# teachers of every slot, subject -> placements and (subject, day) -> sections,
+# and a snapshot of the room layers. Lookups are then a list index, a dict hit
+# or a few bit operations; rendered views go through an LRU cache. The object
+# is a snapshot, so build a new one after the schedule changes.
+class TimetableQuery:
+    def __init__(self, lab_schedules, class_schedules, occupancy, lab_rooms=None, class_rooms=None,
+                 teachers=(), cache_size=CACHE_SIZE):
+        self.lab_schedules, self.class_schedules = lab_schedules, class_schedules
+        self.index = TeacherIndex(lab_schedules, class_schedules)
+        self.rooms = copy.deepcopy(occupancy.rooms)
+        self.teachers = sorted(set(teachers) | set(self.index.slots) | set(occupancy.prebooked))
+        self.sections = sorted(class_schedules)
+        self.blocked = {t: occupancy.teacher_blocked(t) for t in self.teachers}
+        self.limited = {t: occupancy.teacher_limited(t) for t in self.teachers}
+        self.taught = {t: occupancy.teachers.get(t, 0) for t in self.teachers}
+        self.section_masks = {s: occupancy.section_busy(s) for s in self.sections}
+        self.section_teachers = {s: {t for row in grid for cell in row if cell for _, t in cell_classes(cell)}
+                                 for s, grid in class_schedules.items()}
+        lab_rooms, class_rooms = lab_rooms or {}, class_rooms or {}
+
+        # teachers free in each slot (PREBOOKED counts as busy), by bit index
+        self.free_at = [tuple(t for t in self.teachers if not self.blocked[t] >> i & 1)
+                        for i in range(DAYS * PERIODS)]
+
+        # subject -> [(day, period, section, batch, teacher, room)] in week order
+        self.placements: dict[str, list[tuple]] = {}
+        for sec, grid in class_schedules.items():
+            for d, row in enumerate(grid):
+                for p, slot in enumerate(row):
+                    for subject, teacher in cell_classes(slot) if slot else ():
+                        self.placements.setdefault(subject, []).append(
+                            (d, p, sec, None, teacher, class_rooms.get((sec, d, p))))
+        for sec, batches in lab_schedules.items():
+            for i, (batch, grid) in enumerate(sorted(batches.items())):
+                for d, row in enumerate(grid):
+                    for p, slot in enumerate(row):
+                        if slot:
+                            rooms = lab_rooms.get((sec, d, p - p % 2))
+                            self.placements.setdefault(slot[0], []).append(
+                                (d, p, sec, batch, slot[1], rooms[i] if rooms else None))
+        self.on_day: dict[tuple, tuple] = {}    # (subject, day or None) -> sections
+        self.teaches: dict[str, set] = {}       # subject -> teachers who hold it anywhere
+        for subject, entries in self.placements.items():
+            entries.sort(key=lambda e: (e[0], e[1], e[2], e[3] or ""))
+            self.teaches[subject] = {e[4] for e in entries}
+            self.on_day[(subject, None)] = tuple(sorted({e[2] for e in entries}))
+            for d in range(DAYS):
+                self.on_day[(subject, d)] = tuple(sorted({e[2] for e in entries if e[0] == d}))
+        self.subjects = sorted(self.placements)
+        self.aliases: dict[str, set] = {}       # "OS" -> {"OPERATING SYSTEM"}
+        for subject in self.subjects:
+            self.aliases.setdefault(_initials(subject).upper(), set()).add(subject)
+
+        self.section_view = lru_cache(maxsize=cache_size)(self._section_view)
+        self.teacher_view = lru_cache(maxsize=cache_size)(self._teacher_view)
+        self.subject_view = lru_cache(maxsize=cache_size)(self._subject_view)
+
+    @classmethod
+    def from_generators(cls, lab_gen, theory_gen, cache_size=CACHE_SIZE):
+        return cls(lab_gen.lab_schedules, theory_gen.class_schedules, theory_gen.occupancy,
+                   lab_gen.lab_rooms, theory_gen.class_rooms, theory_gen.teacher_assignments, cache_size)
+
+    # --- name lookup ---
+    def resolve(self, kind, name):
+        # Exact name, then case-insensitive, then subject initials ("OS"), then a
+        # unique substring; anything else is a KeyError with the closest names
+        names = {"section": self.sections, "teacher": self.teachers, "subject": self.subjects,
+                 "room": sorted(self.rooms.capacity)}[kind]
+        if name in names:
+            return name
+        upper = name.upper()
+        matches = [n for n in names if n.upper() == upper]
+        if not matches and kind == "subject":
+            matches = sorted(self.aliases.get(upper, ()))
+        if not matches:
+            matches = [n for n in names if upper in n.upper()]
+        if len(matches) == 1:
+            return matches[0]
+        if matches:
+            raise KeyError(f"{kind} {name!r} is ambiguous: {', '.join(matches)}")
+        close = difflib.get_close_matches(name, names, n=3)
+        raise KeyError(f"unknown {kind} {name!r}" + (f" (did you mean {', '.join(close)}?)" if close else ""))
+
+    # --- slot lookups ---
+    def free_teachers(self, day, period, subject=None):
+        free = self.free_at[day * PERIODS + period]
+        if subject is None:
+            return free
+        teaches = self.teaches.get(subject, ())
+        return tuple(t for t in free if t in teaches)
+
+    def is_free(self, teacher, day, period):
+        return not self.blocked.get(teacher, 0) & SLOT_BITS[day][period]
+
+    def sections_with(self, subject, day=None):
+        return self.on_day.get((subject, day), ())
+
+    def subject_slots(self, subject, day=None):
+        entries = self.placements.get(subject, [])
+        return entries if day is None else [e for e in entries if e[0] == day]
+
+    def free_rooms(self, day, period, subject=None):
+        # (room, open places) for every room with a place left in the slot
+        bit = SLOT_BITS[day][period]
+        rooms = self.rooms.by_subject.get(subject, ()) if subject else self.rooms.capacity
+        return [(room, sum(not layer & bit for layer in self.rooms.layers[room]))
+                for room in rooms if not self.rooms.layers[room][-1] & bit]
+
+    def free_slots(self, sections=(), teachers=(), rooms=()):
+        # Slots where every given section and teacher is free and every given
+        # room still has a place, e.g. to find a make-up period for a class
+        mask = WEEK_MASK
+        for sec in sections:
+            mask &= ~self.section_masks.get(sec, 0)
+        for teacher in teachers:
+            mask &= ~self.blocked.get(teacher, 0)
+        for room in rooms:
+            if room not in self.rooms.capacity:
+                raise KeyError(f"unknown room {room!r}" + (f" (rooms: {', '.join(self.rooms.capacity)})"
+                                                           if self.rooms else " (no ROOMS configured)"))
+            mask &= self.rooms.free(room)
+        return list(iter_slots(mask))
+
+    def substitutes(self, section, day, period):
+        # Teachers who can cover section's class in the slot: free there and
+        # within their daily/consecutive limits. Those who teach the same
+        # subject come first, then the section's own teachers, then the rest;
+        # ties go to whoever teaches least that day.
+        slot = self.class_schedules[section][day][period]
+        bit = SLOT_BITS[day][period]
+        own = self.section_teachers[section]
+        classes = cell_classes(slot) if slot else ()
+        same = set().union(*(self.teaches.get(subject, ()) for subject, _ in classes))
+        away = {teacher for _, teacher in classes}
+        day_bits = DAY_MASK << day * PERIODS
+
+        def rank(t):
+            return (t not in same, t not in own, (self.taught[t] & day_bits).bit_count(), t)
+
+        return sorted((t for t in self.free_at[day * PERIODS + period]
+                       if t not in away and not self.limited[t] & bit), key=rank)
+
+    # --- per-entity views ---
+    def section_grid(self, section):
+        # Theory cells as "SUBJECT (Teacher)", lab periods as "B1 subject / B2 subject"
+        grid = [["-"] * PERIODS for _ in range(DAYS)]
+        for d, row in enumerate(self.class_schedules[section]):
+            for p, slot in enumerate(row):
+                if slot:
+                    grid[d][p] = f"{slot[0]} ({slot[1]})"
+        for batch, batch_grid in sorted(self.lab_schedules.get(section, {}).items()):
+            for d, row in enumerate(batch_grid):
+                for p, slot in enumerate(row):
+                    if slot:
+                        cell = f"{batch} {slot[0]}"
+                        grid[d][p] = cell if grid[d][p] == "-" else f"{grid[d][p]} / {cell}"
+        return grid
+
+    def _section_view(self, section):
+        return _render(f"Section {section}", self.section_grid(section))
+
+    def _teacher_view(self, teacher):
+        grid = self.index.grid(teacher)
+        prebooked = self.blocked.get(teacher, 0) & ~self.taught.get(teacher, 0)
+        for d, p in iter_slots(prebooked):
+            grid[d][p] = "PREBOOKED"
+        return _render(teacher, grid)
+
+    def _subject_view(self, subject, day=None):
+        lines = [f"{subject}:"]
+        for d, p, sec, batch, teacher, room in self.subject_slots(subject, day):
+            where = f"{sec}-{batch}" if batch else sec
+            lines.append(f"  {DAY_NAMES[d]} P{p+1}  {where:<8} {teacher}" + (f"  @{room}" if room else ""))
+        return "\n".join(lines)
+
+    def cache_info(self):
+        return {name: getattr(self, name).cache_info()
+                for name in ("section_view", "teacher_view", "subject_view")}
+
+
+def _render(title, grid, width=24):
+    lines = [f"{title}:", "Day " + "".join(f"{f'P{i+1}':^{width+1}}" for i in range(PERIODS))]
+    for d, cells in enumerate(grid):
+        lines.append(f"{DAY_NAMES[d]:<4}" + "".join(f"{cell[:width-2]:^{width+1}}" for cell in cells))
+    return "\n".join(lines)
+
+
+# ------------ CLI -------------
+def parse_slot(day, period):
+    # "Wed" / "wednesday" / "3" (1-based) and "P3" / "3"
+    names = [n.lower() for n in DAY_NAMES]
+    d = names.index(day[:3].lower()) if day[:3].lower() in names else int(day) - 1
+    p = int(period.upper().lstrip("P")) - 1
+    if not (0 <= d < DAYS and 0 <= p < PERIODS):
+        raise ValueError(f"no slot {day} {period}")
+    return d, p
+
+
+def load_query(load=None, seed=42, attempts=1):
+    # Generation progress goes to stderr so stdout holds only the answer
+    import timetable
+    with contextlib.redirect_stdout(sys.stderr):
+        week = timetable.load(load) if load else timetable.generate(seed, attempts)
+        return week.query
+
+
+def main(args):
+    q = load_query(args.load, args.seed, args.attempts)
+    try:
+        if args.command == "free":
+            d, p = parse_slot(args.day, args.period)
+            subject = q.resolve("subject", args.subject) if args.subject else None
+            print(f"Free {DAY_NAMES[d]} P{p+1}: " + (", ".join(q.free_teachers(d, p, subject)) or "nobody"))
+        elif args.command == "section":
+            print(q.section_view(q.resolve("section", args.name)))
+        elif args.command == "teacher":
+            print(q.teacher_view(q.resolve("teacher", args.name)))
+        elif args.command == "subject":
+            subject = q.resolve("subject", args.name)
+            day = parse_slot(args.day, "1")[0] if args.day else None
+            print(q.subject_view(subject, day))
+            print("Sections: " + (", ".join(q.sections_with(subject, day)) or "none"))
+        elif args.command == "rooms":
+            d, p = parse_slot(args.day, args.period)
+            if not q.rooms:
+                sys.exit("No rooms configured (see ROOMS in variables.py)")
+            free = q.free_rooms(d, p)
+            print(f"Free rooms {DAY_NAMES[d]} P{p+1}: " +
+                  (", ".join(f"{room} ({n})" for room, n in free) or "none"))
+        elif args.command == "slots":
+            slots = q.free_slots([q.resolve("section", s) for s in args.section],
+                                 [q.resolve("teacher", t) for t in args.teacher],
+                                 [q.resolve("room", r) for r in args.room])
+            print(", ".join(f"{DAY_NAMES[d]} P{p+1}" for d, p in slots) or "no common free slot")
+        elif args.command == "substitute":
+            section = q.resolve("section", args.section)
+            d, p = parse_slot(args.day, args.period)
+            print(f"Cover for {section} {DAY_NAMES[d]} P{p+1}: " +
+                  (", ".join(q.substitutes(section, d, p)) or "nobody"))
+    except (KeyError, ValueError) as e:
+        sys.exit(e.args[0])
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Answer questions about a generated timetable.")
+    parser.add_argument("--load", metavar="PATH", help="query a schedule saved with --save instead of generating one")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--attempts", type=int, default=1)
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("free", help="teachers free in a slot")
+    cmd.add_argument("day")
+    cmd.add_argument("period")
+    cmd.add_argument("--subject", help="only teachers who teach this subject")
+    sub.add_parser("section", help="a section's week").add_argument("name")
+    sub.add_parser("teacher", help="a teacher's week").add_argument("name")
+    cmd = sub.add_parser("subject", help="where and when a subject is taught")
+    cmd.add_argument("name")
+    cmd.add_argument("--day")
+    cmd = sub.add_parser("rooms", help="rooms with a place left in a slot")
+    cmd.add_argument("day")
+    cmd.add_argument("period")
+    cmd = sub.add_parser("slots", help="slots where all the given sections, teachers and rooms are free")
+    cmd.add_argument("--section", action="append", default=[])
+    cmd.add_argument("--teacher", action="append", default=[])
+    cmd.add_argument("--room", action="append", default=[])
+    cmd = sub.add_parser("substitute", help="who can cover a section's class")
+    cmd.add_argument("section")
+    cmd.add_argument("day")
+    cmd.add_argument("period")
+    main(parser.parse_args())
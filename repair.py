@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+from occupancy import SLOT_BITS, iter_slots
+from variables import DAYS, PERIODS
+
+# ------------ REPAIR ENGINE -------------
+# Places [UNPLACED] subjects with short ejection chains over the section-slot /
+# teacher-slot conflict graph. To put (section, subject) on a slot we may evict
+# the theory class holding the section there and the one holding the teacher,
+# then re-insert every evicted class elsewhere, at most max_depth levels deep.
+# Labs and PREBOOKED slots are never touched, and every move goes through
+# place_class/remove_class so the occupancy masks stay consistent.
+# One node budget covers the whole run and grows with the number of classes;
+# each insert may spend at most attempt_nodes of it, since inserts that work
+# are found within a few hundred nodes and hopeless ones would spend the rest.
+# A failed insert is rolled back, leaving the grid as it was, so the same
+# (section, subject) is not tried again until another insert has succeeded.
+class RepairEngine:
+    def __init__(self, theory, max_depth=3, max_nodes=None, attempt_nodes=300):
+        self.theory = theory
+        self.occupancy = theory.occupancy
+        self.max_depth = max_depth
+        copies = sum(sum(demand.values()) for demand in theory.section_demand.values())
+        self.max_nodes = max_nodes if max_nodes is not None else 2000 + 50 * copies
+        self.attempt_nodes = attempt_nodes      # per insert, so one hopeless class cannot use it all
+        self.limit = 0
+        self.journal: list[tuple] = []
+        self.pinned: set[tuple[str, int]] = set()
+        self.nodes = 0
+        self.total_nodes = 0
+        if not theory.candidates:
+            theory.index_candidates()
+
+    def repair(self, unplaced):
+        failed: set[tuple[str, str]] = set()     # cleared whenever the grid changes
+        for sec in list(unplaced):
+            for subj in list(unplaced[sec]):
+                if (sec, subj) not in self.theory.section_subject_teacher or (sec, subj) in failed:
+                    continue
+                if self.nodes > self.max_nodes:
+                    break
+                self.journal, self.pinned = [], set()
+                self.limit = min(self.nodes + self.attempt_nodes, self.max_nodes)
+                if self.insert(sec, subj, self.max_depth):
+                    unplaced[sec].remove(subj)
+                    failed.clear()
+                else:
+                    self.rollback(0)
+                    failed.add((sec, subj))
+                self.total_nodes = self.nodes
+
+    def insert(self, section, subject, depth):
+        theory = self.theory
+        for relax in (False, True):
+            free = theory.candidate_slots(section, subject, relax_rules=relax)
+            if free:
+                load = theory.day_load[section]
+                day, period = min(iter_slots(free), key=lambda s: (load[s[0]], s[1]))
+                self.place(section, day, period, subject)
+                return True
+        if depth == 0:
+            return False
+
+        # Slots where only movable theory classes are in the way, fewest evictions first
+        occ = self.occupancy
+        teacher = theory.section_subject_teacher[(section, subject)]
+        rule_slots = occ.subject_day_slots(section, subject) | occ.subject_neighbours(section, subject)
+        options = []
+        for d in range(DAYS):
+            for p in range(PERIODS):
+                bit = SLOT_BITS[d][p]
+                found = self.blockers(section, teacher, bit)
+                if found is None or any((s, bit) in self.pinned for s in found):
+                    continue
+                options.append((len(found), bool(rule_slots & bit), d, p, found))
+        options.sort(key=lambda o: o[:4])
+
+        for _, _, d, p, found in options:
+            self.nodes += 1
+            if self.nodes > self.limit:
+                return False
+            mark = len(self.journal)
+            evicted = [(s, self.remove(s, d, p)) for s in found]
+            if theory.can_schedule(section, d, p, subject, relax_rules=True):
+                self.place(section, d, p, subject)
+                if all(self.insert(s, subj, depth - 1) for s, subj in evicted):
+                    return True
+            self.rollback(mark)
+        return False
+
+    def blockers(self, section, teacher, bit):
+        # Sections whose theory class sits on this slot for the section or the
+        # teacher; None when a lab, prebooking or locked class pins the slot.
+        occ = self.occupancy
+        if (occ.section_labs.get(section, 0) | occ.prebooked.get(teacher, 0)) & bit:
+            return None
+        found = []
+        if occ.classes.get(section, 0) & bit:
+            found.append(section)
+        if occ.teachers.get(teacher, 0) & bit:
+            owner = next((sec for sec, subj in self.theory.teacher_keys[teacher]
+                          if occ.subject_slots.get((sec, subj), 0) & bit), None)
+            if owner is None:
+                return None
+            if owner != section:
+                found.append(owner)
+        if any(self.theory.locked.get(s, 0) & bit for s in found):
+            return None
+        return found
+
+    # --- journaled moves ---
+    def place(self, section, day, period, subject):
+        self.theory.place_class(section, day, period, subject)
+        self.pinned.add((section, SLOT_BITS[day][period]))
+        self.journal.append(('place', section, day, period, subject))
+
+    def remove(self, section, day, period):
+        subject = self.theory.remove_class(section, day, period)
+        self.journal.append(('remove', section, day, period, subject))
+        return subject
+
+    def rollback(self, mark):
+        while len(self.journal) > mark:
+            action, section, day, period, subject = self.journal.pop()
+            if action == 'place':
+                self.theory.remove_class(section, day, period)
+                self.pinned.discard((section, SLOT_BITS[day][period]))
+            else:
+                self.theory.place_class(section, day, period, subject)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+from itertools import product
+from variables import DAYS, PERIODS
+
+WEEK_MASK = (1 << (DAYS * PERIODS)) - 1     # same as occupancy.WEEK_MASK (occupancy imports this module)
+
+
+# ------------ ROOM OCCUPANCY -------------
+# Rooms from ROOMS, each hosting up to `capacity` batches/classes at once and
+# only the subjects it lists. A room's bookings are kept as capacity stacked
+# week masks: layers[i] holds the slots where more than i of its places are
+# taken, so "free at least once" is ~layers[-1] and every check stays a few
+# bit operations. Subjects no room lists are room-free (ordinary classrooms)
+# and never touch this index.
+class Rooms:
+    def __init__(self, rooms=None):
+        self.capacity: dict[str, int] = {}
+        self.layers: dict[str, list[int]] = {}
+        self.by_subject: dict[str, list[str]] = {}     # subject -> rooms that may host it, in ROOMS order
+        for room, spec in (rooms or {}).items():
+            self.capacity[room] = spec.get('capacity', 1)
+            self.layers[room] = [0] * self.capacity[room]
+            for subject in spec['subjects']:
+                self.by_subject.setdefault(subject, []).append(room)
+
+    def __bool__(self):
+        return bool(self.capacity)
+
+    def spec(self):
+        # Back to the ROOMS form it was built from (saved with a week)
+        return {room: {'capacity': capacity, 'subjects': [s for s, rooms in self.by_subject.items() if room in rooms]}
+                for room, capacity in self.capacity.items()}
+
+    def bound(self, subject):
+        return subject in self.by_subject
+
+    # --- free masks ---
+    def free(self, room, places=1):
+        # Slots where at least `places` of the room's places are still open
+        layers = self.layers[room]
+        return WEEK_MASK & ~layers[-places] if places <= len(layers) else 0
+
+    def subject_free(self, subject):
+        # Slots where some room can take one more class of this subject
+        if subject not in self.by_subject:
+            return WEEK_MASK
+        mask = 0
+        for room in self.by_subject[subject]:
+            mask |= self.free(room)
+        return mask
+
+    def block_free(self, subject):
+        # Starts s where one room can host the subject for s and s+1
+        if subject not in self.by_subject:
+            return WEEK_MASK
+        mask = 0
+        for room in self.by_subject[subject]:
+            mask |= self.block_free_room(room)
+        return mask
+
+    def pair_free(self, subject_a, subject_b):
+        # Starts s where both lab batches of a block get a room for s and s+1
+        if subject_a not in self.by_subject:
+            return self.block_free(subject_b)
+        if subject_b not in self.by_subject:
+            return self.block_free(subject_a)
+        mask = 0
+        for room_a, room_b in product(self.by_subject[subject_a], self.by_subject[subject_b]):
+            if room_a == room_b:
+                free = self.free(room_a, 2)
+                mask |= free & (free >> 1)
+            else:
+                mask |= self.block_free_room(room_a) & self.block_free_room(room_b)
+        return mask
+
+    def block_free_room(self, room):
+        free = self.free(room)
+        return free & (free >> 1)
+
+    def block_places(self, room, starts):
+        # Open places summed over the block starts in `starts`
+        total = 0
+        for layer in self.layers[room]:
+            free = ~layer
+            total += (free & (free >> 1) & starts).bit_count()
+        return total
+
+    # --- assignment ---
+    def assign(self, subjects, bits):
+        # One room per subject (None if room-free) that can all be booked on
+        # `bits` together, or None when no combination fits
+        options = [self.by_subject.get(subject, [None]) for subject in subjects]
+        for rooms in product(*options):
+            taken: dict[str, int] = {}
+            for room in rooms:
+                if room is not None:
+                    taken[room] = taken.get(room, 0) + 1
+            if all(self.free(room, n) & bits == bits for room, n in taken.items()):
+                return list(rooms)
+        return None
+
+    def book(self, room, bits):
+        # Each slot of bits takes the lowest open place
+        carry = bits
+        for i, layer in enumerate(self.layers[room]):
+            add = carry & ~layer
+            self.layers[room][i] = layer | add
+            carry &= ~add
+            if not carry:
+                return
+
+    def release(self, room, bits):
+        # Frees the highest taken place, keeping layers[i+1] inside layers[i]
+        carry = bits
+        layers = self.layers[room]
+        for i in range(len(layers) - 1, -1, -1):
+            drop = carry & layers[i]
+            layers[i] &= ~drop
+            carry &= ~drop
+            if not carry:
+                return
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+import contextlib
+import copy
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from generate_timetable import build_timetables
+from model import INPUT_KEYS, ModelError, compile_model, current_config
+from multistart import score_schedule
+from optimize import SoftObjective
+from variables import ENGINE, OPTIMIZE_SECONDS
+
+BASE = "(base)"
+COLUMNS = ("scenario", "status", "seed", "unplaced", "labs_missing", "violations", "imbalance",
+           "soft", "idle", "consecutive", "teachers", "sections", "seconds")
+PAIR_INPUTS = ("TEACHER_ASSIGNMENTS", "LAB_SUBJECTS", "PREBOOKED")     # lists of pairs -> tuples
+
+
+# ------------ SCENARIOS -------------
+# A scenario is variables.py with some inputs overridden. Overrides merge one
+# level deep: each entry replaces the base entry of the same name (a teacher
+# in TEACHER_ASSIGNMENTS, a year in SUBJECTS_PER_YEAR, a section in
+# LAB_SUBJECTS, ...) and null/None removes it, so a hire is one new teacher
+# entry and a leave is that teacher set to null plus whoever takes over.
+# Scenarios come from a directory (every *.json or *.py file is one scenario,
+# named after the file; a .py file sets the same names variables.py does) or a
+# JSON manifest {"name": {overrides}}.
+def read_scenarios(path):
+    if os.path.isdir(path):
+        scenarios = {}
+        for filename in sorted(os.listdir(path)):
+            name, ext = os.path.splitext(filename)
+            full = os.path.join(path, filename)
+            if ext == ".json":
+                with open(full, encoding="utf-8") as f:
+                    scenarios[name] = json.load(f)
+            elif ext == ".py":
+                namespace = {}
+                with open(full, encoding="utf-8") as f:
+                    exec(compile(f.read(), full, "exec"), namespace)
+                scenarios[name] = {key: namespace[key] for key in INPUT_KEYS if key in namespace}
+        return scenarios
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def apply_overrides(base, overrides):
+    unknown = sorted(set(overrides) - set(INPUT_KEYS))
+    if unknown:
+        raise ModelError(f"unknown input {', '.join(unknown)} (overridable: {', '.join(INPUT_KEYS)})")
+    config = copy.deepcopy(base)
+    for key, entries in overrides.items():
+        if not isinstance(entries, dict):
+            raise ModelError(f"{key}: overrides must map names to new entries (or null to remove one)")
+        merged = config.setdefault(key, {})
+        for name, value in entries.items():
+            if value is None:
+                merged.pop(name, None)
+            elif key in PAIR_INPUTS:
+                merged[name] = [tuple(pair) for pair in value]
+            else:
+                merged[name] = value
+    return config
+
+
+# ------------ ONE SCENARIO -------------
+def run_scenario(name, config, model, seed=42, attempts=1, engine=ENGINE, optimize=OPTIMIZE_SECONDS):
+    # Worker entry point: the model arrives compiled, so workers never re-validate.
+    # Of `attempts` seeds the best-scoring one is reported.
+    start = time.perf_counter()
+    best = None
+    for s in range(seed, seed + attempts):
+        with contextlib.redirect_stdout(io.StringIO()):
+            lab_gen, theory_gen = build_timetables(s, engine, False, optimize, config, model)
+        labs_missing = sum(len(labs) - sum(lab_gen.labs_per_day.get(sec, ()))
+                           for sec, labs in config["LAB_SUBJECTS"].items())
+        key = (labs_missing,) + score_schedule(lab_gen, theory_gen)
+        if best is None or key < best[0]:
+            best = key, s, theory_gen
+        if key[:3] == (0, 0, 0):
+            break
+    (labs_missing, unplaced, violations, imbalance), s, theory_gen = best
+    occ = theory_gen.occupancy
+    soft = SoftObjective(occ).breakdown(sorted(set(occ.teachers) | set(occ.prebooked)),
+                                        sorted(theory_gen.class_schedules))
+    if unplaced or labs_missing:
+        status = "short"
+    else:
+        status = "relaxed" if violations else "ok"
+    return {
+        "scenario": name, "status": status, "seed": s, "unplaced": unplaced, "labs_missing": labs_missing,
+        "violations": violations, "imbalance": imbalance, "soft": soft["total"], "idle": soft["idle"],
+        "consecutive": soft["consecutive"], "teachers": len(model.teachers), "sections": len(model.sections),
+        "seconds": round(time.perf_counter() - start, 3),
+        "unplaced_subjects": {sec: subs for sec, subs in theory_gen.unplaced.items() if subs},
+    }
+
+
+def invalid_row(name, error):
+    return dict(dict.fromkeys(COLUMNS, ""), scenario=name, status="INVALID", error=str(error))
+
+
+# ------------ BATCH -------------
+def run_batch(scenarios, seed=42, attempts=1, workers=None, engine=ENGINE, optimize=OPTIMIZE_SECONDS,
+              base=True):
+    # Every config is validated and compiled here, once, before any worker
+    # starts (identical configs share one model through the content-hash cache),
+    # so a broken scenario costs milliseconds and becomes an INVALID row.
+    base_config = current_config()
+    compile_model(base_config)      # a broken variables.py fails the whole batch up front
+    jobs, rows = [], {}
+    for name, overrides in ([(BASE, {})] if base else []) + list(scenarios.items()):
+        try:
+            config = apply_overrides(base_config, overrides)
+            jobs.append((name, config, compile_model(config)))
+        except ModelError as e:
+            rows[name] = invalid_row(name, e)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_scenario, name, config, model, seed, attempts, engine, optimize): name
+                   for name, config, model in jobs}
+        for future in as_completed(futures):
+            row = future.result()
+            rows[row["scenario"]] = row
+            print(f"{row['scenario']}: {row['status']} in {row['seconds']}s", file=sys.stderr)
+    order = ([BASE] if base else []) + list(scenarios)
+    return [rows[name] for name in order]
+
+
+# ------------ REPORT -------------
+def print_table(rows):
+    width = max(len(str(r["scenario"])) for r in rows) + 2
+    print(f"{'scenario':<{width}}" + "".join(f"{c:>13}" for c in COLUMNS[1:]))
+    for r in rows:
+        print(f"{r['scenario']:<{width}}" + "".join(f"{r[c]!s:>13}" for c in COLUMNS[1:]))
+    for r in rows:
+        if r["status"] == "INVALID":
+            print(f"\n[INVALID] {r['scenario']}:\n  " + r["error"].replace("\n", "\n  "))
+        elif r["unplaced_subjects"]:
+            print(f"\n[UNPLACED] {r['scenario']}: " +
+                  "; ".join(f"{sec}: {', '.join(subs)}" for sec, subs in sorted(r["unplaced_subjects"].items())))
+
+
+def write_report(rows, json_path=None, csv_path=None):
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=1, ensure_ascii=False)
+    if csv_path:
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main(path, seed=42, attempts=1, workers=None, engine=ENGINE, optimize=OPTIMIZE_SECONDS, base=True,
+         json_path=None, csv_path=None):
+    try:
+        rows = run_batch(read_scenarios(path), seed, attempts, workers, engine, optimize, base)
+    except ModelError as e:
+        raise SystemExit(f"variables.py is inconsistent:\n{e}")
+    print_table(rows)
+    write_report(rows, json_path, csv_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Solve many what-if variants of variables.py and compare them.")
+    parser.add_argument("scenarios", help="directory of *.json/*.py scenario files, or a JSON manifest")
+    parser.add_argument("--seed", type=int, default=42, help="first seed tried for every scenario")
+    parser.add_argument("--attempts", type=int, default=1, help="seeds tried per scenario (best is kept)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--engine", choices=["greedy", "exact"], default=ENGINE)
+    parser.add_argument("--optimize", type=float, default=OPTIMIZE_SECONDS, metavar="SECONDS")
+    parser.add_argument("--no-base", action="store_true", help="leave the unmodified variables.py out of the table")
+    parser.add_argument("--json", metavar="FILE", help="also write every row (with unplaced subjects) as JSON")
+    parser.add_argument("--csv", metavar="FILE", help="also write the table as CSV")
+    args = parser.parse_args()
+    main(args.scenarios, args.seed, args.attempts, args.workers, args.engine, args.optimize, not args.no_base,
+         args.json, args.csv)
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+import time
+from occupancy import SLOT_BITS, DAY_BITS, WEEK_MASK, CLOSED_SLOTS, iter_slots
+from profiling import phase
+from variables import DAYS, PERIODS
+
+# Lab blocks may start at P1/P3/P5 (0/2/4); listed in the greedy's preference order
+LAB_STARTS = [(d, s) for s in range(PERIODS - 2, -1, -2) for d in range(DAYS)]
+LAB_START_BITS = [SLOT_BITS[d][s] | SLOT_BITS[d][s+1] for d, s in LAB_STARTS]
+FIRST_OF_BLOCK = sum(SLOT_BITS[d][s] for d, s in LAB_STARTS)
+# Slots strictly after a given day / slot, used to order interchangeable copies
+AFTER_DAY = [sum(DAY_BITS[d+1:]) for d in range(DAYS)]
+AFTER_SLOT = [WEEK_MASK & ~((2 << i) - 1) for i in range(DAYS * PERIODS)]
+
+LAB, THEORY = 0, 1
+
+
+def day_count(mask):
+    return sum(1 for d in range(DAYS) if mask & DAY_BITS[d])
+
+
+def pair_labs(labs):
+    # B1 -> B2 lab index per block: a matching where no lab meets itself and the
+    # two labs of a block have different teachers. (i, i+1) is tried first, so
+    # the usual cycle is kept whenever it is valid; labs that cannot be matched
+    # are left out (None)
+    n = len(labs)
+    options = [[b for b in [(a + 1) % n] + list(range(n)) if b != a and labs[b][1] != labs[a][1]]
+               for a in range(n)]
+    b1_of: dict[int, int] = {}
+
+    def augment(a, seen):
+        for b in options[a]:
+            if b not in seen:
+                seen.add(b)
+                if b not in b1_of or augment(b1_of[b], seen):
+                    b1_of[b] = a
+                    return True
+        return False
+
+    for a in range(n):
+        augment(a, set())
+    b2_of = {a: b for b, a in b1_of.items()}
+    return [b2_of.get(a) for a in range(n)]
+
+
+# ------------ ENGINES -------------
+# An engine fills a fresh LabTimetable + TheoryTimetable pair in place.
+class GreedyEngine:
+    name = "greedy"
+
+    def solve(self, lab_gen, theory_gen):
+        with phase(lab_gen.profiler, "labs"):
+            lab_gen.generate_lab_pairs()
+        theory_gen.generate_timetable()
+        return True
+
+
+class BacktrackingEngine:
+    # Exact search over labs and theory copies: MRV variable ordering, forward
+    # checking on bitmask domains, plus section/teacher capacity propagation.
+    # Returns True when solved, False when the rules are proven infeasible and
+    # None when max_nodes/time_limit ran out first. With relax=None the strict
+    # rules are tried first and once-per-day/back-to-back are dropped only if
+    # they are proven infeasible, like the greedy's relaxed passes.
+    # CLASS_GROUPS are placed whole before the search starts, as the greedy
+    # does, and the search fills the rest around them. Variables that need a
+    # ROOMS room go first, and their slack also counts the free places of
+    # those rooms against everything still owed to them.
+    name = "exact"
+
+    def __init__(self, relax=None, max_nodes=200000, time_limit=None):
+        self.relax = relax
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.nodes = 0
+        self.trail: list[tuple] = []
+
+    def solve(self, lab_gen, theory_gen):
+        self.lab_gen = lab_gen
+        self.theory = theory_gen
+        self.occ = theory_gen.occupancy
+        profiler = theory_gen.profiler
+        with phase(profiler if theory_gen.groups else None, "groups"):
+            theory_gen.place_groups()
+        self.lab_pairs = {}
+        for section, labs in lab_gen.lab_subjects.items():
+            if len(labs) < 2:
+                continue
+            self.lab_pairs[section] = pair_labs(labs)
+            left = [i for i, b in enumerate(self.lab_pairs[section]) if b is None]
+            left2 = [b for b in range(len(labs)) if b not in self.lab_pairs[section]]
+            for a, b in zip(left, left2[1:] + left2[:1]):
+                if profiler:
+                    profiler.count("lab_pairs_unplaced")
+                print(f"WARNING: Could not place labs {labs[a][0]}/{labs[b][0]} for {section}"
+                      " (no B1/B2 pairing keeps every teacher on one batch)")
+        for relax in ((False, True) if self.relax is None else (self.relax,)):
+            self.relax_rules = relax
+            self.nodes, self.trail = 0, []
+            with phase(profiler, "strict search" if not relax else "relaxed search"):
+                self.build_variables()
+                status = self.search()
+            if profiler:
+                profiler.count("search_nodes", self.nodes)
+            if status is not False:
+                break
+            print(f"[INFEASIBLE] no timetable satisfies the {'relaxed' if relax else 'strict'} rules")
+        theory_gen.unplaced = {sec: [] for sec in theory_gen.class_schedules}
+        for v in range(len(self.kind)):
+            if self.kind[v] == THEORY:
+                theory_gen.unplaced[self.section[v]].extend([self.subject[v]] * self.remaining[v])
+        for sec, subj in self.no_teacher:
+            theory_gen.unplaced[sec].append(subj)
+        for sec, labels in theory_gen.remaining_groups().items():
+            theory_gen.unplaced[sec] += labels
+        return status
+
+    # --- model ---
+    def build_variables(self):
+        self.kind, self.section, self.subject, self.teachers = [], [], [], []
+        self.labs, self.remaining, self.last = [], [], []
+        self.no_teacher = []
+        self.rooms_of = []      # ROOMS rooms each variable may use
+        # B1 and B2 teachers differ within a block (pair_labs), so each is its own resource
+        for section, pairs in self.lab_pairs.items():
+            labs = self.lab_gen.lab_subjects[section]
+            for a, b in enumerate(pairs):
+                if b is not None:
+                    self.add_variable(LAB, section, None, (labs[a][1], labs[b][1]), (labs[a], labs[b]), 1)
+        theory = self.theory
+        for sec in theory.class_schedules:
+            for subj, freq in theory.section_demand[sec].items():
+                teacher = theory.section_subject_teacher.get((sec, subj))
+                if teacher is None:
+                    self.no_teacher.extend([(sec, subj)] * freq)
+                else:
+                    self.add_variable(THEORY, sec, subj, {teacher}, None, freq)
+
+        self.by_section, self.by_teacher, self.by_room = {}, {}, {}
+        self.section_demand, self.teacher_demand = {}, {}
+        rooms = self.occ.rooms
+        for v in range(len(self.kind)):
+            periods = 2 if self.kind[v] == LAB else 1
+            self.by_section.setdefault(self.section[v], []).append(v)
+            subjects = [subj for subj, _ in self.labs[v]] if self.kind[v] == LAB else [self.subject[v]]
+            for room in dict.fromkeys(r for subj in subjects for r in rooms.by_subject.get(subj, ())):
+                self.by_room.setdefault(room, []).append(v)
+                self.rooms_of[v].append(room)
+            self.section_demand[self.section[v]] = self.section_demand.get(self.section[v], 0) + periods * self.remaining[v]
+            for t in self.teachers[v]:
+                self.by_teacher.setdefault(t, []).append(v)
+                self.teacher_demand[t] = self.teacher_demand.get(t, 0) + periods * self.remaining[v]
+        # ROOMS capacity, grouped as in LabPlacer: the subjects that can only use
+        # rooms G must fit in G's free places (lab batch blocks and theory periods)
+        self.room_need: dict[str, int] = {}
+        self.lab_rooms_need: set[str] = set()
+        self.bound = [self.room_subjects(v) for v in range(len(self.kind))]
+        for v in range(len(self.kind)):
+            for subj in self.bound[v]:
+                self.room_need[subj] = self.room_need.get(subj, 0) + self.remaining[v]
+                if self.kind[v] == LAB:
+                    self.lab_rooms_need.add(subj)
+        room_sets = sorted({tuple(rooms.by_subject[s]) for s in self.room_need})
+        self.room_groups = [(group, [s for s in self.room_need if set(rooms.by_subject[s]) <= set(group)])
+                            for group in room_sets]
+        self.groups_of = [sorted({g for s in self.bound[v] for g, (_, subs) in enumerate(self.room_groups)
+                                  if s in subs}) for v in range(len(self.kind))]
+        self.domain = [self.compute_domain(v) for v in range(len(self.kind))]
+
+    def room_subjects(self, v):
+        # The variable's subjects that must get a ROOMS room, once per batch block
+        subjects = [subj for subj, _ in self.labs[v]] if self.kind[v] == LAB else [self.subject[v]]
+        return [subj for subj in subjects if self.occ.rooms.bound(subj)]
+
+    def room_slack(self, g):
+        group, subjects = self.room_groups[g]
+        rooms = self.occ.rooms
+        blocks = sum(self.room_need[s] for s in subjects if s in self.lab_rooms_need)
+        periods = sum(self.room_need[s] for s in subjects if s not in self.lab_rooms_need)
+        free = sum((WEEK_MASK & ~(layer | CLOSED_SLOTS)).bit_count() for r in group for layer in rooms.layers[r])
+        return min(sum(rooms.block_places(r, FIRST_OF_BLOCK) for r in group) - blocks, free - 2 * blocks - periods)
+
+    def add_variable(self, kind, section, subject, teachers, labs, count):
+        self.kind.append(kind)
+        self.section.append(section)
+        self.subject.append(subject)
+        self.teachers.append(tuple(teachers))
+        self.labs.append(labs)
+        self.rooms_of.append([])
+        self.remaining.append(count)
+        self.last.append(-1)
+
+    def compute_domain(self, v):
+        occ = self.occ
+        blocked = occ.section_busy(self.section[v])
+        for t in self.teachers[v]:
+            blocked |= occ.teacher_blocked(t)
+        if self.kind[v] == LAB:
+            per_day = self.lab_gen.labs_per_day[self.section[v]]
+            for t in self.teachers[v]:
+                blocked |= occ.lab_start_limited(t)
+            if occ.rooms:
+                (b1_sub, _), (b2_sub, _) = self.labs[v]
+                blocked |= ~occ.rooms.pair_free(b1_sub, b2_sub) & FIRST_OF_BLOCK
+            dom = 0
+            for i, bits in enumerate(LAB_START_BITS):
+                if not blocked & bits and per_day[LAB_STARTS[i][0]] < 2:
+                    dom |= 1 << i
+            return dom
+        teacher = self.teachers[v][0]
+        dom = WEEK_MASK & ~(blocked | occ.teacher_limited(teacher)) & occ.rooms.subject_free(self.subject[v])
+        if self.relax_rules:
+            if self.last[v] >= 0:
+                dom &= AFTER_SLOT[self.last[v]]
+        else:
+            dom &= ~(occ.subject_day_slots(self.section[v], self.subject[v]) | occ.free_day_slots(teacher))
+            if self.last[v] >= 0:
+                dom &= AFTER_DAY[self.last[v] // PERIODS]
+        return dom
+
+    def slack(self, v, room_slack=None):
+        dom = self.domain[v]
+        if self.kind[v] == LAB or self.relax_rules:
+            slack = dom.bit_count() - self.remaining[v]
+        else:
+            slack = day_count(dom) - self.remaining[v]
+        for g in self.groups_of[v]:
+            slack = min(slack, room_slack[g] if room_slack else self.room_slack(g))
+        return slack
+
+    # --- search ---
+    def select(self):
+        best, best_key = None, None
+        room_slack = [self.room_slack(g) for g in range(len(self.room_groups))]
+        for v in range(len(self.kind)):
+            if self.remaining[v]:
+                key = (not self.groups_of[v], self.slack(v, room_slack), self.domain[v].bit_count(), self.kind[v])
+                if best_key is None or key < best_key:
+                    best, best_key = v, key
+        return best
+
+    def values(self, v):
+        if self.kind[v] == LAB:
+            return [i for i in range(len(LAB_STARTS)) if self.domain[v] >> i & 1]
+        # Lightest day first keeps the week balanced; forward checking stops a
+        # copy from taking a day its later copies would need
+        load = self.theory.day_load[self.section[v]]
+        return sorted(iter_slots(self.domain[v]), key=lambda s: (load[s[0]], s))
+
+    def search(self):
+        deadline = time.monotonic() + self.time_limit if self.time_limit else None
+        if any(self.remaining[v] and self.slack(v) < 0 for v in range(len(self.kind))) or \
+                not self.capacity_ok(self.by_section, self.by_teacher):
+            return False
+        stack = []
+        while True:
+            v = self.select()
+            if v is None:
+                return True
+            stack.append([v, self.values(v), 0, None])
+            while stack:
+                frame = stack[-1]
+                if frame[3] is not None:
+                    self.undo(frame[3])
+                    frame[3] = None
+                while frame[2] < len(frame[1]):
+                    self.nodes += 1
+                    if self.nodes > self.max_nodes or (deadline and time.monotonic() > deadline):
+                        return None
+                    value = frame[1][frame[2]]
+                    frame[2] += 1
+                    mark = len(self.trail)
+                    if self.assign(frame[0], value):
+                        frame[3] = mark
+                        break
+                    self.undo(mark)
+                if frame[3] is not None:
+                    break
+                stack.pop()
+            else:
+                return False
+
+    def assign(self, v, value):
+        sec = self.section[v]
+        if self.kind[v] == LAB:
+            day, start = LAB_STARTS[value]
+            (b1_sub, b1_teacher), (b2_sub, b2_teacher) = self.labs[v]
+            self.lab_gen.place_lab_pair(sec, b1_sub, b1_teacher, b2_sub, b2_teacher, day, start)
+            self.trail.append(('lab', v, day, start))
+            periods = 2
+            slot = None
+        else:
+            day, period = value
+            self.theory.place_class(sec, day, period, self.subject[v])
+            self.trail.append(('class', v, day, period))
+            periods = 1
+            slot = day * PERIODS + period
+        self.trail.append(('count', v, self.remaining[v], self.last[v]))
+        self.remaining[v] -= 1
+        if slot is not None:
+            self.last[v] = slot
+        self.section_demand[sec] -= periods
+        for t in self.teachers[v]:
+            self.teacher_demand[t] -= periods
+        for subj in self.bound[v]:
+            self.room_need[subj] -= 1
+        self.trail.append(('demand', v, periods))
+
+        # Forward checking over every variable sharing the section, a teacher or a room
+        affected = set(self.by_section[sec])
+        for t in self.teachers[v]:
+            affected.update(self.by_teacher[t])
+        for room in self.rooms_of[v]:
+            affected.update(self.by_room[room])
+        room_slack = [self.room_slack(g) for g in range(len(self.room_groups))]
+        for u in affected:
+            self.trail.append(('domain', u, self.domain[u]))
+            self.domain[u] = self.compute_domain(u)
+            if self.remaining[u] and self.slack(u, room_slack) < 0:
+                return False
+        return self.capacity_ok((sec,), self.teachers[v])
+
+    def capacity_ok(self, sections, teachers):
+        # Pigeonhole: free periods must cover what is still owed
+        occ = self.occ
+        return all((WEEK_MASK & ~occ.section_busy(s)).bit_count() >= self.section_demand[s] for s in sections) and \
+            all((WEEK_MASK & ~occ.teacher_blocked(t)).bit_count() >= self.teacher_demand[t] for t in teachers)
+
+    def undo(self, mark):
+        trail = self.trail
+        while len(trail) > mark:
+            entry = trail.pop()
+            kind, v = entry[0], entry[1]
+            if kind == 'domain':
+                self.domain[v] = entry[2]
+            elif kind == 'demand':
+                self.section_demand[self.section[v]] += entry[2]
+                for t in self.teachers[v]:
+                    self.teacher_demand[t] += entry[2]
+                for subj in self.bound[v]:
+                    self.room_need[subj] += 1
+            elif kind == 'count':
+                self.remaining[v], self.last[v] = entry[2], entry[3]
+            elif kind == 'lab':
+                self.lab_gen.remove_lab_pair(self.section[v], entry[2], entry[3])
+            else:
+                self.theory.remove_class(self.section[v], entry[2], entry[3])
+
+
+ENGINES = {engine.name: engine for engine in (GreedyEngine, BacktrackingEngine)}
+
+
+def get_engine(name):
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine {name!r}; choose from {', '.join(sorted(ENGINES))}")
+    return ENGINES[name]()
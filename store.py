@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+import json
+import mmap
+import struct
+import sys
+from array import array
+from model import CompactSchedule
+
+# ------------ BINARY SCHEDULE STORE -------------
+# Layout: MAGIC | u32 header length | JSON header | padding to 8 bytes | body.
+# The header holds the interned section, teacher and subject names, each
+# section's CLASS_GROUPS slots, the ROOMS and room assignments and the unplaced report;
+# the body is a CompactSchedule's four uint16 grids followed by one
+# little-endian week bitmask per teacher for the busy and prebooked masks.
+# Grids are read straight out of an mmap, so loading a week costs one header
+# parse no matter how many sections it holds.
+MAGIC = b"TTS1"
+
+
+def _pad(n):
+    return (8 - n % 8) % 8
+
+
+def save(path, lab_schedules, class_schedules, occupancy, inputs=None, grouped=None, lab_rooms=None,
+         class_rooms=None, unplaced=None):
+    schedule = CompactSchedule.from_grids(lab_schedules, class_schedules,
+                                          extra_teachers=set(occupancy.teachers) | set(occupancy.prebooked))
+    mask_bytes = (schedule.days * schedule.periods + 7) // 8
+    masks = b"".join(occupancy.teachers.get(t, 0).to_bytes(mask_bytes, "little") +
+                     occupancy.prebooked.get(t, 0).to_bytes(mask_bytes, "little") for t in schedule.teachers)
+
+    header = json.dumps({
+        "days": schedule.days, "periods": schedule.periods, "byteorder": sys.byteorder, "mask_bytes": mask_bytes,
+        "sections": schedule.sections, "lab_sections": schedule.lab_sections,
+        "teachers": schedule.teachers, "subjects": schedule.subjects, "inputs": inputs,
+        "grouped": grouped or {}, "unplaced": unplaced or {}, "rooms": occupancy.rooms.spec(),
+        "lab_rooms": [[*key, *rooms] for key, rooms in (lab_rooms or {}).items()],
+        "class_rooms": [[*key, room] for key, room in (class_rooms or {}).items()],
+    }).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        f.write(b"\0" * _pad(8 + len(header)))
+        for grid in schedule.grids():
+            grid.tofile(f)
+        f.write(masks)
+
+
+class StoredSchedule(CompactSchedule):
+    def __init__(self, buf):
+        if bytes(buf[:4]) != MAGIC:
+            raise ValueError("not a timetable store (bad magic)")
+        (length,) = struct.unpack_from("<I", buf, 4)
+        meta = json.loads(bytes(buf[8:8 + length]))
+        self.inputs = meta["inputs"]
+        # Absent in older stores
+        self.grouped = meta.get("grouped", {})     # section -> CLASS_GROUPS slots
+        self.unplaced = meta.get("unplaced", {})
+        self.rooms = meta.get("rooms")             # ROOMS the week was solved with
+        self.lab_rooms = {(sec, d, start): (b1, b2) for sec, d, start, b1, b2 in meta.get("lab_rooms", [])}
+        self.class_rooms = {(sec, d, p): room for sec, d, p, room in meta.get("class_rooms", [])}
+
+        week = meta["days"] * meta["periods"]
+        offset = 8 + length + _pad(8 + length)
+        sizes = [len(meta["sections"]) * week] * 2 + [len(meta["lab_sections"]) * 2 * week] * 2
+        if len(buf) < offset + 2 * sum(sizes) + 2 * len(meta["teachers"]) * meta["mask_bytes"]:
+            raise ValueError("truncated timetable store")
+        grids = []
+        view = memoryview(buf)
+        for size in sizes:
+            raw = view[offset:offset + 2 * size]
+            if meta["byteorder"] == sys.byteorder:
+                grids.append(raw.cast("H"))
+            else:
+                swapped = array("H", raw)
+                swapped.byteswap()
+                grids.append(swapped)
+            offset += 2 * size
+        super().__init__(meta["sections"], meta["lab_sections"], meta["teachers"], meta["subjects"],
+                         grids, meta["days"], meta["periods"])
+        self._teacher_index = {t: i for i, t in enumerate(self.teachers)}
+        self._masks = view[offset:]
+        self._mask_bytes = meta["mask_bytes"]
+        self._mmap = None
+
+    @classmethod
+    def open(cls, path):
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        stored = cls(mm)
+        stored._mmap = mm
+        return stored
+
+    def close(self):
+        # Views into the mmap must go before the mapping can be closed
+        self._class_subjects = self._class_teachers = self._lab_subjects = self._lab_teachers = None
+        self._masks = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def teacher_mask(self, teacher, prebooked=False):
+        if teacher not in self._teacher_index:
+            return 0
+        start = (self._teacher_index[teacher] * 2 + prebooked) * self._mask_bytes
+        return int.from_bytes(self._masks[start:start + self._mask_bytes], "little")
+
+
+def load(path):
+    return StoredSchedule.open(path)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+import hashlib
+import random
+
+
+# ------------ RNG STREAMS -------------
+# Every random choice of a run draws from a stream of its own, named after the
+# phase and the part it is for ("labs", "5A") and seeded from the run's seed
+# and that name alone. A stream never sees another stream's draws, so adding
+# a section or editing one section's inputs leaves every other section's
+# random choices where they were, and the same seed gives the same run in
+# any process.
+def derive(seed, *name):
+    # Stable 64-bit seed for (seed, name); unlike hash() it is the same in every process
+    digest = hashlib.sha256("\x1f".join(map(str, (seed,) + name)).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+class Streams:
+    def __init__(self, seed=0):
+        self.seed = seed
+        self._streams: dict[tuple, random.Random] = {}
+
+    def __call__(self, *name):
+        # The random.Random for this name, created on first use and then continued
+        rng = self._streams.get(name)
+        if rng is None:
+            rng = self._streams[name] = random.Random(derive(self.seed, *name))
+        return rng
+
+    def key(self, *name):
+        # A fixed random sort key, e.g. a section's place in one pass's order
+        return derive(self.seed, *name)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+from typing import Optional, Tuple
+from model import cell_classes
+from variables import DAYS, PERIODS
+
+
+# ------------ INVERTED TEACHER INDEX -------------
+# teacher -> (day, period) -> every (subject, section, batch) they hold there,
+# built in one pass over the lab and theory grids. batch is None for theory.
+# More than one entry in a slot is a double booking, except one theory subject
+# held for several sections at once in a slot their CLASS_GROUPS group holds
+# (grouped: section -> week bitmask of its group slots, as on TheoryTimetable).
+class TeacherIndex:
+    def __init__(self, lab_schedules, class_schedules, grouped=None):
+        self.grouped = grouped or {}
+        self.slots: dict[str, dict[Tuple[int, int], list[Tuple[str, str, Optional[str]]]]] = {}
+        for section, batches in lab_schedules.items():
+            for batch, grid in batches.items():
+                self._add_grid(grid, section, batch)
+        for section, grid in class_schedules.items():
+            self._add_grid(grid, section, None)
+
+    def _add_grid(self, grid, section, batch):
+        for d, row in enumerate(grid):
+            for p, slot in enumerate(row):
+                if slot:
+                    for subject, teacher in cell_classes(slot):
+                        self.slots.setdefault(teacher, {}).setdefault((d, p), []).append((subject, section, batch))
+
+    def teachers(self):
+        return sorted(self.slots)
+
+    def assignments(self, teacher, day, period):
+        return self.slots.get(teacher, {}).get((day, period), [])
+
+    def cell(self, teacher, day, period):
+        # "Subject (Class)", labs as "Subject (Class-Batch)", a combined class as
+        # "Subject (Class/Class)"; clashes are joined, not hidden
+        entries = self.assignments(teacher, day, period)
+        if not entries:
+            return "-"
+        held: dict[tuple, list[str]] = {}
+        for subj, sec, batch in entries:
+            held.setdefault((subj, sec, batch) if batch else (subj,), []).append(f"{sec}-{batch}" if batch else sec)
+        return " / ".join(f"{key[0]} ({'/'.join(where)})" for key, where in held.items())
+
+    def grid(self, teacher):
+        return [[self.cell(teacher, d, p) for p in range(PERIODS)] for d in range(DAYS)]
+
+    def combined(self, d, p, entries):
+        # One theory subject for several sections, all in a slot of their group
+        bit = 1 << (d * PERIODS + p)
+        return all(batch is None and subj == entries[0][0] and self.grouped.get(sec, 0) & bit
+                   for subj, sec, batch in entries)
+
+    def double_bookings(self):
+        return [(teacher, d, p, entries)
+                for teacher in self.teachers()
+                for (d, p), entries in sorted(self.slots[teacher].items())
+                if len(entries) > 1 and not self.combined(d, p, entries)]
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+import os
+from functools import cached_property
+from variables import ATTEMPTS, ENGINE, OPTIMIZE_SECONDS, TERM_WEEKS, WEEK_PATTERNS
+
+BASE = "base"
+
+
+# ------------ WEEK PATTERNS -------------
+def week_numbers(spec, weeks=TERM_WEEKS):
+    # 'all' | 'odd' | 'even' | 'first-half' | 'second-half' | '1-8,12' | [1, 3, 5]
+    # -> sorted 1-based week numbers inside the term
+    half = (weeks + 1) // 2
+    named = {"all": range(1, weeks + 1), "odd": range(1, weeks + 1, 2), "even": range(2, weeks + 1, 2),
+             "first-half": range(1, half + 1), "second-half": range(half + 1, weeks + 1)}
+    if isinstance(spec, str) and spec in named:
+        found = set(named[spec])
+    elif isinstance(spec, str):
+        found = set()
+        for part in spec.split(","):
+            a, _, b = part.strip().partition("-")
+            found.update(range(int(a), int(b or a) + 1))
+    else:
+        found = set(spec)
+    outside = sorted(w for w in found if not 1 <= w <= weeks)
+    if outside:
+        raise ValueError(f"weeks {outside} are outside the {weeks}-week term")
+    return sorted(found)
+
+
+# ------------ TERM -------------
+# A term of N weeks stored as its distinct weeks only. Every week maps to the
+# set of WEEK_PATTERNS that cover it; weeks with the same set share one
+# Timetable, so a 16-week term with odd/even labs holds two weeks, not
+# sixteen. The base week is solved in full and every other pattern is
+# re-solved incrementally from it (incremental.reschedule), which keeps each
+# class the pattern does not change in the same slot and costs a fraction of
+# a full solve.
+class Term:
+    def __init__(self, weeks, patterns, week_pattern):
+        self.weeks = weeks
+        self.patterns = patterns                # pattern name -> Timetable
+        self.week_pattern = week_pattern        # week number - 1 -> pattern name
+
+    def week(self, n):
+        return self.patterns[self.week_pattern[n - 1]]
+
+    def weeks_of(self, name):
+        return tuple(i + 1 for i, p in enumerate(self.week_pattern) if p == name)
+
+    @cached_property
+    def records(self):
+        from export_pipeline import ScheduleRecords
+        return ScheduleRecords.merge_weeks([(self.weeks_of(name), week.records)
+                                            for name, week in self.patterns.items() if self.weeks_of(name)],
+                                           self.weeks)
+
+    def export(self, sinks, excel=None):
+        # Every sink but Excel takes the merged term records (weeks per period);
+        # Excel lays out grids, so it gets one workbook per pattern instead
+        from export_pipeline import ExcelSink, run_pipeline
+        outputs = run_pipeline({}, {}, sinks, records=self.records) if sinks else []
+        if excel:
+            root, ext = os.path.splitext(excel)
+            for name, week in self.patterns.items():
+                path = excel if len(self.patterns) == 1 else f"{root}_{name}{ext or '.xlsx'}"
+                outputs += week.export([ExcelSink(path)])
+        return outputs
+
+    def print_summary(self):
+        from export_pipeline import week_text
+        base = set(self.patterns[BASE].records.records) if BASE in self.patterns else set()
+        print(f"\n=== TERM: {self.weeks} weeks, {len(self.patterns)} distinct ===")
+        for name, week in self.patterns.items():
+            weeks = self.weeks_of(name)
+            changed = len(base ^ set(week.records.records)) if base and name != BASE else 0
+            print(f"{name:<24} weeks {week_text(weeks) if weeks else '-':<20}" +
+                  (f" {changed} periods differ from the base week" if changed else ""))
+
+
+def build_term(seed=42, attempts=ATTEMPTS, workers=None, engine=ENGINE, optimize=OPTIMIZE_SECONDS,
+               weeks=TERM_WEEKS, patterns=None):
+    import timetable
+    from incremental import current_inputs, reschedule
+    from model import compile_model
+    from scenarios import apply_overrides
+    patterns = WEEK_PATTERNS if patterns is None else patterns
+    covered = {name: set(week_numbers(spec["weeks"], weeks)) for name, spec in patterns.items()}
+    week_pattern = ["+".join(n for n in patterns if w in covered[n]) or BASE for w in range(1, weeks + 1)]
+
+    base_config = current_inputs()
+    base = timetable.generate(seed, attempts, workers, engine, optimize=optimize)
+    state = base.compact
+    state.inputs = base_config
+    solved = {BASE: base}
+    for name in dict.fromkeys(week_pattern):
+        if name in solved:
+            continue
+        config = base_config
+        for part in name.split("+"):
+            config = apply_overrides(config, patterns[part].get("overrides", {}))
+        compile_model(config)       # a pattern that cannot work fails here, before solving
+        print(f"\nWeek pattern {name}:")
+        solved[name] = timetable.Timetable.from_generators(*reschedule(state, config, seed))
+    return Term(weeks, solved, week_pattern)
+
+
+if __name__ == "__main__":
+    import argparse
+    from export_pipeline import add_output_arguments, sinks_from_args
+    from model import ModelError
+    parser = argparse.ArgumentParser(description="Solve every distinct week of the term and export the whole term.")
+    parser.add_argument("--weeks", type=int, default=TERM_WEEKS, help="weeks in the term")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--attempts", type=int, default=ATTEMPTS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--engine", choices=["greedy", "exact"], default=ENGINE)
+    parser.add_argument("--optimize", type=float, default=OPTIMIZE_SECONDS, metavar="SECONDS")
+    parser.add_argument("--show", type=int, metavar="WEEK", help="also print the timetable of this week")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+    try:
+        term = build_term(args.seed, args.attempts, args.workers, args.engine, args.optimize, args.weeks)
+    except ModelError as e:
+        raise SystemExit(f"variables.py or WEEK_PATTERNS is inconsistent:\n{e}")
+    term.print_summary()
+    if args.show:
+        term.week(args.show).print_console()
+    excel, args.excel = args.excel, None
+    for output in term.export(sinks_from_args(args), excel):
+        print(f"✅ Exported {len(output)} calendars" if isinstance(output, list) else f"✅ Exported {output}")
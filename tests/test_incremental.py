@@ -0,0 +1,23 @@
+import contextlib
+import io
+from generate_timetable import build_timetables
+from incremental import current_inputs, reschedule
+from timetable import Timetable
+
+
+def test_added_group_is_placed_around_a_saved_state():
+    inputs = current_inputs()
+    with contextlib.redirect_stdout(io.StringIO()):
+        lab_gen, theory_gen = build_timetables(42, config=inputs)
+    state = Timetable.from_generators(lab_gen, theory_gen).compact
+    state.inputs = inputs
+    groups = {'OPEN ELECTIVE': {'sections': ['7A', '7B', '7C', '7D'], 'periods': 3,
+                                'classes': [('CLOUD COMPUTING', 'GEENA'), ('BLOCKCHAIN', 'RAMYA')]}}
+    with contextlib.redirect_stdout(io.StringIO()):
+        lab_gen, theory_gen = reschedule(state, dict(inputs, CLASS_GROUPS=groups))
+    assert not any(theory_gen.unplaced.values())
+    group = theory_gen.group_of[('7A', 'OPEN ELECTIVE')]
+    assert theory_gen.group_left(group) == 0
+    for sec in group.sections:
+        assert theory_gen.grouped[sec].bit_count() == 3
+    assert not Timetable.from_generators(lab_gen, theory_gen).index.double_bookings()
@@ -0,0 +1,21 @@
+import contextlib
+import io
+import pytest
+from generate_timetable import build_timetables
+from model import current_config
+from timetable import Timetable, load
+
+ROOMS = {'CS-LAB-1': {'capacity': 2, 'subjects': ['DSA-LAB', 'OOPS-LAB']},
+         'CS-LAB-2': {'capacity': 2, 'subjects': ['DSA-LAB', 'OS-LAB', 'DDCO-LAB']}}
+
+
+def test_loaded_week_answers_room_queries(tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        week = Timetable.from_generators(*build_timetables(42, config=dict(current_config(), ROOMS=ROOMS)))
+    week.save(tmp_path / "week.tts")
+    live, loaded = week.query, load(tmp_path / "week.tts").query
+    slots = [(d, p) for d in range(5) for p in range(6)]
+    assert [loaded.free_rooms(*s) for s in slots] == [live.free_rooms(*s) for s in slots]
+    assert loaded.free_slots(rooms=["CS-LAB-1"]) == live.free_slots(rooms=["CS-LAB-1"])
+    with pytest.raises(KeyError, match="unknown room 'LAB-9'"):
+        loaded.free_slots(rooms=["LAB-9"])
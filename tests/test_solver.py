@@ -0,0 +1,19 @@
+import contextlib
+import io
+from generate_timetable import make_generators
+from model import current_config
+from solver import BacktrackingEngine
+from streams import Streams
+
+
+def test_exact_engine_books_a_room_for_every_bound_lab():
+    config = dict(current_config(), ROOMS={'R': {'capacity': 1, 'subjects': ['DSA-LAB']}})
+    lab_gen, theory_gen = make_generators(config)
+    lab_gen.rng = theory_gen.rng = Streams(42)
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert BacktrackingEngine().solve(lab_gen, theory_gen)
+    for (sec, day, start), rooms in lab_gen.lab_rooms.items():
+        for batch, room in zip(('B1', 'B2'), rooms):
+            subject = lab_gen.lab_schedules[sec][batch][day][start][0]
+            assert room == ('R' if subject == 'DSA-LAB' else None)
+    assert not any(theory_gen.unplaced.values())
@@ -0,0 +1,20 @@
+from term import BASE, build_term
+from variables import SUBJECTS_PER_YEAR
+
+
+def test_two_pattern_term(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)     # keep the result/model caches out of the tree
+    patterns = {
+        'even': {'weeks': 'even', 'overrides': {'LAB_SUBJECTS': {'5A': [('WEB-LAB', 'GEENA'),
+                                                                       ('CN-LAB', 'MAHALAKSHMI B')]}}},
+        'late': {'weeks': 'second-half', 'overrides': {'SUBJECTS_PER_YEAR': {
+            '7': dict(SUBJECTS_PER_YEAR['7'], **{'BIG DATA ANALYTICS': 2})}}},
+    }
+    term = build_term(seed=42, attempts=1, weeks=8, patterns=patterns)
+    assert set(term.patterns) == {BASE, 'even', 'late', 'even+late'}
+    assert term.weeks_of('even') == (2, 4) and term.weeks_of('even+late') == (6, 8)
+    held = {cell for grid in term.week(2).lab_schedules['5A'].values() for row in grid for cell in row if cell}
+    assert ('WEB-LAB', 'GEENA') in held and ('WEB-LAB', 'GEENA') not in {
+        cell for grid in term.week(1).lab_schedules['5A'].values() for row in grid for cell in row if cell}
+    for week in term.patterns.values():
+        assert not week.index.double_bookings()
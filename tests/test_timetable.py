@@ -0,0 +1,36 @@
+import contextlib
+import io
+import json
+import struct
+import pytest
+from store import MAGIC
+from timetable import generate
+
+
+def _corrupt_header(data):
+    (length,) = struct.unpack_from("<I", data, 4)
+    meta = json.loads(data[8:8 + length])
+    del meta["teachers"]
+    header = json.dumps(meta).encode().ljust(length)
+    return data[:8] + header + data[8 + length:]
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[:len(data) // 2],         # truncated body
+    lambda data: data[:6],                      # truncated header length
+    lambda data: b"",
+    _corrupt_header,                            # stale header missing a field
+])
+def test_damaged_result_cache_is_a_miss(tmp_path, monkeypatch, damage):
+    monkeypatch.chdir(tmp_path)     # keep the model cache out of the tree
+    with contextlib.redirect_stdout(io.StringIO()):
+        week = generate(attempts=1, optimize=0, cache_dir=str(tmp_path))
+    (path,) = tmp_path.glob("*.tts")
+    data = path.read_bytes()
+    assert data.startswith(MAGIC)
+    path.write_bytes(damage(data))
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        again = generate(attempts=1, optimize=0, cache_dir=str(tmp_path))
+    assert "Reusing" not in out.getvalue()
+    assert again.class_schedules == week.class_schedules
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import os
+import struct
+from functools import cached_property
+from variables import ATTEMPTS, ENGINE, PROFILE, OPTIMIZE_SECONDS, RESULT_CACHE
+
+ENGINE_VERSION = 2      # bump when a code change alters the week a seed produces; cached weeks are keyed by it
+
+
+# ------------ TIMETABLE -------------
+# One finished week, generated once or loaded from a store, and everything
+# derived from it: teacher index, export records, query indexes, the compact
+# form. Each is built on first use and then shared, so printing the week and
+# writing several exports never re-solves or re-walks the grids. The solver,
+# the exporters and openpyxl are imported only by the paths that need them,
+# so loading a saved week and writing JSON never touches them.
+class Timetable:
+    def __init__(self, lab_schedules, class_schedules, lab_gen=None, theory_gen=None, grouped=None,
+                 prebooked=None, lab_rooms=None, class_rooms=None, unplaced=None, rooms=None):
+        # A loaded week passes what the store kept in place of the generators
+        self.lab_schedules = lab_schedules
+        self.class_schedules = class_schedules
+        if theory_gen is not None:
+            grouped, prebooked = theory_gen.grouped, theory_gen.occupancy.prebooked
+            lab_rooms, class_rooms, unplaced = lab_gen.lab_rooms, theory_gen.class_rooms, theory_gen.unplaced
+        self.grouped = grouped or {}
+        self.prebooked = prebooked or {}
+        self.lab_rooms = lab_rooms or {}        # (section, day, start) -> (B1 room, B2 room)
+        self.class_rooms = class_rooms or {}    # (section, day, period) -> room
+        self.unplaced = unplaced or {}          # section -> subjects left out
+        self.rooms = rooms                      # ROOMS of a loaded week (None: variables.py)
+        self._generators = (lab_gen, theory_gen) if lab_gen is not None else None
+
+    @classmethod
+    def from_generators(cls, lab_gen, theory_gen):
+        return cls(lab_gen.lab_schedules, theory_gen.class_schedules, lab_gen, theory_gen)
+
+    def generators(self):
+        # The lab/theory generators behind the week; a loaded week replays its
+        # grids into fresh ones (rooms re-assigned) the first time they are asked for
+        if self._generators is None:
+            from generate_timetable import restore_timetables
+            self._generators = restore_timetables(self.compact)
+        return self._generators
+
+    @property
+    def occupancy(self):
+        return self._generators[1].occupancy if self._generators else self.stored_occupancy
+
+    @cached_property
+    def stored_occupancy(self):
+        # Masks of a loaded week booked straight from its grids, stored
+        # prebookings and room assignments; nothing is re-placed against the
+        # current variables.py
+        from model import cell_classes
+        from occupancy import Occupancy, SLOT_BITS
+        from variables import ROOMS
+        occ = Occupancy()
+        occ.set_rooms(ROOMS if self.rooms is None else self.rooms)
+        for teacher, mask in self.prebooked.items():
+            occ.prebooked[teacher] = mask
+        booked = [(room, SLOT_BITS[d][start] | SLOT_BITS[d][start+1])
+                  for (_, d, start), rooms in self.lab_rooms.items() for room in rooms]
+        booked += [(room, SLOT_BITS[d][p]) for (_, d, p), room in self.class_rooms.items()]
+        for room, bits in booked:
+            if room in occ.rooms.capacity:
+                occ.rooms.book(room, bits)
+        for sec, batches in self.lab_schedules.items():
+            for batch, grid in batches.items():
+                for d, row in enumerate(grid):
+                    for p, slot in enumerate(row):
+                        if slot:
+                            occ.book_lab(sec, batch, slot[1], SLOT_BITS[d][p])
+        for sec, grid in self.class_schedules.items():
+            for d, row in enumerate(grid):
+                for p, slot in enumerate(row):
+                    for subject, teacher in cell_classes(slot) if slot else ():
+                        occ.book_class(sec, subject, teacher, d, p)
+        return occ
+
+    @property
+    def profiler(self):
+        return self._generators[1].profiler if self._generators else None
+
+    @cached_property
+    def compact(self):
+        from model import CompactSchedule
+        return CompactSchedule.from_grids(self.lab_schedules, self.class_schedules)
+
+    @cached_property
+    def index(self):
+        from teacher_index import TeacherIndex
+        return TeacherIndex(self.lab_schedules, self.class_schedules, self.grouped)
+
+    @cached_property
+    def records(self):
+        from export_pipeline import ScheduleRecords
+        return ScheduleRecords(self.lab_schedules, self.class_schedules)
+
+    @cached_property
+    def query(self):
+        from query import TimetableQuery
+        if self._generators:
+            return TimetableQuery.from_generators(*self._generators)
+        return TimetableQuery(self.lab_schedules, self.class_schedules, self.occupancy,
+                              self.lab_rooms, self.class_rooms)
+
+    # --- outputs ---
+    def save(self, path):
+        import store
+        store.save(path, self.lab_schedules, self.class_schedules, self.occupancy, grouped=self.grouped,
+                   lab_rooms=self.lab_rooms, class_rooms=self.class_rooms, unplaced=self.unplaced)
+
+    def export(self, sinks, workers=None):
+        from export_pipeline import run_pipeline
+        return run_pipeline(self.lab_schedules, self.class_schedules, sinks, workers, self.records)
+
+    def lab_room(self, section, batch, day, period):
+        rooms = self.lab_rooms.get((section, day, period - period % 2))
+        return rooms[0 if batch == 'B1' else 1] if rooms else None
+
+    def print_unplaced(self):
+        # The [UNPLACED] report a live run prints while solving, for a week
+        # loaded from the result cache (same inputs, so the rules still apply)
+        from variables import DEBUG_PLACEMENT
+        for sec, subs in self.unplaced.items():
+            for subj in subs:
+                print(f"[UNPLACED] {subj} in {sec}")
+        if DEBUG_PLACEMENT and any(self.unplaced.values()):
+            theory_gen = self.generators()[1]
+            theory_gen.unplaced = self.unplaced
+            theory_gen.infeasibility_report().print_table()
+
+    def print_console(self, teachers=False):
+        from generate_timetable import print_lab_timetables, print_combined, print_teacher_timetables
+        print_lab_timetables(self.lab_schedules, self.lab_room)
+        print_combined(self.lab_schedules, self.class_schedules)
+        if teachers:
+            print_teacher_timetables(self.index)
+        for teacher, d, p, entries in self.index.double_bookings():
+            print(f"[DOUBLE BOOKED] {teacher} at {d},{p}: {self.index.cell(teacher, d, p)}")
+
+
+# ------------ RESULT CACHE -------------
+# A run is a pure function of the inputs, the solver settings, the seed and
+# the engine (every random choice comes from streams seeded by the seed, see
+# streams.py), so its week is stored under a hash of exactly those and an
+# unchanged rerun loads it instead of solving. A week optimized for a time
+# budget is whatever the first run reached; later runs repeat it exactly.
+def result_key(seed, attempts, engine, optimize, config=None):
+    import variables
+    from model import config_hash, current_config
+    settings = [variables.MAX_THEORY_PASSES, variables.REPAIR_MAX_DEPTH, variables.OPTIMIZE_WEIGHTS,
+                variables.OPTIMIZE_CONSECUTIVE]
+    blob = json.dumps([ENGINE_VERSION, config_hash(current_config() if config is None else config), settings,
+                       seed, attempts, engine, optimize], sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+# ------------ ENTRY POINTS -------------
+def generate(seed=42, attempts=ATTEMPTS, workers=None, engine=ENGINE, profile=PROFILE,
+             optimize=OPTIMIZE_SECONDS, cache_dir=RESULT_CACHE):
+    # The one place a week is solved; raises model.ModelError on impossible inputs.
+    # A week solved before from the same key comes back from cache_dir (not
+    # when profiling, which needs a live run); only valid inputs get cached.
+    path = os.path.join(cache_dir, f"{result_key(seed, attempts, engine, optimize)}.tts") \
+        if cache_dir and not profile else None
+    if path and os.path.exists(path):
+        try:
+            week = load(path)
+            print(f"Reusing the week solved earlier from the same inputs, seed and engine ({path})")
+            week.print_unplaced()
+            return week
+        except (OSError, ValueError, KeyError, TypeError, IndexError, struct.error):
+            pass        # unreadable, truncated or stale: solve again below
+    from multistart import generate_best
+    week = Timetable.from_generators(*generate_best(seed, attempts, workers, engine=engine,
+                                                    profile=profile, optimize=optimize))
+    if path:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        week.save(tmp)
+        os.replace(tmp, path)
+    return week
+
+
+def load(path):
+    # A week saved with --save, copied out of the store so the mmap can close
+    import store
+    with store.load(path) as saved:
+        prebooked = {t: saved.teacher_mask(t, prebooked=True) for t in saved.teachers}
+        prebooked = {t: mask for t, mask in prebooked.items() if mask}
+        return Timetable(saved.lab_schedules, saved.class_schedules, grouped=saved.grouped, prebooked=prebooked,
+                         lab_rooms=saved.lab_rooms, class_rooms=saved.class_rooms, unplaced=saved.unplaced,
+                         rooms=saved.rooms)
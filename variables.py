@@ -1,7 +1,36 @@
 DAYS = 5
 PERIODS = 6
+DAY_PERIODS = [PERIODS] * DAYS    # periods per day, e.g. DAYS = 6 and [6, 6, 6, 6, 6, 3] for a Saturday half-day
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"][:DAYS]
+TERM_WEEKS = 16           # weeks in the term (calendar exports, term.py)
 MAX_THEORY_PASSES = 10
-DEBUG_PLACEMENT = True
+REPAIR_MAX_DEPTH = 3      # longest chain of displaced classes post_repair may build
+DEBUG_PLACEMENT = True    # explain [UNPLACED] subjects with a per-class table of blocking rules
+PROFILE = False           # count constraint checks and time every pass/phase (or pass --profile)
+VERBOSE = False           # print a line per theory pass (always on while profiling)
+TEACHER_MAX_PER_DAY = 5   # theory + lab periods one teacher may take in a day (None: no cap)
+TEACHER_MAX_CONSECUTIVE = None  # periods one teacher may take back to back (None: no cap)
+ENGINE = 'greedy'         # 'greedy' (randomized passes) or 'exact' (backtracking solver)
+ATTEMPTS = 1              # independent random seeds to try in parallel; the best schedule is kept
+OPTIMIZE_SECONDS = 0      # >0: spend this long improving soft preferences after generation (or --optimize)
+# Soft-preference weights for the optimizer (see optimize.py)
+OPTIMIZE_WEIGHTS = {'idle': 3, 'balance': 1, 'early': 1, 'consecutive': 4}
+OPTIMIZE_CONSECUTIVE = 3  # periods a teacher may teach in a row before 'consecutive' is charged
+MODEL_CACHE = '.model_cache'  # compiled, validated inputs keyed by content hash (None: always recompile)
+RESULT_CACHE = '.result_cache'  # solved weeks keyed by inputs, seed and engine version (None: always solve)
+
+# Weeks that differ from the base week (see term.py). Each pattern applies
+# its overrides (same format as a scenarios.py file) on the weeks it names:
+# 'all', 'odd', 'even', 'first-half', 'second-half', '1-8,12' or a list of
+# week numbers. A week matched by several patterns gets all their overrides.
+WEEK_PATTERNS = {
+    # 'even': {'weeks': 'even', 'overrides': {'LAB_SUBJECTS': {'5A': [('WEB-LAB', 'GEENA'), ...]}}},
+    # 'late': {'weeks': 'second-half', 'overrides': {'SUBJECTS_PER_YEAR': {'7': {...}}}},
+}
+
+# Clock times of P1..P6, used by calendar (.ics) and HTML exports
+PERIOD_TIMES = [('09:00', '09:55'), ('09:55', '10:50'), ('11:05', '12:00'),
+                ('12:00', '12:55'), ('13:45', '14:40'), ('14:40', '15:35')]
 
 YEARS_SECTIONS = {
         '3': ['A','B', 'C', 'D', 'E', 'F'],
@@ -192,6 +221,32 @@ PREBOOKED = {
     # 'Teacher2': [(1,4)],          # Tue P5 blocked
 }
 
+# Rooms that only some subjects may use (labs, seminar halls), each hosting up
+# to `capacity` batches/classes at once. A subject listed here always gets one
+# of its rooms; subjects no room lists are taught in the class's own room.
+ROOMS = {
+    # 'CS-LAB-1': {'capacity': 2, 'subjects': ['DSA-LAB', 'OOPS-LAB']},
+    # 'CS-LAB-2': {'capacity': 2, 'subjects': ['DSA-LAB', 'OS-LAB', 'DDCO-LAB']},
+}
+
+# Per-teacher overrides of TEACHER_MAX_PER_DAY/TEACHER_MAX_CONSECUTIVE, plus
+# days (0 = Mon) kept free when possible (only given up by the relaxed passes)
+TEACHER_LIMITS = {
+    # 'Teacher1': {'max_per_day': 4, 'max_consecutive': 2},
+    # 'Teacher2': {'free_days': [4]},                # Fridays off if possible
+}
+
+# Classes several sections take in the same slot: electives (one class per
+# elective, the students split between them) or a combined lecture (one class,
+# the sections sit together). A group replaces its members' subject of the same
+# name (the group name or a class subject) and runs that subject's periods a
+# week unless 'periods' is given; its classes are never split up or moved apart.
+CLASS_GROUPS = {
+    # 'OPEN ELECTIVE': {'sections': ['7A', '7B', '7C', '7D'], 'periods': 3,
+    #                   'classes': [('CLOUD COMPUTING', 'GEENA'), ('BLOCKCHAIN', 'RAMYA')]},
+    # 'BDA 7C+7D': {'sections': ['7C', '7D'], 'classes': [('BIG DATA ANALYTICS', 'RAMYA')]},
+}
+
 LAB_SUBJECTS = {
     '3A': [
         ('DDCO-LAB', 'SHWETHA K R'), 
@@ -205,14 +260,14 @@ LAB_SUBJECTS = {
         ('OS-LAB', 'GEENA'), 
         ('DSA-LAB', 'PRIYANKA'),
         ('OOPS-LAB', 'MALA M'),
-        ('DV-LAB', 'SHEETHAL')
+        ('DV-LAB', 'SHEETAL')
     ],
     '3C': [
         ('DDCO-LAB', 'SNIGDHA KESH'), 
         ('OS-LAB', 'VEENA BHAT'), 
-        ('DSA-LAB', 'PALLAVI KV'),
+        ('DSA-LAB', 'PALLALI KV'),
         ('OOPS-LAB', 'PARTHASARATHY'),
-        ('DV-LAB', 'VIJAYALAKSHMI')
+        ('DV-LAB', 'VIJAYALAKSHMI M M')
     ],
     '3D': [
         ('DDCO-LAB', 'PRAVEEN KUMAR B'), 
@@ -232,7 +287,7 @@ LAB_SUBJECTS = {
         ('DDCO-LAB', 'SRINIVAS SETTY'), 
         ('OS-LAB', 'RAMESH SHAHABADKAR'), 
         ('DSA-LAB', 'SANJEEVAN'),
-        ('OOPS-LAB', 'PRAVEEN KUMAR'),
+        ('OOPS-LAB', 'PRAVEEN KUMAR B'),
         ('DV-LAB', 'RADHA')
     ],
 
@@ -241,7 +296,7 @@ LAB_SUBJECTS = {
         ('WEB-LAB', 'ANAND KUMAR B'), 
     ],
     '5B': [
-        ('CN-LAB', 'SHEETHAL'), 
+        ('CN-LAB', 'SHEETAL'), 
         ('WEB-LAB', 'BHAVYA'), 
     ],
     '5C': [
@@ -266,7 +321,7 @@ LAB_SUBJECTS = {
         ('PC-LAB', 'GEENA'), 
     ],
     '7D': [
-        ('IOT-LAB', 'SRINIVASA SETTY'), 
+        ('IOT-LAB', 'SRINIVAS SETTY'), 
         ('PC-LAB', 'SNIGDHA KESH'), 
     ],
 }